@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de la capa de Excel (corre en Linux y Windows, sin UNICON ni pywinauto).
+
+Genera libros sintéticos (libro_sintetico.py) de distintos tamaños y mide cada lector:
+tiempo de pared (mejor de REPETICIONES), pico de memoria (tracemalloc, en una corrida
+aparte) y filas/segundo. Los resultados se comparan contra una base guardada; si un caso
+empeora más que TOLERANCIA se marca como REGRESIÓN y el script sale con código 1.
+
+Los lectores de los scripts (extraer_placas_desde_tabla, leer_pedidos_desde_excel)
+importan pywinauto al cargarse, así que aquí se miden con las mismas piezas que usan:
+LectorTabla con la misma proyección y hojas + validar_placas / validar_pedidos.
+
+Uso:
+    python benchmark_excel.py                  # mide y compara con la base
+    python benchmark_excel.py --guardar-base   # mide y guarda la base
+    python benchmark_excel.py --hojas 1 30     # solo esos tamaños
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Tuple
+
+import cache_tabla
+import tabla_excel
+from extraccion_rango import extraer_rango_fechas
+from libro_sintetico import generar_libro
+from tabla_excel import LectorTabla, construir_indice_tablas, encontrar_tabla_en_libro, nombres_hoja_del_dia
+from validacion_lotes import validar_pedidos, validar_placas
+
+# ====== VARIABLES AJUSTABLES ======
+TABLE_NAME = "Tabla276"
+HOJAS = [1, 30, 365]          # tamaños del libro (número de hojas diarias)
+FILAS_POR_HOJA = 80
+REPETICIONES = 3
+TOLERANCIA = 0.25             # +25% de tiempo o memoria respecto a la base = regresión
+BASE_PATH = os.path.join(cache_tabla.DATA_DIR, "benchmark_base.json")
+
+# Mismos valores que PLANTA_TO_DOWN_PRESSES / AGREGADO_TO_DOWN_PRESSES de pedidos_distribucion.py
+PLANTAS = ["MEIGGS", "OQUENDO", "MATERIALES", "COLLIQUE"]
+AGREGADOS = ["5", "AR", "67", "89"]
+
+COL_PLACA = 3
+COL_CUBICAJE = 6
+COL_AGREGADO_DESTINO = 7
+
+
+# ====== CASOS ======
+def _placas(path: str) -> int:
+    lector = LectorTabla(path, TABLE_NAME, hojas_preferidas=nombres_hoja_del_dia())
+    lector.registrar("placas", 1, FILAS_POR_HOJA, [COL_PLACA])
+    _, res = lector.leer()
+    placas, rechazos = validar_placas(res["placas"])
+    return len(placas) + len(rechazos)
+
+
+def _pedidos(path: str) -> int:
+    lector = LectorTabla(path, TABLE_NAME, hojas_preferidas=[date.today().strftime("%d.%m")],
+                         buscar_en_todas=False)
+    lector.registrar("pedidos", 1, FILAS_POR_HOJA, [COL_AGREGADO_DESTINO, COL_CUBICAJE])
+    _, res = lector.leer()
+    validar_pedidos(res["pedidos"], PLANTAS, AGREGADOS)
+    return len(res["pedidos"])
+
+
+def _combinada(path: str) -> int:
+    lector = LectorTabla(path, TABLE_NAME, hojas_preferidas=nombres_hoja_del_dia(), buscar_en_todas=False)
+    lector.registrar("placas", 1, FILAS_POR_HOJA, [COL_PLACA])
+    lector.registrar("pedidos", 1, FILAS_POR_HOJA, [COL_AGREGADO_DESTINO, COL_CUBICAJE])
+    _, res = lector.leer()
+    validar_placas(res["placas"])
+    validar_pedidos(res["pedidos"], PLANTAS, AGREGADOS)
+    return len(res["placas"])
+
+
+def _ubicar(path: str) -> int:
+    encontrar_tabla_en_libro(path, TABLE_NAME, nombres_hoja_del_dia())
+    return 0
+
+
+def _indice(path: str) -> int:
+    return len(construir_indice_tablas(path))
+
+
+def _rango_30(path: str) -> int:
+    hoy = date.today()
+    res = extraer_rango_fechas(path, TABLE_NAME, hoy - timedelta(days=29), hoy,
+                               [COL_PLACA, COL_CUBICAJE, COL_AGREGADO_DESTINO], procesos=1)
+    return len(res.filas)
+
+
+# nombre -> (función, motor, usar_caché)
+CASOS: Dict[str, Tuple[Callable[[str], int], str, bool]] = {
+    "encontrar_tabla":   (_ubicar, "ooxml", False),
+    "indice_tablas":     (_indice, "ooxml", False),
+    "placas_ooxml":      (_placas, "ooxml", False),
+    "placas_openpyxl":   (_placas, "openpyxl", False),
+    "pedidos_ooxml":     (_pedidos, "ooxml", False),
+    "pedidos_openpyxl":  (_pedidos, "openpyxl", False),
+    "combinada_ooxml":   (_combinada, "ooxml", False),
+    "placas_cache":      (_placas, "ooxml", True),
+    "rango_30_dias":     (_rango_30, "ooxml", False),
+}
+
+
+# ====== MEDICIÓN ======
+def medir(funcion: Callable[[str], int], path: str, motor: str, usar_cache: bool) -> dict:
+    tabla_excel.MOTOR_LECTURA = motor
+    tabla_excel.USAR_CACHE = usar_cache
+    if usar_cache:
+        funcion(path)   # calienta la caché: se mide el acierto
+    tiempos = []
+    filas = 0
+    for _ in range(REPETICIONES):
+        t0 = time.perf_counter()
+        filas = funcion(path)
+        tiempos.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    try:
+        funcion(path)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    segundos = min(tiempos)
+    return {"segundos": segundos, "pico_bytes": pico, "filas": filas,
+            "filas_s": filas / segundos if filas and segundos > 0 else None}
+
+
+def correr(hojas: List[int], carpeta: str) -> Dict[str, dict]:
+    resultados = {}
+    for n in hojas:
+        path = os.path.join(carpeta, f"sintetico_{n}.xlsx")
+        generar_libro(path, hojas=n, filas=FILAS_POR_HOJA, table_name=TABLE_NAME)
+        for caso, (funcion, motor, usar_cache) in CASOS.items():
+            if caso == "rango_30_dias" and n < 30:
+                continue
+            clave = f"{n}x{FILAS_POR_HOJA}/{caso}"
+            resultados[clave] = medir(funcion, path, motor, usar_cache)
+            r = resultados[clave]
+            filas_s = f"{r['filas_s']:>10.0f}" if r["filas_s"] else f"{'-':>10}"
+            print(f"  {clave:<32} {r['segundos'] * 1000:9.1f} ms  {r['pico_bytes'] / 1e6:8.2f} MB  {filas_s} filas/s")
+    return resultados
+
+
+def comparar(resultados: Dict[str, dict], base: Dict[str, dict]) -> List[str]:
+    """Devuelve la lista de regresiones (tiempo o memoria peor que la base + TOLERANCIA)."""
+    regresiones = []
+    for clave, r in resultados.items():
+        b = base.get(clave)
+        if not b:
+            continue
+        for metrica, nombre in (("segundos", "tiempo"), ("pico_bytes", "memoria")):
+            if b[metrica] and r[metrica] > b[metrica] * (1 + TOLERANCIA):
+                regresiones.append(f"{clave}: {nombre} {r[metrica] / b[metrica]:.2f}x la base")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la capa de Excel.")
+    parser.add_argument("--hojas", type=int, nargs="+", default=HOJAS, help="tamaños del libro (hojas diarias)")
+    parser.add_argument("--guardar-base", action="store_true", help="guardar los resultados como base")
+    parser.add_argument("--base", default=BASE_PATH, help="archivo JSON de la base")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        # La caché de tablas del benchmark no se mezcla con la de los scripts
+        cache_tabla.CACHE_DIR = os.path.join(carpeta, "cache")
+        print(f"Benchmark capa Excel ({REPETICIONES} repeticiones, {FILAS_POR_HOJA} filas por hoja):")
+        resultados = correr(args.hojas, carpeta)
+
+    if args.guardar_base:
+        base = {}
+        if os.path.exists(args.base):
+            with open(args.base, "r", encoding="utf-8") as f:
+                base = json.load(f)
+        base.update(resultados)
+        os.makedirs(os.path.dirname(args.base) or ".", exist_ok=True)
+        with open(args.base, "w", encoding="utf-8") as f:
+            json.dump(base, f, indent=2)
+        print(f"[INFO] Base guardada en {args.base}")
+        return
+
+    if not os.path.exists(args.base):
+        print(f"[INFO] No hay base en {args.base}; usa --guardar-base para crearla.")
+        return
+    with open(args.base, "r", encoding="utf-8") as f:
+        regresiones = comparar(resultados, json.load(f))
+    for r in regresiones:
+        print(f"[WARN] REGRESIÓN {r}")
+    if regresiones:
+        sys.exit(1)
+    print("[INFO] Sin regresiones respecto a la base.")
+
+
+if __name__ == "__main__":
+    main()
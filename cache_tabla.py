@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Caché local de tablas ya extraídas del libro de despacho.
+
+Cada entrada guarda las filas de datos de una tabla (hoja + nombre de tabla) en un
+archivo binario compacto (pickle + zlib). La clave es la huella del libro:
+ruta + tamaño + mtime + hash de contenido. Si el libro no cambió desde la última
+corrida, la lectura no pasa por openpyxl.
+
+El hash de contenido se calcula sobre el directorio central del zip (nombre, CRC32
+y tamaño de cada parte): cambia si cambia cualquier parte del libro y no obliga a
+leer el archivo completo desde OneDrive.
+
+También guarda, por libro, un índice de tablas (nombre -> hoja, rango, cabecera y
+columnas) invalidado por la misma huella (indice_<hash de ruta>.json).
+
+Eviction: se borran las entradas no usadas en CACHE_MAX_DIAS días y, si el total
+supera CACHE_MAX_BYTES, las menos usadas recientemente (LRU por mtime del archivo,
+que se actualiza en cada acierto).
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import time
+import zlib
+import zipfile
+from typing import List, NamedTuple, Optional
+
+# ====== VARIABLES AJUSTABLES ======
+# Carpeta local para el estado de los scripts (caché, marcas de agua, índices)
+DATA_DIR = os.path.join(os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache"),
+                        "despacho_agregados")
+CACHE_DIR = os.path.join(DATA_DIR, "tablas")
+CACHE_MAX_BYTES = 64 * 1024 * 1024   # tamaño total máximo de la caché
+CACHE_MAX_DIAS = 14                  # entradas sin uso por más días se eliminan
+
+_EXTENSION = ".bin"
+_VERSION_FORMATO = 1
+
+
+class HuellaLibro(NamedTuple):
+    """Identifica una versión concreta del libro."""
+    ruta: str
+    tamano: int
+    mtime_ns: int
+    hash_contenido: str
+
+
+# ====== HUELLA ======
+def hash_contenido_zip(origen) -> str:
+    """Hash (blake2b) del directorio central del xlsx: nombre, CRC32 y tamaño de cada parte."""
+    h = hashlib.blake2b(digest_size=16)
+    with zipfile.ZipFile(origen) as zf:
+        for info in zf.infolist():
+            h.update(f"{info.filename}\0{info.CRC:08x}\0{info.file_size}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def huella_libro(xlsx_path: str, origen=None) -> HuellaLibro:
+    """
+    Calcula la huella del libro. `origen` es de donde se puede leer el zip
+    (la ruta original o el BytesIO si el archivo está bloqueado).
+    """
+    st = os.stat(xlsx_path)
+    return HuellaLibro(os.path.normcase(os.path.abspath(xlsx_path)),
+                       st.st_size,
+                       st.st_mtime_ns,
+                       hash_contenido_zip(origen if origen is not None else xlsx_path))
+
+
+def _ruta_entrada(huella: HuellaLibro, hoja: str, tabla: str) -> str:
+    clave = "\0".join([huella.ruta, str(huella.tamano), str(huella.mtime_ns),
+                       huella.hash_contenido, hoja, tabla])
+    nombre = hashlib.sha1(clave.encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, nombre + _EXTENSION)
+
+
+# ====== LECTURA / ESCRITURA ======
+def obtener(huella: HuellaLibro, hoja: str, tabla: str) -> Optional[list]:
+    """Devuelve las filas guardadas para (hoja, tabla) de esa versión del libro, o None si no hay."""
+    path = _ruta_entrada(huella, hoja, tabla)
+    try:
+        with open(path, "rb") as f:
+            version, clave, filas = pickle.loads(zlib.decompress(f.read()))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"[WARN] Entrada de caché ilegible ({e}); se descarta.")
+        _borrar(path)
+        return None
+
+    if version != _VERSION_FORMATO or clave != (tuple(huella), hoja, tabla):
+        return None
+    try:
+        os.utime(path, None)  # marca de uso reciente (LRU)
+    except OSError:
+        pass
+    return filas
+
+
+def guardar(huella: HuellaLibro, hoja: str, tabla: str, filas: List[tuple]) -> None:
+    """Guarda las filas de (hoja, tabla) y aplica la política de eviction. Los errores no cortan el flujo."""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path = _ruta_entrada(huella, hoja, tabla)
+        datos = zlib.compress(pickle.dumps((_VERSION_FORMATO, (tuple(huella), hoja, tabla), filas),
+                                           protocol=pickle.HIGHEST_PROTOCOL))
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(datos)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"[WARN] No se pudo escribir la caché de tablas: {e}")
+        return
+    purgar()
+
+
+# ====== ÍNDICE DE TABLAS (sidecar por libro) ======
+def _ruta_indice(huella: HuellaLibro) -> str:
+    nombre = hashlib.sha1(huella.ruta.encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, f"indice_{nombre}.json")
+
+
+def obtener_indice(huella: HuellaLibro) -> Optional[dict]:
+    """Índice de tablas guardado para el libro, o None si no hay o es de otra versión del libro."""
+    try:
+        with open(_ruta_indice(huella), "r", encoding="utf-8") as f:
+            datos = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if datos.get("version") != _VERSION_FORMATO or datos.get("huella") != list(huella):
+        return None
+    return datos.get("tablas")
+
+
+def guardar_indice(huella: HuellaLibro, tablas: dict) -> None:
+    """Guarda el índice de tablas del libro (uno por ruta; reemplaza al de la versión anterior)."""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path = _ruta_indice(huella)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": _VERSION_FORMATO, "huella": list(huella), "tablas": tablas},
+                      f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"[WARN] No se pudo escribir el índice de tablas: {e}")
+
+
+def _borrar(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def purgar(max_bytes: int = None, max_dias: float = None) -> None:
+    """Elimina entradas vencidas por antigüedad y luego las menos usadas hasta quedar bajo max_bytes."""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    max_dias = CACHE_MAX_DIAS if max_dias is None else max_dias
+    try:
+        nombres = os.listdir(CACHE_DIR)
+    except OSError:
+        return
+
+    limite = time.time() - max_dias * 86400
+    entradas = []
+    for nombre in nombres:
+        if not nombre.endswith(_EXTENSION):
+            continue
+        path = os.path.join(CACHE_DIR, nombre)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        if st.st_mtime < limite:
+            _borrar(path)
+            continue
+        entradas.append((st.st_mtime, st.st_size, path))
+
+    total = sum(size for _, size, _ in entradas)
+    for _, size, path in sorted(entradas):
+        if total <= max_bytes:
+            break
+        _borrar(path)
+        total -= size
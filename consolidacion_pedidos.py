@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Consolidación opcional de pedidos antes del ingreso en UNICON.
+
+Cada pedido es un ciclo completo en la UI remota (refrescar, planta, Salidas, 8 TABs,
+agregado, despachar y confirmar), de varios segundos en Citrix. Muchas filas del día
+repiten el mismo (agregado, planta); cuando la regla del negocio lo permite, esas filas
+se ingresan como UN solo pedido con el cubicaje sumado.
+
+Regla:
+- Solo se juntan filas con el mismo agregado y la misma planta.
+- Si se indica `agregados`, solo esos agregados se consolidan; el resto va fila por fila.
+- Con `max_cubicaje`, un pedido consolidado no supera ese total: el grupo se parte en
+  varios pedidos, en el orden de las filas. Una fila que ya lo supera va sola.
+
+Cada PedidoConsolidado guarda las filas de la tabla que cubre (auditoría y estado por fila).
+"""
+
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from validacion_lotes import Pedido
+
+
+class PedidoConsolidado(NamedTuple):
+    """Pedido a ingresar en UNICON. `fila` es la primera fila del grupo; `filas`, todas las que cubre."""
+    fila: int
+    agregado: str
+    planta: str
+    cubicaje: float
+    filas: Tuple[int, ...]
+
+
+def consolidar_pedidos(pedidos: Sequence[Pedido], max_cubicaje: Optional[float] = None,
+                       agregados: Optional[Iterable[str]] = None) -> List[PedidoConsolidado]:
+    """
+    Agrupa los pedidos por (agregado, planta) y suma el cubicaje de cada grupo.
+    Los grupos salen en el orden de su primera fila; dentro del grupo se respeta el orden de las filas.
+    """
+    permitidos = {a.upper() for a in agregados} if agregados is not None else None
+    grupos: Dict[Tuple[str, str], List[List[Pedido]]] = {}
+    orden: List[List[Pedido]] = []
+
+    for p in pedidos:
+        if permitidos is not None and p.agregado.upper() not in permitidos:
+            orden.append([p])
+            continue
+        partes = grupos.setdefault((p.agregado, p.planta), [])
+        if partes:
+            actual = partes[-1]
+            total = sum(q.cubicaje for q in actual) + p.cubicaje
+            if max_cubicaje is None or total <= max_cubicaje:
+                actual.append(p)
+                continue
+        nueva = [p]
+        partes.append(nueva)
+        orden.append(nueva)
+
+    return [PedidoConsolidado(fila=grupo[0].fila, agregado=grupo[0].agregado, planta=grupo[0].planta,
+                              cubicaje=round(sum(q.cubicaje for q in grupo), 3),
+                              filas=tuple(q.fila for q in grupo))
+            for grupo in orden]
+
+
+def sin_consolidar(pedidos: Sequence[Pedido]) -> List[PedidoConsolidado]:
+    """Un PedidoConsolidado por fila (consolidación desactivada)."""
+    return [PedidoConsolidado(p.fila, p.agregado, p.planta, p.cubicaje, (p.fila,)) for p in pedidos]
+
+
+def mapa_auditoria(consolidados: Sequence[PedidoConsolidado]) -> Dict[int, Tuple[int, ...]]:
+    """{fila del pedido ingresado: filas de la tabla que cubre}."""
+    return {c.fila: c.filas for c in consolidados}
+
+
+def ciclos_ahorrados(consolidados: Sequence[PedidoConsolidado]) -> int:
+    """Ciclos de UI que se evitan: filas cubiertas menos pedidos a ingresar."""
+    return sum(len(c.filas) for c in consolidados) - len(consolidados)
+
+
+def imprimir_consolidacion(consolidados: Sequence[PedidoConsolidado]) -> None:
+    """Reporte de auditoría: qué filas entran en cada pedido y cuántos ciclos se ahorran."""
+    filas = sum(len(c.filas) for c in consolidados)
+    print(f"[INFO] Consolidación: {filas} fila(s) -> {len(consolidados)} pedido(s) "
+          f"({ciclos_ahorrados(consolidados)} ciclo(s) de UI ahorrados).")
+    for c in consolidados:
+        if len(c.filas) > 1:
+            lista = ", ".join(str(f) for f in c.filas)
+            print(f"   - {c.agregado}-{c.planta}: {c.cubicaje:g} m3 <- filas {lista}")
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Corrida combinada de la mañana: despacho de placas (despacho_placas.py) y luego
+ingreso de pedidos (pedidos_distribucion.py) con UNA sola lectura del libro.
+
+Los rangos y columnas se toman de la configuración de cada script
+(START_ROW_IN_TABLE, END_ROW_IN_TABLE, TARGET_COLUMN_INDEX*); ambos deben apuntar
+al mismo EXCEL_PATH y TABLE_NAME. La tabla se busca solo en la hoja del día.
+
+Entre las dos etapas el script espera Enter: deja la ventana de PEDIDOS_DISTRIBUCION
+justo detrás de la terminal (el foco se toma con Alt+Tab, como en pedidos_distribucion.py).
+"""
+
+import sys
+import time
+
+import despacho_placas as dp
+import pedidos_distribucion as pd
+from espejo_sqlite import LectorEspejo
+from estado_despacho import RegistroEstados, medir
+from espera_ui import imprimir_metricas
+from planificador_pedidos import imprimir_ahorro_real
+from registro_despachos import RegistroDespachos
+from tabla_excel import LectorTabla, nombres_hoja_del_dia
+
+
+def main():
+    if (dp.EXCEL_PATH, dp.TABLE_NAME) != (pd.EXCEL_PATH, pd.TABLE_NAME):
+        print("❌ despacho_placas.py y pedidos_distribucion.py apuntan a libros o tablas distintas; "
+              "ejecuta cada script por separado.")
+        sys.exit(1)
+
+    print("Cargando placas y pedidos desde Excel (una sola lectura)...")
+    try:
+        Lector = LectorEspejo if dp.USAR_ESPEJO_SQLITE else LectorTabla
+        lector = Lector(dp.EXCEL_PATH, dp.TABLE_NAME,
+                        hojas_preferidas=nombres_hoja_del_dia(), buscar_en_todas=False)
+        dp.registrar_placas(lector, dp.START_ROW_IN_TABLE, dp.END_ROW_IN_TABLE, dp.TARGET_COLUMN_INDEX)
+        pd.registrar_pedidos(lector)
+        lectura = lector.leer()
+        despachados = RegistroDespachos(dp.EXCEL_PATH, lectura[0].hoja)
+        placas = dp.placas_desde_lectura(lectura, dp.EXCEL_PATH, dp.END_ROW_IN_TABLE, dp.TARGET_COLUMN_INDEX)
+        placas = dp.omitir_despachadas(despachados, placas)
+        pedidos = pd.omitir_ingresados(despachados, pd.pedidos_desde_lectura(lectura))
+        pedidos = pd.consolidar_lote_pedidos(pedidos)
+        pedidos, plan = pd.ordenar_lote_pedidos(pedidos)
+    except Exception as e:
+        print(f"\n❌ Error leyendo Excel/Tabla: {e}")
+        sys.exit(1)
+
+    print(f"✅ {len(placas)} placa(s) y {len(pedidos)} pedido(s) listos.")
+
+    ubicacion = lectura[0]
+
+    # 1) Placas (SDC / módulo de ALMACEN)
+    if placas:
+        conductores = dp.historial_conductores()
+        dp.preparar_sdc()
+        estados = RegistroEstados(dp.EXCEL_PATH, ubicacion, dp.COLUMNA_ESTADO) if dp.COLUMNA_ESTADO else None
+        try:
+            for p in placas:
+                with medir(estados, p.fila):
+                    dp.flujo_despacho_para_placa(p.placa, dp.conductor_para(p.placa, conductores))
+                despachados.confirmar("placa", [p.fila])
+        finally:
+            despachados.guardar()
+            if estados is not None:
+                estados.escribir()
+        print("\n✅ Placas despachadas.")
+
+    # 2) Pedidos (módulo PEDIDOS_DISTRIBUCION)
+    if pedidos:
+        input("Deja PEDIDOS_DISTRIBUCION justo detrás de esta ventana y presiona Enter...")
+        pd.focus_unicon_window()
+        estados = RegistroEstados(pd.EXCEL_PATH, ubicacion, pd.COLUMNA_ESTADO) if pd.COLUMNA_ESTADO else None
+        t0 = time.perf_counter()
+        try:
+            anterior = None
+            for i, pedido in enumerate(pedidos, start=1):
+                with medir(estados, pedido.filas):
+                    pd.procesar_pedido(i, pedido.agregado, pedido.planta, pedido.cubicaje, anterior)
+                despachados.confirmar("pedido", pedido.filas)
+                anterior = pedido.planta
+                time.sleep(pd.PAUSA_ENTRE_PEDIDOS)
+        finally:
+            despachados.guardar()
+            if estados is not None:
+                estados.escribir()
+        imprimir_ahorro_real(plan, time.perf_counter() - t0)
+        print("\n✅ Pedidos procesados.")
+    imprimir_metricas()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,7 @@ Automatización de despacho UNICON leyendo placas desde una tabla de Excel.
 
 Autor: Elmer-ready
 Notas:
-- El script NO depende de la ventana de Excel: lee el archivo directamente con openpyxl.
+- El script NO depende de la ventana de Excel: lee el archivo directamente con openpyxl (modo streaming, ver tabla_excel.py).
 - Asegúrate de que la ventana remota de UNICON esté al frente y en el estado inicial correcto.
 - Por defecto espera F8 para continuar tras la selección manual del conductor. Si 'keyboard' no está instalado, pedirá Enter.
 
@@ -12,14 +12,10 @@ Notas:
 
 import time
 import sys
-from typing import List, Optional
-import warnings
-from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 import ctypes
 from pywinauto.keyboard import send_keys
-import shutil
-import tempfile
-import os
 
 # ====== VARIABLES AJUSTABLES (CAMBIA AQUÍ) ======
 EXCEL_PATH = r"C:\Users\ealpiste\OneDrive - Unacem.corp\Compartido Victor\DESPACHO DE AGREGADOS_YB 2025 2.3.xlsx"  # Cambia a tu ruta real
@@ -27,6 +23,15 @@ TABLE_NAME = "Tabla276"            # Nombre de la tabla (variable)
 START_ROW_IN_TABLE = 53             # Fila inicial dentro de la tabla (sin contar cabecera)
 END_ROW_IN_TABLE =   52                # Fila final dentro de la tabla (sin contar cabecera)
 TARGET_COLUMN_INDEX = 3              # 3ª columna de la tabla (1 = primera, 2 = segunda, 3 = tercera)
+MODO_VIGILANCIA = False              # True: despacha las filas nuevas a medida que se escriben (ignora END_ROW_IN_TABLE)
+USAR_ESPEJO_SQLITE = False           # True: lee la cola desde el espejo SQLite (espejo_sqlite.py) en vez del xlsx
+COLUMNA_ESTADO = None                # Columna de la tabla (1-based) donde se escribe OK/ERROR por placa; None: no se escribe
+VALIDAR_CONTRA_FLOTA = False         # Revisa cada placa contra el índice de la flota (indice_placas.py) antes de despachar
+PLACAS_MAESTRO = None                # Archivo .txt/.csv con la lista maestra de placas (None: solo el historial del espejo SQLite)
+RECHAZAR_PLACAS_NUEVAS = False       # True: también descarta placas sin ninguna parecida en el índice (camiones nuevos)
+RECHAZAR_PLACAS_PARECIDAS = False    # True: descarta las placas desconocidas con una conocida parecida (si no, solo se avisa)
+PERMITIR_DUPLICADOS = False          # True: despacha igual las filas ya despachadas en corridas anteriores (registro_despachos.py)
+CONDUCTOR_AUTOMATICO = False         # True: elige el conductor habitual de la placa (historial_conductores.py); F8 solo si hay duda
 
 # Ventana remota (referencial, no usada por pyautogui directamente; sirve como documentación)
 WINDOW_TITLE_REMOTO = r"UNICON  - Módulo de ALMACEN - ELMER JEAN PIERRE ALPISTE RAMIRE - \\Remota"
@@ -35,18 +40,27 @@ WINDOW_TITLE_REMOTO = r"UNICON  - Módulo de ALMACEN - ELMER JEAN PIERRE ALPISTE
 SHIFT_TABS_A_BOTON_NOMBRE = 8       # Cantidad de Shift+Tab para llegar al botón sin nombre
 FILTRO_NOMBRE_TEXTO = "alp"         # Texto del filtro para seleccionar "Alpiste Ramírez"
 KEY_CONTINUAR = "f8"                 # Tecla que el usuario presionará para continuar tras seleccionar conductor
+LARGO_FILTRO_CONDUCTOR = None        # Caracteres del nombre del conductor que se escriben en el filtro (None: nombre completo)
 DELAY_CORTO = 0.01                    # Pequeñas esperas entre teclas
 DELAY_MEDIO = 0.25
 DELAY_LARGO = 0.6
 
 # ====== IMPORTS PARA EXCEL Y TECLADO ======
-try:
-    import openpyxl
-    from openpyxl.utils.cell import get_column_letter
-    from openpyxl.utils import range_boundaries
-except Exception as e:
-    print("ERROR: No se pudo importar openpyxl. Instálalo con: pip install openpyxl")
-    raise
+from espejo_sqlite import LectorEspejo
+from estado_despacho import RegistroEstados, medir, omitir_ya_ok
+import latencia
+from espera_ui import Condicion, PoliticaSondeo, en_primer_plano, imprimir_metricas, ventana_ausente, \
+    ventana_presente, wait_until
+from flujos import Accion, Esperar, Param, Si, Teclas, Texto, compilar, ejecutar, resumen
+from flujos import Plan as PlanFlujo
+from historial_conductores import HistorialConductores, cargar_historial
+from indice_placas import IndicePlacas, cargar_indice, clave_placa, validar_contra_indice
+from registro_despachos import RegistroDespachos
+import registro_ventanas
+from registro_ventanas import es_titulo_modulo
+from tabla_excel import LectorTabla, UbicacionTabla, nombres_hoja_del_dia
+from validacion_lotes import Placa, imprimir_rechazos, validar_placas
+from vigilante_tabla import VigilanteTabla
 
 try:
     import pyautogui as pag
@@ -67,85 +81,80 @@ try:
     KEYBOARD_AVAILABLE = True
 except Exception:
     KEYBOARD_AVAILABLE = False
-# ====== IMPORTS PARA CONEXIÓN VENTANA REMOTA ======
-try:
-    from pywinauto import Desktop, Application
-except Exception:
-    print("ERROR: No se pudo importar pywinauto. Instálalo con: pip install pywinauto")
-    raise
 
 
 # ====== UTILIDADES EXCEL ======
-def crear_copia_temporal(xlsx_path: str) -> str:
-    """Crea una copia temporal del archivo xlsx y devuelve la ruta (delete=False)."""
-    fd, tmp_path = tempfile.mkstemp(suffix=".xlsx")
-    os.close(fd)
-    shutil.copy2(xlsx_path, tmp_path)
-    return tmp_path
+PROYECCION_PLACAS = "placas"
+PROYECCION_ESTADO_PLACAS = "estado_placas"
 
 
-def encontrar_tabla_en_libro(xlsx_path: str, table_name: str):
-    """
-    Busca la tabla por nombre en todas las hojas del libro y devuelve
-    (wb, ws, ref, min_col, min_row, max_col, max_row, temp_path).
-    temp_path es None si no se creó copia temporal, o la ruta al temporal si sí.
+def registrar_placas(lector: LectorTabla,
+                     start_row_in_table: int,
+                     end_row_in_table: int,
+                     target_column_index: int = 3) -> None:
+    """Registra en el lector compartido la columna de placas del rango (filas sin cabecera)."""
+    if start_row_in_table < 1 or end_row_in_table < 1:
+        raise IndexError("Las filas dentro de la tabla deben ser >= 1 (sin contar cabecera).")
+    if end_row_in_table < start_row_in_table:
+        raise IndexError("La fila final no puede ser menor que la inicial.")
+    lector.registrar(PROYECCION_PLACAS, start_row_in_table, end_row_in_table, [target_column_index])
+    if COLUMNA_ESTADO:
+        lector.registrar(PROYECCION_ESTADO_PLACAS, start_row_in_table, end_row_in_table, [COLUMNA_ESTADO])
+
+
+def placas_desde_lectura(lectura, xlsx_path: str, end_row_in_table: int,
+                         target_column_index: int = 3) -> List[Placa]:
+    """Valida la proyección de placas de una lectura (ubicacion, proyecciones) de LectorTabla.
+    Con COLUMNA_ESTADO se omiten las filas ya despachadas (estado OK).
     """
-    temp_path = None
-    # Suprimir warnings conocidos de openpyxl sobre Data Validation durante la carga
-    with warnings.catch_warnings():
-        warnings.filterwarnings("ignore", message="Data Validation extension is not supported")
-        try:
-            wb = openpyxl.load_workbook(xlsx_path, data_only=True)
-        except (PermissionError, OSError) as e:
-            print(f"[WARN] No se pudo abrir '{xlsx_path}' directamente ({e}). Creando copia temporal...")
-            temp_path = crear_copia_temporal(xlsx_path)
-            print(f"[INFO] Copia temporal creada")
-            wb = openpyxl.load_workbook(temp_path, data_only=True)
-
-    # Intentar seleccionar directamente la hoja con nombre "D.M" o "DD.MM" (p.ej. 29.12)
-    today = date.today()
-    candidates_names = {f"{today.day}.{today.month}", f"{today.day:02d}.{today.month:02d}"}
-    ws_list = []
-    for name in candidates_names:
-        if name in wb.sheetnames:
-            ws_list = [wb[name]]
-            break
-    # Si no encontramos la hoja con el formato día.mes, procesar todas las hojas (fallback)
-    if not ws_list:
-        ws_list = wb.worksheets
-
-    for ws in ws_list:
-        tablas = {}
-        if hasattr(ws, "_tables") and isinstance(ws._tables, dict):
-            tablas.update(ws._tables)
-        if hasattr(ws, "tables"):
-            try:
-                tablas.update(ws.tables)
-            except Exception:
-                pass
-
-        for nombre, tbl in tablas.items():
-            nombre_tbl = getattr(tbl, "name", None) or getattr(tbl, "displayName", None) or nombre
-            if nombre_tbl == table_name:
-                ref = getattr(tbl, "ref", None)
-                if not ref:
-                    # Ensure we still return temp_path so caller can cleanup
-                    raise ValueError(f"La tabla '{table_name}' no tiene rango definido (ref).")
-                min_col, min_row, max_col, max_row = range_boundaries(ref)
-                return wb, ws, ref, min_col, min_row, max_col, max_row, temp_path
-
-    # Si no encontró tabla, cerrar wb y eliminar temp si existe antes de lanzar
-    try:
-        wb.close()
-    except Exception:
-        pass
-    if temp_path:
-        try:
-            os.remove(temp_path)
-        except Exception:
-            pass
+    ubicacion, proyecciones = lectura
+    if end_row_in_table > ubicacion.filas_datos:
+        raise IndexError(
+            f"La fila final ({end_row_in_table}) excede las filas de datos ({ubicacion.filas_datos}) en la tabla de la hoja '{ubicacion.hoja}'."
+        )
+
+    placas, rechazos = validar_placas(proyecciones[PROYECCION_PLACAS])
+    imprimir_rechazos(rechazos, f"placas (columna {target_column_index})")
+    if COLUMNA_ESTADO:
+        placas = omitir_ya_ok(placas, proyecciones[PROYECCION_ESTADO_PLACAS], xlsx_path, ubicacion, COLUMNA_ESTADO)
+    return validar_contra_flota(placas)
+
+
+def indice_flota() -> Optional[IndicePlacas]:
+    """Índice de placas conocidas (maestro + historial), o None si no se valida o está vacío."""
+    if not VALIDAR_CONTRA_FLOTA:
+        return None
+    indice = cargar_indice(PLACAS_MAESTRO)
+    if not len(indice):
+        print("[INFO] Índice de placas vacío (sin maestro ni historial en el espejo SQLite); no se valida contra la flota.")
+        return None
+    return indice
+
+
+def validar_contra_flota(placas: List[Placa], indice: Optional[IndicePlacas] = None) -> List[Placa]:
+    """Normaliza las placas conocidas y avisa (o descarta, con RECHAZAR_PLACAS_PARECIDAS) las que parecen errores de tipeo."""
+    indice = indice if indice is not None else indice_flota()
+    if indice is None:
+        return placas
+    placas, rechazos = validar_contra_indice(placas, indice, RECHAZAR_PLACAS_NUEVAS, RECHAZAR_PLACAS_PARECIDAS)
+    imprimir_rechazos(rechazos, "placas (índice de la flota)")
+    return placas
 
-    raise ValueError(f"No se encontró la tabla '{table_name}' en el libro: {xlsx_path}")
+
+def cargar_placas(xlsx_path: str,
+                  table_name: str,
+                  start_row_in_table: int,
+                  end_row_in_table: int,
+                  target_column_index: int = 3) -> Tuple[UbicacionTabla, List[Placa]]:
+    """
+    Devuelve (ubicacion, placas) con Placa(fila, placa) desde la columna target de la tabla, considerando filas de datos (sin cabecera).
+    La tabla se busca primero en la hoja del día ("D.M" o "DD.MM") y luego en las demás hojas.
+    """
+    Lector = LectorEspejo if USAR_ESPEJO_SQLITE else LectorTabla
+    lector = Lector(xlsx_path, table_name, hojas_preferidas=nombres_hoja_del_dia())
+    registrar_placas(lector, start_row_in_table, end_row_in_table, target_column_index)
+    lectura = lector.leer()
+    return lectura[0], placas_desde_lectura(lectura, xlsx_path, end_row_in_table, target_column_index)
 
 
 def extraer_placas_desde_tabla(xlsx_path: str,
@@ -153,50 +162,42 @@ def extraer_placas_desde_tabla(xlsx_path: str,
                                start_row_in_table: int,
                                end_row_in_table: int,
                                target_column_index: int = 3) -> List[str]:
-    """
-    Devuelve una lista de placas (strings) desde la columna target de la tabla, considerando filas de datos (sin cabecera).
-    """
-    wb, ws, ref, min_col, min_row, max_col, max_row, temp_path = encontrar_tabla_en_libro(xlsx_path, table_name)
+    """Devuelve una lista de placas (strings) del rango de la tabla (ver cargar_placas)."""
+    _, placas = cargar_placas(xlsx_path, table_name, start_row_in_table, end_row_in_table, target_column_index)
+    return [p.placa for p in placas]
 
-    # Validaciones
-    cols_count = max_col - min_col + 1
-    rows_total_including_header = max_row - min_row + 1
-    rows_data = rows_total_including_header - 1  # quita la cabecera
 
-    if target_column_index < 1 or target_column_index > cols_count:
-        raise IndexError(f"La columna {target_column_index} está fuera del rango de la tabla (1..{cols_count}).")
+def omitir_despachadas(despachados: RegistroDespachos, placas: List[Placa]) -> List[Placa]:
+    """Descarta las filas ya despachadas en corridas anteriores y las repetidas en el lote (un solo reporte)."""
+    placas, rechazos = despachados.filtrar("placa", placas, lambda p: (clave_placa(p.placa),), PERMITIR_DUPLICADOS)
+    imprimir_rechazos(rechazos, "placas (duplicadas)")
+    return placas
 
-    if start_row_in_table < 1 or end_row_in_table < 1:
-        raise IndexError("Las filas dentro de la tabla deben ser >= 1 (sin contar cabecera).")
-    if end_row_in_table < start_row_in_table:
-        raise IndexError("La fila final no puede ser menor que la inicial.")
-    if end_row_in_table > rows_data:
-        raise IndexError(
-            f"La fila final ({end_row_in_table}) excede las filas de datos ({rows_data}) en la tabla '{table_name}'."
-        )
 
-    # Coordenadas absolutas en hoja
-    data_start_row_abs = min_row + 1  # primera fila de datos (justo debajo de la cabecera)
-    target_col_abs = min_col + target_column_index - 1
-
-    placas = []
-    for idx in range(start_row_in_table, end_row_in_table + 1):
-        r_abs = data_start_row_abs + (idx - 1)
-        cell = ws.cell(row=r_abs, column=target_col_abs)
-        val = cell.value
-        if val is None:
-            print(f"ADVERTENCIA: Celda vacía en fila {idx} de la tabla, columna {target_column_index}. Se omite.")
-            continue
-        placas.append(str(val).strip())
-
-    wb.close()
-    # Eliminar copia temporal si se creó
-    try:
-        if 'temp_path' in locals() and temp_path:
-            os.remove(temp_path)
-    except Exception:
-        pass
-    return placas
+def historial_conductores() -> Optional[HistorialConductores]:
+    """Historial placa -> conductor del espejo SQLite, o None si CONDUCTOR_AUTOMATICO está apagado o no hay datos."""
+    if not CONDUCTOR_AUTOMATICO:
+        return None
+    historial = cargar_historial()
+    if not len(historial):
+        print("[INFO] Sin historial de conductores en el espejo SQLite; el conductor se elige a mano (F8).")
+        return None
+    return historial
+
+
+def conductor_para(placa: str, historial: Optional[HistorialConductores]) -> Optional[str]:
+    """Conductor a elegir automáticamente para la placa, o None para el camino manual (F8)."""
+    if historial is None:
+        return None
+    sugerencia = historial.sugerir(placa)
+    if not historial.es_confiable(sugerencia):
+        detalle = (f"{sugerencia.conductor} en {sugerencia.confianza:.0%} de {sugerencia.despachos} despacho(s)"
+                   if sugerencia else "sin historial")
+        print(f"[INFO] {placa}: conductor dudoso ({detalle}); selección manual.")
+        return None
+    print(f"[INFO] {placa}: conductor {sugerencia.conductor} "
+          f"({sugerencia.confianza:.0%} de {sugerencia.despachos} despachos recientes).")
+    return sugerencia.conductor
 
 
 # ====== UTILIDADES DE ENTRADA/TECLAS ======
@@ -227,31 +228,12 @@ def esperar_confirmacion_usuario(key: str = KEY_CONTINUAR):
 
 
 # ====== UTILIDADES DE CONEXIÓN Y FOCO (pywinauto) ======
-def _match_sdc_title(title: str) -> bool:
-    """Identifica la ventana del RemoteApp por substrings tolerantes.
-
-    Requiere que el título contenga *ambos* 'unicon' y 'almacen' (case-insensitive).
-    """
-    return bool(title) and ("unicon" in title.lower()) and ("almacen" in title.lower())
-
-
 def conectar_sdc():
-    """Conecta a la ventana principal del SDC (ALMACEN) probando UIA/Win32.
+    """Conecta a la ventana principal del SDC (ALMACEN) vía registro_ventanas (handle guardado o enumeración).
     Devuelve (app, win) o lanza RuntimeError si no encuentra la ventana.
     """
-    for backend in ("uia", "win32"):
-        try:
-            desktop = Desktop(backend=backend)
-            candidates = [w for w in desktop.windows() if _match_sdc_title(w.window_text())]
-            if candidates:
-                target = candidates[0]
-                app = Application(backend=backend).connect(handle=target.handle)
-                win = app.window(handle=target.handle)
-                print(f"[INFO] Conectado a: '{target.window_text()}' (backend={backend}, handle={target.handle})")
-                return app, win
-        except Exception:
-            continue
-    raise RuntimeError("No pude conectar al SDC (ALMACEN). Verifica que esté visible y maximizado.")
+    app, win, _ = registro_ventanas.conectar("ALMACEN")
+    return app, win
 
 
 user32 = ctypes.windll.user32
@@ -337,50 +319,21 @@ def wait_for_registro_salidas_close(title_substr: str = r"Registro de Salidas po
     """
     Espera hasta que no exista una ventana cuyo título contenga `title_substr`.
     Usa backend 'win32' ya que la ventana sólo es visible con ese backend.
-    Retorna True si desaparece antes del timeout, False si vence el timeout o ocurre un fallo.
+    Retorna True si desaparece antes del timeout, False si vence el timeout.
     """
-    try:
-        desktop = Desktop(backend="win32")
-    except Exception:
-        # No podemos usar win32: no bloquear el flujo
+    if wait_until(ventana_ausente(title_substr), timeout, PoliticaSondeo(0.05, 1.5, poll_interval)):
         return True
-
-    t0 = time.time()
-    while True:
-        try:
-            found = any(title_substr.lower() in w.window_text().lower() for w in desktop.windows())
-        except Exception:
-            # En caso de error al listar ventanas, continuar para evitar bloqueo
-            return True
-
-        if not found:
-            return True
-        if time.time() - t0 > timeout:
-            print(f"[WARN] Timeout ({timeout}s) esperando que desaparezca '{title_substr}'")
-            return False
-        time.sleep(poll_interval)
+    print(f"[WARN] Timeout ({timeout}s) esperando que desaparezca '{title_substr}'")
+    return False
 
 def sdc_active(win, poll_interval: float = 0.25) -> bool:
     """
-    Bloquea hasta que la ventana `win` del SDC esté en foreground y su título coincida con _match_sdc_title().
+    Bloquea hasta que la ventana `win` del SDC esté en foreground y su título coincida con el módulo ALMACEN.
     Retorna True cuando la ventana está activa.
     """
-    while True:
-        try:
-            # Si el foreground coincide con el handle y el título coincide, consideramos la ventana activa
-            if is_sdc_foreground(win):
-                try:
-                    title = win.window_text()
-                except Exception:
-                    title = ""
-                if _match_sdc_title(title):
-                    return True            
-        except KeyboardInterrupt:
-            raise
-        except Exception:
-            # Ignorar errores temporales y seguir intentando
-            pass
-        time.sleep(poll_interval)
+    titulo_sdc = Condicion(lambda: es_titulo_modulo(win.window_text(), "ALMACEN"), "título SDC")
+    return wait_until(en_primer_plano(win.handle) & titulo_sdc, None, PoliticaSondeo(0.02, 1.5, poll_interval),
+                      nombre="SDC activo")
 
 # ====== FLUJO DE DESPACHO EN REMOTO ======
 def wait_for_informacion_window(title_substr: str = r"Información - \\Remota",
@@ -391,158 +344,234 @@ def wait_for_informacion_window(title_substr: str = r"Información - \\Remota",
     Una vez que aparece, envía SPACE para cerrarla y continuar.
     Retorna True si la ventana apareció y se cerró, False si vence el timeout.
     """
-    try:
-        desktop = Desktop(backend="win32")
-    except Exception:
-        print("[WARN] No se pudo usar win32 backend para esperar ventana Información")
+    if not wait_until(ventana_presente(title_substr, visible=True), timeout, PoliticaSondeo(0.05, 1.5, poll_interval)):
+        print(f"[WARN] Timeout ({timeout}s) esperando que aparezca '{title_substr}'")
         return False
 
-    t0 = time.time()
-    while True:
-        try:
-            windows = desktop.windows()
-            found = any(title_substr.lower() in w.window_text().lower() for w in windows)
-        except Exception:
-            found = False
+    print(f"[INFO] Ventana '{title_substr}' detectada. Enviando SPACE para cerrar...")
+    time.sleep(0.5)  # pequeña pausa para asegurar que la ventana esté lista
+    send_keys("{SPACE}")
+    time.sleep(DELAY_MEDIO)
+    return True
+
+
+# Selección automática del conductor (paso 7), ajustable: mismo patrón que el filtro de nombre
+# del paso 3. No lleva la 'a' (Aceptar) del paso 3 a propósito: la selección manual (F8) deja el
+# selector en el mismo estado, y la primera 'a' del paso 8 es ese Aceptar para ambos caminos.
+# Si en tu UI el selector de conductor necesita su propio Aceptar, agrega Teclas("a") al final.
+PASOS_CONDUCTOR = (
+    Teclas("{SPACE}"), Esperar("DELAY_MEDIO"),                  # abre selector de conductor
+    Texto(Param("filtro_conductor")), Esperar("DELAY_MEDIO"),   # escribe el nombre (LARGO_FILTRO_CONDUCTOR)
+    Teclas("{TAB}"), Esperar("DELAY_CORTO"),
+    Teclas("{SPACE}"), Esperar("DELAY_MEDIO"),                  # confirma selección
+)
+
+# Pasos del despacho de una placa (ver flujos.py). Las esperas se nombran con las constantes DELAY_*.
+FLUJO_PLACA = (
+    # 2) Tecla D (botón 'Despacho')
+    Teclas("d"), Esperar("DELAY_LARGO"),
+    # 3) 8× Shift+Tab → Espacio → 'alp' → Tab → Espacio → 'A'
+    Teclas("+{TAB}", veces=SHIFT_TABS_A_BOTON_NOMBRE), Esperar("DELAY_CORTO"),
+    Teclas("{SPACE}"), Esperar("DELAY_MEDIO"),                  # abre selector de nombre
+    Texto(FILTRO_NOMBRE_TEXTO), Esperar("DELAY_MEDIO"),         # escribe "alp"
+    Teclas("{TAB}"), Esperar("DELAY_CORTO"),
+    Teclas("{SPACE}"), Esperar("DELAY_MEDIO"),                  # confirma selección (abre/acepta según UI)
+    Teclas("a"), Esperar("DELAY_MEDIO"),                        # Aceptar (cierra ventana de nombre)
+    # 4) Tab → Espacio (abre ventana donde se ingresa la placa)
+    Teclas("{TAB}"), Esperar("DELAY_CORTO"),
+    Teclas("{SPACE}"), Esperar("DELAY_MEDIO"),
+    # 5) Shift+Tab → Ctrl+V para pegar placa
+    Teclas("+{TAB}"), Esperar("DELAY_CORTO"),
+    Accion(lambda p: pegar_texto_desde_clipboard(p["placa"]), "pegar placa"), Esperar("DELAY_MEDIO"),
+    # 6) Shift+Tab → Espacio (acepta)
+    Teclas("+{TAB}"), Esperar("DELAY_CORTO"),
+    Teclas("{SPACE}"), Esperar("DELAY_MEDIO"),
+    # 6.1) Shift+Tab x2
+    Teclas("+{TAB}", veces=2),
+    # 7) Conductor: automático si el historial es confiable (PASOS_CONDUCTOR);
+    #    si no, selección manual → F8 para continuar
+    Si("conductor",
+       PASOS_CONDUCTOR,
+       (Accion(lambda p: esperar_confirmacion_usuario(KEY_CONTINUAR), "confirmación manual"),)),
+    # 8) A → A para cerrar ventanas
+    Teclas("a"), Esperar("DELAY_MEDIO"),
+    Teclas("a"), Esperar("DELAY_LARGO"),
+    Teclas("{SPACE}"), Esperar("DELAY_MEDIO"),
+    # Esperar que aparezca la pantalla "Información - \\Remota" → SPACE para continuar
+    Accion(lambda p: wait_for_informacion_window(r"Información - \\Remota", timeout=100.0), "ventana Información",
+           latencia=True),
+)
+
+
+def esperas() -> dict:
+    """Valores vigentes de las esperas nombradas en FLUJO_PLACA (ajustados con LATENCIA_ADAPTATIVA)."""
+    return latencia.controlador().esperas(
+        {"DELAY_CORTO": DELAY_CORTO, "DELAY_MEDIO": DELAY_MEDIO, "DELAY_LARGO": DELAY_LARGO})
 
-        if found:
-            print(f"[INFO] Ventana '{title_substr}' detectada. Enviando SPACE para cerrar...")
-            time.sleep(0.5)  # pequeña pausa para asegurar que la ventana esté lista
-            send_keys("{SPACE}")
-            time.sleep(DELAY_MEDIO)
-            return True
-        
-        if time.time() - t0 > timeout:
-            print(f"[WARN] Timeout ({timeout}s) esperando que aparezca '{title_substr}'")
-            return False
-        
-        time.sleep(poll_interval)
 
+def plan_placa(placa: str, conductor: Optional[str] = None) -> PlanFlujo:
+    """Compila FLUJO_PLACA para una placa (ver flujo_despacho_para_placa)."""
+    params = {"placa": placa, "conductor": bool(conductor), "filtro_conductor": ""}
+    if conductor:
+        params["filtro_conductor"] = conductor[:LARGO_FILTRO_CONDUCTOR] if LARGO_FILTRO_CONDUCTOR else conductor
+    return compilar("placa", FLUJO_PLACA, params, esperas())
 
-def flujo_despacho_para_placa(placa: str):
+
+def flujo_despacho_para_placa(placa: str, conductor: Optional[str] = None):
     """
     Ejecuta la secuencia de teclas en la ventana remota para procesar una placa.
     Se asume que la ventana remota ya está en foco y en estado inicial.
+    Con `conductor` se elige automáticamente; sin él se espera la selección manual (F8).
     """
     print(f"\n➡️ Procesando placa: {placa}")
+    ejecutar(plan_placa(placa, conductor))
 
-    # 2) Tecla D (botón 'Despacho')
-    pag.press("d")
-    time.sleep(DELAY_LARGO)
 
-    # 3) 8× Shift+Tab → Espacio → 'alp' → Tab → Espacio → 'A'
-    for _ in range(SHIFT_TABS_A_BOTON_NOMBRE):
-        send_keys('+{TAB}')
-    time.sleep(DELAY_CORTO)
+# ============== FLUJO PRINCIPAL ==============
+def _cronometrar(funcion, *args):
+    """Ejecuta funcion(*args) y devuelve (resultado, segundos)."""
+    t0 = time.perf_counter()
+    resultado = funcion(*args)
+    return resultado, time.perf_counter() - t0
 
-    send_keys("{SPACE}")  # abre selector de nombre
-    time.sleep(DELAY_MEDIO)
 
-    pag.typewrite(FILTRO_NOMBRE_TEXTO, interval=0.05)  # escribe "alp"
-    time.sleep(DELAY_MEDIO)
+def conectar_sdc_o_salir(tiempos: Optional[dict] = None):
+    """Conecta al SDC sin enviar teclas. Devuelve (app, win); sale del script si no lo encuentra.
+    Si se pasa `tiempos`, guarda ahí la duración ('conexion').
+    """
+    tiempos = {} if tiempos is None else tiempos
+    try:
+        (app, win), tiempos["conexion"] = _cronometrar(conectar_sdc)
+    except Exception as e:
+        print(f"[ERROR] No pude conectar al SDC: {e}")
+        sys.exit(1)
+    return app, win
 
-    send_keys("{TAB}")
-    time.sleep(DELAY_CORTO)
 
-    send_keys("{SPACE}")  # confirma selección (abre/acepta según UI)
-    time.sleep(DELAY_MEDIO)
+def traer_sdc_al_frente(win, tiempos: Optional[dict] = None) -> None:
+    """Trae el SDC al frente (puede enviar Alt+Tab). Si se pasa `tiempos`, guarda ahí 'foco'."""
+    tiempos = {} if tiempos is None else tiempos
+    enfocado, tiempos["foco"] = _cronometrar(go_to_sdc, win)
+    if not enfocado:
+        print("[WARN] No pude recuperar foco del SDC tras leer Excel.")
+    else:
+        print("[INFO] Ventana SDC enfocada.")
+        rect = win.rectangle()
+        latencia.controlador().usar_region((rect.left, rect.top, rect.width(), rect.height()))
 
-    pag.press("a")  # Aceptar (cierra ventana de nombre)
-    time.sleep(DELAY_MEDIO)
 
-    # 4) Tab → Espacio (abre ventana donde se ingresa la placa)
-    send_keys("{TAB}")
-    time.sleep(DELAY_CORTO)
-    send_keys("{SPACE}")
-    time.sleep(DELAY_MEDIO)
+def enfocar_sdc(tiempos: Optional[dict] = None):
+    """Conecta al SDC y lo trae al frente. Devuelve (app, win); sale del script si no lo encuentra.
+    Si se pasa `tiempos`, guarda ahí la duración de cada fase ('conexion', 'foco').
+    """
+    app, win = conectar_sdc_o_salir(tiempos)
+    traer_sdc_al_frente(win, tiempos)
+    return app, win
 
-    # 5) Shift+Tab → Ctrl+V para pegar placa
-    send_keys('+{TAB}')
-    time.sleep(DELAY_CORTO)
-    pegar_texto_desde_clipboard(placa)
-    time.sleep(DELAY_MEDIO)
 
-    # 6) Shift+Tab → Espacio (acepta)
-    send_keys('+{TAB}')
-    time.sleep(DELAY_CORTO)
-    send_keys("{SPACE}")
+def cargar_datos_sdc():
+    """Enter en el SDC para cargar datos (la ventana ya debe estar al frente)."""
+    pag.press("enter")
     time.sleep(DELAY_MEDIO)
 
-    # 6.1) Shift+Tab)x2
-    send_keys('+{TAB}')
-    send_keys('+{TAB}')
 
-    # 7) Pausa para selección manual del conductor → F8 para continuar
-    esperar_confirmacion_usuario(KEY_CONTINUAR)
+def preparar_sdc():
+    """Conecta al SDC, lo trae al frente y presiona Enter para cargar datos."""
+    app, win = enfocar_sdc()
+    cargar_datos_sdc()
+    return app, win
 
-    # 8) A → A para cerrar ventanas
-    pag.press("a")
-    time.sleep(DELAY_MEDIO)
-    pag.press("a") # c Cerrar para pruebas
-    time.sleep(DELAY_LARGO)
-    send_keys("{SPACE}")
-    time.sleep(DELAY_MEDIO)
 
-    # Esperar para que aparezca la pantalla "Información - \\Remota" → SPACE para continuar
-    wait_for_informacion_window(r"Información - \\Remota", timeout=100.0)
-
-    # Esperar que la ventana Registro de Salidas por Venta - \\Remota se cierre (win32 only)
-    """ wait_for_registro_salidas_close(r"Registro de Salidas por Venta - \\Remota", timeout=DEFAULT_REGISTRO_TIMEOUT) """
-    
-    # Intentar conectar y enfocar SDC automáticamente
-    """ try:
-        app, win = conectar_sdc()
-    except Exception as e:
-        print(f"[ERROR] No pude conectar al SDC: {e}")
-        sys.exit(1)
-
-    if sdc_active(win):
-        print("[INFO] SDC es la ventana activa.") """
+def main_vigilancia():
+    """Despacha cada placa nueva de la tabla del día apenas se escribe (Ctrl+C para terminar).
+    La primera vez en la hoja empieza en START_ROW_IN_TABLE; luego sigue desde la marca de agua.
+    """
+    vigilante = VigilanteTabla(EXCEL_PATH, TABLE_NAME, [TARGET_COLUMN_INDEX],
+                               fila_inicial=START_ROW_IN_TABLE)
+    indice = indice_flota()
+    conductores = historial_conductores()
+    app, win = preparar_sdc()
+    print("[INFO] Modo vigilancia: esperando placas nuevas (Ctrl+C para salir)...")
+    procesadas = 0
+    try:
+        for lote in vigilante.iterar_lotes():
+            # Mientras se espera, el operador suele estar escribiendo en Excel: recuperar el SDC
+            while not is_sdc_foreground(win) and not go_to_sdc(win):
+                print("[WARN] No pude recuperar foco del SDC. Reintentando...")
+                time.sleep(DELAY_LARGO)
+            placas, rechazos = validar_placas(lote)
+            imprimir_rechazos(rechazos, f"placas (columna {TARGET_COLUMN_INDEX})")
+            if indice is not None:
+                placas = validar_contra_flota(placas, indice)
+            validas = {p.fila: p for p in placas}
+            for fila, _ in lote:
+                p = validas.get(fila)
+                if p is not None:
+                    flujo_despacho_para_placa(p.placa, conductor_para(p.placa, conductores))
+                    procesadas += 1
+                vigilante.confirmar(fila)
+    except KeyboardInterrupt:
+        pass
+    print(f"\n✅ Vigilancia terminada. Placas procesadas: {procesadas}")
 
-    # 7) Pausa para selección manual del conductor → F8 para continuar
-    """ esperar_confirmacion_usuario(KEY_CONTINUAR) """
 
-# ============== FLUJO PRINCIPAL ==============
 def main():
-    print("Cargando placas desde Excel...")
-    try:
-        placas = extraer_placas_desde_tabla(EXCEL_PATH,
-                                            TABLE_NAME,
-                                            START_ROW_IN_TABLE,
-                                            END_ROW_IN_TABLE,
-                                            TARGET_COLUMN_INDEX)
-    except Exception as e:
-        print(f"\n❌ Error leyendo Excel/Tabla: {e}")
-        sys.exit(1)
-
+    if MODO_VIGILANCIA:
+        main_vigilancia()
+        return
+
+    # Arranque concurrente: el Excel se lee en un hilo mientras se conecta al SDC
+    # (pywinauto/COM se queda en el hilo principal). Ninguna tecla sale hasta saber que
+    # el Excel se leyó y tiene placas pendientes.
+    print("Cargando placas desde Excel y conectando al SDC en paralelo...")
+    t0 = time.perf_counter()
+    tiempos = {}
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        futuro_placas = pool.submit(_cronometrar, cargar_placas,
+                                    EXCEL_PATH, TABLE_NAME, START_ROW_IN_TABLE, END_ROW_IN_TABLE,
+                                    TARGET_COLUMN_INDEX)
+        futuro_conductores = pool.submit(historial_conductores)
+        _, win = conectar_sdc_o_salir(tiempos)
+        try:
+            (ubicacion, placas), tiempos["excel"] = futuro_placas.result()
+        except Exception as e:
+            print(f"\n❌ Error leyendo Excel/Tabla: {e}")
+            sys.exit(1)
+        conductores = futuro_conductores.result()
+
+    despachados = RegistroDespachos(EXCEL_PATH, ubicacion.hoja)
+    placas = omitir_despachadas(despachados, placas)
     if not placas:
         print("No se encontraron placas en el rango especificado.")
         sys.exit(0)
 
-    print(f"✅ {len(placas)} placa(s) lista(s): {placas}")
+    traer_sdc_al_frente(win, tiempos)
+    total = time.perf_counter() - t0
+    print(f"[TIEMPO] Excel: {tiempos['excel']:.2f} s | conexión SDC: {tiempos['conexion']:.2f} s | "
+          f"foco SDC: {tiempos['foco']:.2f} s | arranque: {total:.2f} s "
+          f"(en secuencia: {sum(tiempos.values()):.2f} s)")
 
-    # Intentar conectar y enfocar SDC automáticamente
-    try:
-        app, win = conectar_sdc()
-    except Exception as e:
-        print(f"[ERROR] No pude conectar al SDC: {e}")
-        sys.exit(1)
-
-    if not go_to_sdc(win):
-        print("[WARN] No pude recuperar foco del SDC tras leer Excel.")
-    else:
-        print("[INFO] Ventana SDC enfocada.")
-        
+    print(f"✅ {len(placas)} placa(s) lista(s): {[p.placa for p in placas]}")
+    primer_conductor = conductor_para(placas[0].placa, conductores)
+    print(resumen(plan_placa(placas[0].placa, primer_conductor)))
 
-    # Itera placas
-    # 1) Enter para cargar datos
-    pag.press("enter")
-    time.sleep(DELAY_MEDIO)
+    cargar_datos_sdc()
 
-    for placa in placas:
-        flujo_despacho_para_placa(placa)
+    # Itera placas; con COLUMNA_ESTADO el resultado de cada una se escribe en la tabla al final
+    estados = RegistroEstados(EXCEL_PATH, ubicacion, COLUMNA_ESTADO) if COLUMNA_ESTADO else None
+    try:
+        for i, p in enumerate(placas):
+            conductor = primer_conductor if i == 0 else conductor_para(p.placa, conductores)
+            with medir(estados, p.fila):
+                flujo_despacho_para_placa(p.placa, conductor)
+            despachados.confirmar("placa", [p.fila])
+    finally:
+        despachados.guardar()
+        if estados is not None:
+            estados.escribir()
 
     print("\n✅ Proceso completado para todas las placas.")
+    imprimir_metricas()
 
 
 if __name__ == "__main__":
@@ -19,45 +19,20 @@ import json
 import csv
 import os
 from datetime import datetime
-from pywinauto import Application, Desktop
 from pywinauto.findwindows import ElementNotFoundError
 
-# ---------- Conexión robusta ----------
-def _match_sdc_title(title: str) -> bool:
-    if not title:
-        return False
-    t = title.lower()
-    return ("unicon" in t) and ("módulo de almacen" in t or "modulo de almacen" in t)
+import registro_ventanas
 
+# ---------- Conexión robusta ----------
 def conectar_sdc():
-    for backend in ("uia", "win32"):
-        try:
-            desktop = Desktop(backend=backend)
-            candidates = [w for w in desktop.windows() if _match_sdc_title(w.window_text())]
-            best = None
-            for w in candidates:
-                title = w.window_text().lower()
-                if "almacen" in title:
-                    best = w
-                    break
-            if not best and candidates:
-                best = candidates[0]
-
-            if best:
-                app = Application(backend=backend)
-                app.connect(handle=best.handle)
-                win = app.window(handle=best.handle)
-                try: win.set_focus()
-                except: pass
-                try: win.restore()
-                except: pass
-                try: win.maximize()
-                except: pass
-                print(f"[INFO] Conectado a: '{best.window_text()}' (backend={backend})")
-                return app, win, backend
-        except Exception:
-            continue
-    raise RuntimeError("No pude conectar a la ventana del SDC. Asegura que esté abierta/visible.")
+    app, win, backend = registro_ventanas.conectar("ALMACEN")
+    try: win.set_focus()
+    except: pass
+    try: win.restore()
+    except: pass
+    try: win.maximize()
+    except: pass
+    return app, win, backend
 
 # ---------- Utilidades ----------
 def _safe_get(obj, attr, default=None):
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""
+Espejo local en SQLite de la tabla de despacho de cada hoja diaria (dd.mm).
+
+Sirve para consultas que openpyxl responde lento (qué placas salieron qué días,
+cubicaje total por planta...) y como fuente rápida de la cola de trabajo de los scripts.
+
+Sincronización incremental, por hoja:
+1. Firma barata: CRC32 de la hoja y sus tablas, tomados del directorio central del zip
+   (tabla_excel.firmas_hojas). Firma igual -> no se lee. Editar otra hoja no la cambia.
+2. Si la firma cambió, se leen las filas y se calcula el hash del contenido. Solo si el
+   hash cambió se reemplazan las filas de la hoja en la base (una transacción por hoja).
+
+Tablas:
+    hojas(libro, hoja, fecha, tabla, ref, firma, hash, filas, sincronizado)
+    filas(libro, hoja, fecha, fila, placa, cubicaje, agregado, planta, datos)
+`datos` es un JSON con todas las columnas de la fila (fechas/horas como texto ISO).
+Índices sobre fecha, placa, planta y agregado.
+
+Ejemplo:
+    SELECT planta, SUM(cubicaje) FROM filas WHERE fecha BETWEEN '2025-03-01' AND '2025-03-31' GROUP BY planta;
+
+Como script: `python espejo_sqlite.py` sincroniza todas las hojas del libro.
+Los scripts de despacho leen su cola del espejo con USAR_ESPEJO_SQLITE = True
+(LectorEspejo, misma interfaz que tabla_excel.LectorTabla).
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from datetime import date, datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from openpyxl.utils import range_boundaries
+
+import cache_tabla
+from tabla_excel import (UbicacionTabla, construir_indice_tablas, firmas_hojas, huella_o_none, indice_tablas,
+                         leer_rango_tabla, origen_lectura, ubicar_tabla_por_hoja)
+from validacion_lotes import coaccionar_numeros, normalizar_texto, separar_agregado_destino
+
+# ====== VARIABLES AJUSTABLES ======
+EXCEL_PATH = r"C:\Users\ealpiste\OneDrive - Unacem.corp\Compartido Victor\DESPACHO DE AGREGADOS_YB 2025 2.3.xlsx"
+TABLE_NAME = "Tabla276"
+DB_PATH = os.path.join(cache_tabla.DATA_DIR, "espejo_despacho.sqlite")
+
+# Columnas (1-based dentro de la tabla) que se guardan además en columnas propias e indexadas
+COL_PLACA = 3
+COL_CUBICAJE = 6
+COL_AGREGADO_DESTINO = 7
+
+# Año de las hojas dd.mm; None: se toma del nombre del archivo ("... 2025 ...") o el año actual
+ANIO_LIBRO: Optional[int] = None
+
+_PATRON_HOJA = re.compile(r"^\s*(\d{1,2})\.(\d{1,2})\s*$")
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS hojas (
+    libro TEXT NOT NULL,
+    hoja TEXT NOT NULL,
+    fecha TEXT,
+    tabla TEXT,
+    ref TEXT,
+    firma TEXT,
+    hash TEXT,
+    filas INTEGER,
+    sincronizado TEXT,
+    PRIMARY KEY (libro, hoja)
+);
+CREATE TABLE IF NOT EXISTS filas (
+    libro TEXT NOT NULL,
+    hoja TEXT NOT NULL,
+    fecha TEXT,
+    fila INTEGER NOT NULL,
+    placa TEXT,
+    cubicaje REAL,
+    agregado TEXT,
+    planta TEXT,
+    datos TEXT,
+    PRIMARY KEY (libro, hoja, fila)
+);
+CREATE INDEX IF NOT EXISTS ix_filas_fecha ON filas (fecha);
+CREATE INDEX IF NOT EXISTS ix_filas_placa ON filas (placa);
+CREATE INDEX IF NOT EXISTS ix_filas_planta ON filas (planta);
+CREATE INDEX IF NOT EXISTS ix_filas_agregado ON filas (agregado);
+"""
+
+
+class ResumenSync(NamedTuple):
+    importadas: List[str]     # hojas cuyo contenido cambió (filas reemplazadas)
+    sin_cambios: int          # hojas omitidas por firma o hash iguales
+    errores: Dict[str, str]
+    segundos: float
+
+
+# ====== BASE DE DATOS ======
+def conectar(db_path: str = None) -> sqlite3.Connection:
+    db_path = db_path or DB_PATH
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    con = sqlite3.connect(db_path)
+    con.executescript(_ESQUEMA)
+    return con
+
+
+def _clave_libro(xlsx_path: str) -> str:
+    return os.path.normcase(os.path.abspath(xlsx_path))
+
+
+def anio_libro(xlsx_path: str) -> int:
+    if ANIO_LIBRO:
+        return ANIO_LIBRO
+    m = re.search(r"(20\d\d)", os.path.basename(xlsx_path))
+    return int(m.group(1)) if m else date.today().year
+
+
+def fecha_de_hoja(hoja: str, anio: int) -> Optional[date]:
+    """'07.03' -> date(anio, 3, 7); None si la hoja no es un día dd.mm válido."""
+    m = _PATRON_HOJA.match(hoja)
+    if not m:
+        return None
+    try:
+        return date(anio, int(m.group(2)), int(m.group(1)))
+    except ValueError:
+        return None
+
+
+def _json_valor(v):
+    """Fechas/horas a texto ISO (lo demás que JSON no soporta, p.ej. timedelta, a texto)."""
+    return v.isoformat() if hasattr(v, "isoformat") else str(v)
+
+
+def _hash_filas(filas: List[tuple]) -> str:
+    datos = json.dumps(filas, default=_json_valor, ensure_ascii=False)
+    return hashlib.blake2b(datos.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _registros(libro: str, hoja: str, fecha: Optional[date], filas: List[tuple]) -> List[tuple]:
+    """Filas de la tabla -> registros de `filas` (las columnas indexadas se normalizan por lote)."""
+    def columna(c):
+        return [f[c - 1] if c - 1 < len(f) else None for f in filas]
+    placas = normalizar_texto(columna(COL_PLACA))
+    cubicajes = coaccionar_numeros(columna(COL_CUBICAJE))
+    partes = separar_agregado_destino(columna(COL_AGREGADO_DESTINO))
+    fecha_txt = fecha.isoformat() if fecha else None
+    return [(libro, hoja, fecha_txt, i, placas[i - 1], cubicajes[i - 1],
+             partes[i - 1][0] if partes[i - 1] else None,
+             partes[i - 1][1] if partes[i - 1] else None,
+             json.dumps(f, default=_json_valor, ensure_ascii=False))
+            for i, f in enumerate(filas, start=1)]
+
+
+# ====== SINCRONIZACIÓN ======
+def sincronizar(xlsx_path: str, table_name: str, hojas: Optional[Iterable[str]] = None,
+                db_path: str = None, solo_primera: bool = False) -> ResumenSync:
+    """
+    Sincroniza el espejo con el libro. `hojas`: solo esas hojas (p.ej. la del día);
+    None: todas las hojas dd.mm (y se eliminan del espejo las que ya no existen).
+    Con `solo_primera`, solo la primera de `hojas` que tenga la tabla en el libro
+    (nombres alternativos de la misma hoja, como los de nombres_hoja_del_dia()).
+    """
+    t0 = time.perf_counter()
+    libro = _clave_libro(xlsx_path)
+    anio = anio_libro(xlsx_path)
+    origen = origen_lectura(xlsx_path)
+    huella = huella_o_none(xlsx_path, origen)
+    indice = indice_tablas(origen, huella) if huella is not None else construir_indice_tablas(origen)
+    todas = hojas is None
+    firmas = firmas_hojas(origen, None if todas else list(hojas))
+    if todas:
+        hojas = [h for h in firmas if fecha_de_hoja(h, anio) is not None]
+    ubicadas = ubicar_tabla_por_hoja(indice, table_name, hojas)
+    if solo_primera and ubicadas:
+        primera = next(h for h in hojas if h in ubicadas)
+        ubicadas = {primera: ubicadas[primera]}
+
+    con = conectar(db_path)
+    importadas, sin_cambios, errores = [], 0, {}
+    try:
+        previas = {h: (firma, hash_) for h, firma, hash_ in
+                   con.execute("SELECT hoja, firma, hash FROM hojas WHERE libro = ?", (libro,))}
+        for hoja, (nombre, ubicacion) in ubicadas.items():
+            firma = firmas.get(hoja)
+            previa = previas.get(hoja)
+            if previa is not None and previa[0] == firma:
+                sin_cambios += 1
+                continue
+            try:
+                filas = [v for _, v in leer_rango_tabla(origen, ubicacion, 1, ubicacion.filas_datos,
+                                                        range(1, ubicacion.columnas + 1))]
+            except Exception as e:
+                errores[hoja] = repr(e)
+                continue
+            finally:
+                if hasattr(origen, "seek"):
+                    origen.seek(0)
+
+            hash_ = _hash_filas(filas)
+            ahora = datetime.now().isoformat(timespec="seconds")
+            fecha = fecha_de_hoja(hoja, anio)
+            with con:
+                if previa is not None and previa[1] == hash_:
+                    con.execute("UPDATE hojas SET firma = ?, sincronizado = ? WHERE libro = ? AND hoja = ?",
+                                (firma, ahora, libro, hoja))
+                    sin_cambios += 1
+                    continue
+                con.execute("DELETE FROM filas WHERE libro = ? AND hoja = ?", (libro, hoja))
+                con.executemany("INSERT INTO filas VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                _registros(libro, hoja, fecha, filas))
+                con.execute("INSERT OR REPLACE INTO hojas VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            (libro, hoja, fecha.isoformat() if fecha else None, nombre, ubicacion.ref,
+                             firma, hash_, len(filas), ahora))
+            importadas.append(hoja)
+
+        if todas:
+            borradas = set(previas) - set(ubicadas)
+            with con:
+                for hoja in borradas:
+                    con.execute("DELETE FROM filas WHERE libro = ? AND hoja = ?", (libro, hoja))
+                    con.execute("DELETE FROM hojas WHERE libro = ? AND hoja = ?", (libro, hoja))
+    finally:
+        con.close()
+    return ResumenSync(importadas, sin_cambios, errores, time.perf_counter() - t0)
+
+
+# ====== LECTURA DE LA COLA DESDE EL ESPEJO ======
+class LectorEspejo:
+    """
+    Misma interfaz que tabla_excel.LectorTabla (registrar/leer), pero las filas salen del
+    espejo SQLite. Antes de leer sincroniza solo la hoja que se va a leer (la primera de las
+    preferidas que exista); si no cambió, solo cuesta leer el directorio central del zip.
+    """
+
+    def __init__(self, xlsx_path: str, table_name: str,
+                 hojas_preferidas: Optional[Iterable[str]] = None,
+                 buscar_en_todas: bool = True,
+                 db_path: str = None):
+        self.xlsx_path = xlsx_path
+        self.table_name = table_name
+        self.hojas_preferidas = list(hojas_preferidas or [])
+        self.buscar_en_todas = buscar_en_todas
+        self.db_path = db_path
+        self._proyecciones: Dict[str, Tuple[int, int, List[int]]] = {}
+
+    def registrar(self, nombre: str, fila_inicio: int, fila_fin: int, columnas: Sequence[int]) -> None:
+        if nombre in self._proyecciones:
+            raise ValueError(f"La proyección '{nombre}' ya está registrada.")
+        if fila_inicio < 1 or fila_fin < 1:
+            raise IndexError("Las filas dentro de la tabla deben ser >= 1 (sin contar cabecera).")
+        if fila_fin < fila_inicio:
+            raise IndexError("La fila final no puede ser menor que la inicial.")
+        self._proyecciones[nombre] = (fila_inicio, fila_fin, list(columnas))
+
+    def _ubicar(self, con: sqlite3.Connection) -> Tuple[str, UbicacionTabla]:
+        libro = _clave_libro(self.xlsx_path)
+        candidatas = self.hojas_preferidas
+        if self.buscar_en_todas:
+            candidatas = candidatas + [h for (h,) in con.execute(
+                "SELECT hoja FROM hojas WHERE libro = ? AND tabla = ?", (libro, self.table_name))
+                if h not in candidatas]
+        for hoja in candidatas:
+            fila = con.execute("SELECT ref FROM hojas WHERE libro = ? AND hoja = ?", (libro, hoja)).fetchone()
+            if fila is not None:
+                ref = fila[0]
+                return hoja, UbicacionTabla(hoja, ref, *range_boundaries(ref))
+        raise ValueError(f"No se encontró la tabla '{self.table_name}' en el espejo para la(s) hoja(s) {candidatas}.")
+
+    def leer(self) -> Tuple[UbicacionTabla, Dict[str, List[Tuple[int, tuple]]]]:
+        resumen = sincronizar(self.xlsx_path, self.table_name, self.hojas_preferidas, self.db_path,
+                              solo_primera=True)
+        if resumen.importadas:
+            print(f"[INFO] Espejo SQLite actualizado: {', '.join(resumen.importadas)}.")
+        con = conectar(self.db_path)
+        try:
+            hoja, ubicacion = self._ubicar(con)
+            libro = _clave_libro(self.xlsx_path)
+            resultado = {}
+            for nombre, (fila_inicio, fila_fin, columnas) in self._proyecciones.items():
+                for c in columnas:
+                    if c < 1 or c > ubicacion.columnas:
+                        raise IndexError(f"La columna {c} está fuera del rango de la tabla (1..{ubicacion.columnas}).")
+                filas = con.execute("SELECT fila, datos FROM filas WHERE libro = ? AND hoja = ? "
+                                    "AND fila BETWEEN ? AND ? ORDER BY fila",
+                                    (libro, hoja, fila_inicio, min(fila_fin, ubicacion.filas_datos)))
+                proyeccion = []
+                for fila, datos in filas:
+                    valores = json.loads(datos)
+                    proyeccion.append((fila, tuple(valores[c - 1] for c in columnas)))
+                resultado[nombre] = proyeccion
+        finally:
+            con.close()
+        return ubicacion, resultado
+
+
+def main():
+    print(f"Sincronizando el espejo SQLite ({DB_PATH})...")
+    res = sincronizar(EXCEL_PATH, TABLE_NAME)
+    for hoja, error in res.errores.items():
+        print(f"[WARN] Hoja '{hoja}' no se pudo leer: {error}")
+    print(f"[INFO] {len(res.importadas)} hoja(s) importada(s), {res.sin_cambios} sin cambios, "
+          f"{len(res.errores)} con error, en {res.segundos:.2f} s.")
+
+
+if __name__ == "__main__":
+    main()
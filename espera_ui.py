@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+Motor único de espera por condición: wait_until(condición, timeout, política).
+
+Cada script tenía su propio bucle (while + time.sleep fijo + timeout) para esperar
+ventanas (Información, Registro de Salidas, diálogo de impresión) o el foco del SDC, y el
+resto de los pasos dormía una constante pensada para el peor caso. Aquí:
+
+- wait_until(condicion, timeout, politica, plazo) sondea con espera exponencial
+  (PoliticaSondeo: primer sondeo casi inmediato, luego cada vez más espaciado hasta un
+  máximo) y vuelve apenas la condición se cumple. `plazo` es un límite absoluto heredado
+  (Plazo): una espera interna nunca se pasa del plazo de la operación que la contiene.
+- Las condiciones se combinan con &, | y ~: ventana_presente / ventana_ausente (sobre la
+  tabla viva de vigia_ventanas.py, que además despierta la espera apenas cambia una ventana
+  que coincide; sin vigía, enumerando con pywinauto),
+  en_primer_plano(handle), control_habilitado(control), cambio_en_pantalla(sonda, ref)
+  y pantalla_estable(sonda). Una excepción al evaluar cuenta como "no se cumple".
+- Cada espera queda en METRICAS por nombre (veces, vencidas, tiempo total y máximo,
+  sondeos); imprimir_metricas() las muestra al final de la corrida.
+- Con CORTAR_ESPERAS = True las esperas nombradas de los flujos (flujos.py) terminan
+  cuando la pantalla cambió y se asentó tras el envío, en vez de dormir la constante
+  completa (que queda como tope).
+"""
+
+import re
+import time
+from typing import Callable, Dict, Iterable, Iterator, NamedTuple, Optional
+
+import vigia_ventanas
+
+# ====== VARIABLES AJUSTABLES ======
+CORTAR_ESPERAS = False        # True: las esperas nombradas de los flujos terminan cuando la UI respondió
+ASENTAMIENTO = 0.06           # s que la pantalla debe quedar igual tras el cambio para darla por lista
+
+
+class PoliticaSondeo(NamedTuple):
+    inicial: float = 0.02     # s hasta el segundo sondeo (el primero es inmediato)
+    factor: float = 1.5       # crecimiento del intervalo
+    maximo: float = 0.5       # intervalo máximo entre sondeos
+
+    def intervalos(self) -> Iterator[float]:
+        intervalo = self.inicial
+        while True:
+            yield intervalo
+            intervalo = min(intervalo * self.factor, self.maximo)
+
+
+SONDEO_RAPIDO = PoliticaSondeo()                           # pantalla, foco
+SONDEO_VENTANAS = PoliticaSondeo(0.05, 1.5, 0.5)           # enumerar ventanas cuesta más
+
+
+class Plazo:
+    """Instante límite (perf_counter). Las esperas anidadas toman el menor entre el suyo y el heredado."""
+
+    def __init__(self, segundos: Optional[float] = None, padre: Optional["Plazo"] = None):
+        propio = None if segundos is None else time.perf_counter() + segundos
+        heredado = padre.fin if padre is not None else None
+        self.fin = min((f for f in (propio, heredado) if f is not None), default=None)
+
+    def restante(self) -> Optional[float]:
+        return None if self.fin is None else max(self.fin - time.perf_counter(), 0.0)
+
+    @property
+    def vencido(self) -> bool:
+        return self.fin is not None and time.perf_counter() >= self.fin
+
+
+# ====== CONDICIONES ======
+class Condicion:
+    """
+    Predicado sin argumentos con nombre; se combina con &, | y ~.
+    `senal(segundos)` (opcional) duerme hasta `segundos` o hasta que algo relevante cambie;
+    wait_until la usa en lugar de time.sleep para despertar apenas haya un evento. Al combinar,
+    las suscripciones del vigía se unen (despierta con cualquiera); otras señales no se pueden
+    esperar juntas y la combinación sondea con time.sleep.
+    """
+
+    def __init__(self, funcion: Callable[[], bool], nombre: str,
+                 senal: Optional[Callable[[float], None]] = None):
+        self.funcion = funcion
+        self.nombre = nombre
+        self.senal = senal
+
+    def __call__(self) -> bool:
+        try:
+            return bool(self.funcion())
+        except Exception:
+            return False
+
+    def __and__(self, otra: "Condicion") -> "Condicion":
+        return Condicion(lambda: self() and otra(), f"({self.nombre} y {otra.nombre})",
+                         _unir_senales(self.senal, otra.senal))
+
+    def __or__(self, otra: "Condicion") -> "Condicion":
+        return Condicion(lambda: self() or otra(), f"({self.nombre} o {otra.nombre})",
+                         _unir_senales(self.senal, otra.senal))
+
+    def __invert__(self) -> "Condicion":
+        return Condicion(lambda: not self(), f"no {self.nombre}", self.senal)
+
+
+def _unir_senales(a, b):
+    if a is None or b is None or a is b:
+        return a or b
+    if isinstance(a, vigia_ventanas.Suscripcion) and isinstance(b, vigia_ventanas.Suscripcion):
+        return a | b
+    return None
+
+
+def ventanas(backends: Iterable[str] = ("win32",)):
+    """Ventanas de primer nivel de cada backend de pywinauto (los que fallen se saltan)."""
+    from pywinauto import Desktop
+    for backend in backends:
+        try:
+            yield from Desktop(backend=backend).windows()
+        except Exception:
+            continue
+
+
+def ventana_presente(titulo: str, backends: Iterable[str] = ("win32",), regex: bool = False,
+                     ancho_min: int = 0, alto_min: int = 0, visible: bool = False) -> Condicion:
+    """
+    Hay una ventana cuyo título contiene `titulo` (o coincide con la regex), con tamaño/visibilidad mínimos.
+    Con el vigía de ventanas se consulta su tabla (los `backends` dan igual: son las mismas ventanas
+    de primer nivel); sin él se enumera con pywinauto en cada sondeo.
+    """
+    patron = re.compile(titulo if regex else re.escape(titulo), re.IGNORECASE)
+    backends = tuple(backends)
+    vigia = vigia_ventanas.vigia()
+    if vigia is not None:
+        def tamano_ok(info) -> bool:
+            if not (ancho_min or alto_min):
+                return True
+            rect = vigia.rect(info)
+            return rect is not None and rect[2] - rect[0] >= ancho_min and rect[3] - rect[1] >= alto_min
+
+        suscripcion = vigia.suscribir(patron)
+        return Condicion(lambda: any(tamano_ok(v) for v in vigia.buscar(patron, visible)),
+                         f"ventana '{titulo}'", suscripcion)
+
+    def cumple(w) -> bool:
+        try:
+            if not patron.search(w.window_text() or ""):
+                return False
+            if ancho_min or alto_min:
+                rect = w.rectangle()
+                if rect.right - rect.left < ancho_min or rect.bottom - rect.top < alto_min:
+                    return False
+            return not visible or w.is_visible()
+        except Exception:
+            return False
+
+    return Condicion(lambda: any(cumple(w) for w in ventanas(backends)), f"ventana '{titulo}'")
+
+
+def ventana_ausente(titulo: str, backends: Iterable[str] = ("win32",), regex: bool = False) -> Condicion:
+    condicion = ~ventana_presente(titulo, backends, regex)
+    condicion.nombre = f"sin ventana '{titulo}'"
+    return condicion
+
+
+def en_primer_plano(handle: int) -> Condicion:
+    import ctypes
+    return Condicion(lambda: ctypes.windll.user32.GetForegroundWindow() == handle, f"foco en {handle}")
+
+
+def control_habilitado(control) -> Condicion:
+    """Control de pywinauto visible y habilitado."""
+    return Condicion(lambda: control.is_visible() and control.is_enabled(), "control habilitado")
+
+
+def cambio_en_pantalla(sonda: Callable[[], object], referencia) -> Condicion:
+    """La huella de la pantalla (latencia.sonda_pantalla) difiere de `referencia`."""
+    return Condicion(lambda: sonda() != referencia, "cambio en pantalla")
+
+
+def pantalla_estable(sonda: Callable[[], object], segundos: float = ASENTAMIENTO) -> Condicion:
+    """La huella no cambió durante `segundos` (se evalúa en sondeos sucesivos)."""
+    estado = {"huella": None, "desde": 0.0}
+
+    def estable() -> bool:
+        huella, ahora = sonda(), time.perf_counter()
+        if huella != estado["huella"]:
+            estado["huella"], estado["desde"] = huella, ahora
+            return False
+        return ahora - estado["desde"] >= segundos
+
+    return Condicion(estable, "pantalla estable")
+
+
+# ====== MÉTRICAS ======
+class MetricaEspera:
+    def __init__(self):
+        self.veces = 0
+        self.vencidas = 0
+        self.segundos = 0.0
+        self.maximo = 0.0
+        self.sondeos = 0
+
+    def agregar(self, ok: bool, segundos: float, sondeos: int) -> None:
+        self.veces += 1
+        self.vencidas += not ok
+        self.segundos += segundos
+        self.maximo = max(self.maximo, segundos)
+        self.sondeos += sondeos
+
+
+METRICAS: Dict[str, MetricaEspera] = {}
+
+
+def imprimir_metricas() -> None:
+    for nombre, m in sorted(METRICAS.items(), key=lambda kv: -kv[1].segundos):
+        vencidas = f", {m.vencidas} vencida(s)" if m.vencidas else ""
+        print(f"[TIEMPO] Espera '{nombre}': {m.veces}x, total {m.segundos:.2f} s, "
+              f"prom. {m.segundos / m.veces:.2f} s, máx. {m.maximo:.2f} s, {m.sondeos} sondeo(s){vencidas}")
+
+
+# ====== ESPERA ======
+def wait_until(condicion: Callable[[], bool], timeout: Optional[float] = None,
+               poll_policy: PoliticaSondeo = SONDEO_RAPIDO, plazo: Optional[Plazo] = None,
+               nombre: Optional[str] = None) -> bool:
+    """
+    Sondea `condicion` hasta que se cumpla (True) o venza min(timeout, plazo) (False).
+    Sin timeout ni plazo espera indefinidamente. Entre sondeos duerme con `condicion.senal` si la
+    tiene (despierta ante un evento) o con time.sleep. Registra la espera en METRICAS[nombre].
+    """
+    nombre = nombre or getattr(condicion, "nombre", None) or getattr(condicion, "__name__", "condición")
+    limite = Plazo(timeout, plazo)
+    dormir = getattr(condicion, "senal", None) or time.sleep
+    inicio = time.perf_counter()
+    sondeos = 0
+    ok = False
+    for intervalo in poll_policy.intervalos():
+        sondeos += 1
+        if condicion():
+            ok = True
+            break
+        restante = limite.restante()
+        if restante == 0.0:
+            break
+        dormir(intervalo if restante is None else min(intervalo, restante))
+    METRICAS.setdefault(nombre, MetricaEspera()).agregar(ok, time.perf_counter() - inicio, sondeos)
+    return ok
+
+
+def esperar_respuesta(sonda: Callable[[], object], referencia, plazo: Plazo, desde: Optional[float] = None,
+                      nombre: str = "respuesta UI", asentar: bool = True) -> Optional[float]:
+    """
+    Espera a que la pantalla cambie respecto de `referencia` (huella tomada antes del envío) y, con
+    `asentar`, a que quede estable ASENTAMIENTO s, todo dentro de `plazo`.
+    Devuelve los s desde `desde` (el envío) hasta el cambio, o None si no hubo cambio antes del plazo.
+    """
+    desde = time.perf_counter() if desde is None else desde
+    if not wait_until(cambio_en_pantalla(sonda, referencia), plazo=plazo, nombre=nombre):
+        return None
+    respuesta = time.perf_counter() - desde
+    if asentar:
+        wait_until(pantalla_estable(sonda), plazo=plazo, nombre=f"{nombre} (asentar)")
+    return respuesta
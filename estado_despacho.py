@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+"""
+Estado por fila escrito de vuelta en la tabla del libro al terminar la corrida.
+
+Durante la corrida cada fila procesada se registra en memoria (OK/ERROR, hora de
+inicio y duración). Al final todo se escribe de una vez en la columna de estado de
+la tabla (COLUMNA_ESTADO de cada script), p.ej.:
+    OK 2025-03-07 08:31:02 (12.3 s)
+    ERROR 2025-03-07 08:32:10 (4.0 s): RuntimeError('...')
+
+- La escritura modifica solo las celdas de estado dentro del XML de la hoja y copia
+  el resto del zip tal cual: no se pierde nada que openpyxl no soporte (validaciones
+  de datos, formatos condicionales...). Las celdas con fórmula no se tocan.
+- Si el libro está bloqueado (abierto en Excel) o no se puede reescribir, los estados se
+  escriben en una copia al lado del libro (<libro>.<hoja>.estado.xlsx: solo la hoja y sus
+  celdas de estado). El libro parchado se arma en un temporal del sistema, nunca en la
+  carpeta sincronizada. La siguiente escritura que sí pueda
+  guardar en el libro incorpora los estados de la copia y la borra.
+- En la siguiente corrida, las filas cuyo estado ya es OK (en el libro o en la copia)
+  se omiten, así un rango repetido no vuelve a pasar por la UI.
+"""
+
+import errno
+import os
+import re
+import shutil
+import tempfile
+import time
+import zipfile
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+from xml.sax.saxutils import escape
+
+from openpyxl.utils import get_column_letter
+
+from tabla_excel import UbicacionTabla, leer_en_memoria, leer_rango_tabla, parte_de_hoja
+
+ESTADO_OK = "OK"
+ESTADO_ERROR = "ERROR"
+SUFIJO_COPIA = ".estado.xlsx"
+REINTENTOS_ESCRITURA = 3     # si el libro cambia mientras se escribe, se vuelve a intentar
+
+_FILA = re.compile(r'<row\b[^>]*?\br="(\d+)"[^>]*?(?:/>|>.*?</row>)', re.S)
+_CELDA = re.compile(r'<c\b[^>]*?\br="([A-Z]+)(\d+)"[^>]*?(?:/>|>.*?</c>)', re.S)
+_ESTILO = re.compile(r'\bs="(\d+)"')
+
+
+class ResultadoFila(NamedTuple):
+    fila: int            # fila dentro de la tabla (sin cabecera)
+    ok: bool
+    inicio: datetime
+    duracion: float      # segundos
+    detalle: str = ""
+
+
+def texto_estado(r: ResultadoFila) -> str:
+    texto = f"{ESTADO_OK if r.ok else ESTADO_ERROR} {r.inicio:%Y-%m-%d %H:%M:%S} ({r.duracion:.1f} s)"
+    return texto if r.ok or not r.detalle else f"{texto}: {r.detalle}"
+
+
+def es_ok(valor) -> bool:
+    return isinstance(valor, str) and valor.strip().upper().startswith(ESTADO_OK + " ")
+
+
+def ruta_copia(xlsx_path: str, hoja: str) -> str:
+    """Copia de estados de una hoja: <libro>.<hoja>.estado.xlsx (una por hoja, así no se mezclan días)."""
+    return f"{os.path.splitext(xlsx_path)[0]}.{hoja}{SUFIJO_COPIA}"
+
+
+# ====== FILAS YA DESPACHADAS ======
+def estados_de_copia(xlsx_path: str, ubicacion: UbicacionTabla, columna: int) -> Dict[int, str]:
+    """Estados {fila: texto} guardados en la copia de estados (vacío si no hay copia)."""
+    copia = ruta_copia(xlsx_path, ubicacion.hoja)
+    if not os.path.exists(copia):
+        return {}
+    try:
+        filas = leer_rango_tabla(copia, ubicacion, 1, ubicacion.filas_datos, [columna])
+    except Exception as e:
+        print(f"[WARN] No se pudo leer la copia de estados {copia} ({e}).")
+        return {}
+    return {idx: v for idx, (v,) in filas if v is not None}
+
+
+def omitir_ya_ok(registros: Sequence, estados: Sequence[Tuple[int, tuple]],
+                 xlsx_path: str, ubicacion: UbicacionTabla, columna: int) -> list:
+    """
+    Quita de `registros` (objetos con .fila) los que ya tienen estado OK, según la
+    proyección `estados` [(fila, (estado,))] del libro y la copia de estados.
+    """
+    ya_ok = {idx for idx, (v,) in estados if es_ok(v)}
+    ya_ok |= {idx for idx, v in estados_de_copia(xlsx_path, ubicacion, columna).items() if es_ok(v)}
+    pendientes = [r for r in registros if r.fila not in ya_ok]
+    omitidas = len(registros) - len(pendientes)
+    if omitidas:
+        print(f"[INFO] {omitidas} fila(s) con estado OK de una corrida anterior; se omiten.")
+    return pendientes
+
+
+def medir(registro: Optional["RegistroEstados"], fila: Union[int, Sequence[int]]):
+    """registro.medir(fila), o un contexto vacío si no se escribe el estado (registro None)."""
+    return registro.medir(fila) if registro is not None else nullcontext()
+
+
+# ====== PARCHE DEL XML DE LA HOJA ======
+def _celda_nueva(ref: str, texto: str, celda_vieja: Optional[str]) -> str:
+    estilo = _ESTILO.search(celda_vieja.split(">", 1)[0]) if celda_vieja else None
+    s = f' s="{estilo.group(1)}"' if estilo else ""
+    return f'<c r="{ref}"{s} t="inlineStr"><is><t xml:space="preserve">{escape(texto)}</t></is></c>'
+
+
+def _parchear_fila(xml_fila: str, fila: int, valores: Dict[int, str]) -> Tuple[str, List[int]]:
+    """Escribe {col: texto} en el XML de una fila; devuelve (xml, columnas omitidas por tener fórmula)."""
+    if xml_fila.endswith("/>"):
+        xml_fila = xml_fila[:-2] + "></row>"
+    apertura, resto = xml_fila.split(">", 1)
+    apertura = re.sub(r'\sspans="[^"]*"', "", apertura)   # el rango de columnas puede cambiar
+    cuerpo = resto[:-len("</row>")]
+    pendientes = dict(valores)
+    omitidas = []
+    partes, pos = [], 0
+    for m in _CELDA.finditer(cuerpo):
+        col = _col_num(m.group(1))
+        for c in sorted(k for k in pendientes if k < col):
+            partes.append(cuerpo[pos:m.start()])
+            pos = m.start()
+            partes.append(_celda_nueva(f"{get_column_letter(c)}{fila}", pendientes.pop(c), None))
+        if col in pendientes:
+            texto = pendientes.pop(col)
+            if "<f" in m.group(0):
+                omitidas.append(col)
+                continue
+            partes.append(cuerpo[pos:m.start()])
+            partes.append(_celda_nueva(m.group(1) + m.group(2), texto, m.group(0)))
+            pos = m.end()
+    partes.append(cuerpo[pos:])
+    for c in sorted(pendientes):
+        partes.append(_celda_nueva(f"{get_column_letter(c)}{fila}", pendientes[c], None))
+    return apertura + ">" + "".join(partes) + "</row>", omitidas
+
+
+def _col_num(letras: str) -> int:
+    n = 0
+    for ch in letras:
+        n = n * 26 + ord(ch) - 64
+    return n
+
+
+def parchear_hoja(xml: str, celdas: Dict[Tuple[int, int], str]) -> Tuple[str, List[Tuple[int, int]]]:
+    """
+    Escribe textos en celdas {(fila_abs, col_abs): texto} del XML de una hoja.
+    Devuelve (xml, celdas omitidas porque tienen fórmula).
+    """
+    por_fila: Dict[int, Dict[int, str]] = {}
+    for (fila, col), texto in celdas.items():
+        por_fila.setdefault(fila, {})[col] = texto
+
+    xml = xml.replace("<sheetData/>", "<sheetData></sheetData>", 1)
+    m_ini = re.search(r"<sheetData\b[^>]*>", xml)
+    fin = xml.find("</sheetData>")
+    if m_ini is None or fin < 0:
+        raise ValueError("No se encontró <sheetData> en la hoja (formato no soportado).")
+    cuerpo = xml[m_ini.end():fin]
+
+    pendientes = sorted(por_fila)
+    omitidas: List[Tuple[int, int]] = []
+    partes, pos = [], 0
+
+    def fila_nueva(r):
+        xml_fila, _ = _parchear_fila(f'<row r="{r}"/>', r, por_fila[r])
+        return xml_fila
+
+    for m in _FILA.finditer(cuerpo):
+        r = int(m.group(1))
+        while pendientes and pendientes[0] < r:
+            partes.append(cuerpo[pos:m.start()])
+            pos = m.start()
+            partes.append(fila_nueva(pendientes.pop(0)))
+        if pendientes and pendientes[0] == r:
+            pendientes.pop(0)
+            xml_fila, cols = _parchear_fila(m.group(0), r, por_fila[r])
+            omitidas += [(r, c) for c in cols]
+            partes.append(cuerpo[pos:m.start()])
+            partes.append(xml_fila)
+            pos = m.end()
+    partes.append(cuerpo[pos:])
+    partes += [fila_nueva(r) for r in pendientes]
+    return xml[:m_ini.end()] + "".join(partes) + xml[fin:], omitidas
+
+
+def _reescribir_libro(origen, destino: str, hoja: str,
+                      celdas: Dict[Tuple[int, int], str]) -> List[Tuple[int, int]]:
+    """Copia el zip `origen` a `destino` con las celdas de `hoja` parchadas."""
+    with zipfile.ZipFile(origen) as zin:
+        parte = parte_de_hoja(zin, hoja)
+        xml, omitidas = parchear_hoja(zin.read(parte).decode("utf-8"), celdas)
+        with zipfile.ZipFile(destino, "w") as zout:
+            for info in zin.infolist():
+                datos = xml.encode("utf-8") if info.filename == parte else zin.read(info)
+                zout.writestr(info, datos, compress_type=info.compress_type)
+    return omitidas
+
+
+def _mover(origen: str, destino: str) -> None:
+    """os.replace; si el temporal está en otro disco (EXDEV), copia el contenido sobre el destino."""
+    try:
+        os.replace(origen, destino)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.copyfile(origen, destino)
+
+
+# ====== REGISTRO DE LA CORRIDA ======
+class RegistroEstados:
+    """Acumula el resultado de cada fila y lo escribe en la columna de estado al final."""
+
+    def __init__(self, xlsx_path: str, ubicacion: UbicacionTabla, columna: int):
+        if columna < 1 or columna > ubicacion.columnas:
+            raise IndexError(f"La columna de estado {columna} está fuera de la tabla (1..{ubicacion.columnas}).")
+        self.xlsx_path = xlsx_path
+        self.ubicacion = ubicacion
+        self.columna = columna
+        self._resultados: Dict[int, ResultadoFila] = {}
+
+    def registrar(self, resultado: ResultadoFila) -> None:
+        self._resultados[resultado.fila] = resultado
+
+    @contextmanager
+    def medir(self, fila: Union[int, Sequence[int]]):
+        """
+        Registra OK si el bloque termina bien, o ERROR (y relanza) si falla o se interrumpe.
+        Con varias filas (pedido consolidado) todas reciben el mismo resultado.
+        """
+        filas = (fila,) if isinstance(fila, int) else tuple(fila)
+        inicio, t0 = datetime.now(), time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            for f in filas:
+                self.registrar(ResultadoFila(f, False, inicio, time.perf_counter() - t0, repr(e)))
+            raise
+        for f in filas:
+            self.registrar(ResultadoFila(f, True, inicio, time.perf_counter() - t0))
+
+    def escribir(self) -> Optional[str]:
+        """
+        Escribe todos los estados en un solo guardado. Devuelve la ruta escrita (el libro o
+        la copia de estados), o None si no había nada que escribir o tampoco se pudo escribir la copia.
+        El libro parchado se arma en un temporal fuera de la carpeta del libro (que OneDrive
+        sincroniza) y se borra siempre; si no se puede reescribir el libro, los estados van a la copia.
+        """
+        if not self._resultados:
+            return None
+        celda_col = self.ubicacion.min_col + self.columna - 1
+        celdas = {(self.ubicacion.min_row + fila, celda_col): texto_estado(r)
+                  for fila, r in self._resultados.items()}
+        previas = {(self.ubicacion.min_row + fila, celda_col): v
+                   for fila, v in estados_de_copia(self.xlsx_path, self.ubicacion, self.columna).items()}
+        todas = {**previas, **celdas}
+
+        fd, tmp_path = tempfile.mkstemp(suffix=".xlsx", prefix="estados_")
+        os.close(fd)
+        try:
+            for _ in range(REINTENTOS_ESCRITURA):
+                try:
+                    st = os.stat(self.xlsx_path)
+                    origen = leer_en_memoria(self.xlsx_path)
+                    omitidas = _reescribir_libro(origen, tmp_path, self.ubicacion.hoja, todas)
+                except Exception as e:
+                    print(f"[WARN] No se pudieron escribir los estados en el libro ({e}).")
+                    return self._guardar_copia(todas)
+                st2 = os.stat(self.xlsx_path)
+                if (st.st_size, st.st_mtime_ns) != (st2.st_size, st2.st_mtime_ns):
+                    continue   # alguien guardó el libro mientras tanto: se vuelve a parchar
+                for fila, col in omitidas:
+                    print(f"[WARN] La celda de estado de la fila {fila - self.ubicacion.min_row} tiene fórmula; no se escribió.")
+                try:
+                    _mover(tmp_path, self.xlsx_path)
+                except OSError:
+                    print("[WARN] Libro bloqueado.")
+                    return self._guardar_copia(todas)
+                copia = ruta_copia(self.xlsx_path, self.ubicacion.hoja)
+                if os.path.exists(copia):
+                    try:
+                        os.remove(copia)
+                    except OSError:
+                        pass
+                print(f"[INFO] Estado de {len(celdas)} fila(s) escrito en la tabla.")
+                return self.xlsx_path
+            print("[WARN] El libro cambió durante la escritura de estados.")
+            return self._guardar_copia(todas)
+        finally:
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def _guardar_copia(self, celdas: Dict[Tuple[int, int], str]) -> Optional[str]:
+        """
+        Escribe los estados en la copia (ruta_copia): un libro mínimo con solo la hoja y las celdas
+        de estado en sus coordenadas, que estados_de_copia lee con la misma ubicación de la tabla.
+        """
+        from openpyxl import Workbook
+        copia = ruta_copia(self.xlsx_path, self.ubicacion.hoja)
+        fd, tmp_path = tempfile.mkstemp(suffix=".xlsx", prefix="estados_")
+        os.close(fd)
+        try:
+            wb = Workbook()
+            ws = wb.active
+            ws.title = self.ubicacion.hoja
+            for (fila, col), texto in celdas.items():
+                ws.cell(row=fila, column=col, value=texto)
+            wb.save(tmp_path)
+            _mover(tmp_path, copia)
+        except Exception as e:
+            print(f"[WARN] Tampoco se pudo guardar la copia de estados {copia} ({e}); estados perdidos.")
+            return None
+        finally:
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+        print(f"[WARN] Estados guardados en {copia}; se incorporan al libro en la próxima escritura.")
+        return copia
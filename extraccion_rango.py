@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Extracción de la tabla de despacho para un rango de fechas (auditorías, cierre de mes).
+
+Los lectores de tabla_excel.py trabajan con la hoja del día. Aquí:
+- Se ubica la tabla de cada hoja dd.mm del rango con el índice de tablas del libro
+  (la tabla del día se llama distinto en cada hoja; ver ubicar_tabla_por_hoja).
+- Las hojas se reparten en lotes entre procesos (ProcessPoolExecutor). Cada proceso
+  abre el libro una vez por lote (LibroAbierto: un zip y, si hace falta, un libro de
+  openpyxl en modo streaming) y lee solo sus hojas; si la hoja ya está en la caché de
+  tablas (misma huella del libro), no se parsea.
+- Los resultados se juntan en un solo conjunto ordenado por fecha y fila, con el
+  tiempo de lectura de cada hoja.
+
+Las fechas sin hoja (domingos, feriados) se omiten.
+
+Uso:
+    res = extraer_rango_fechas(EXCEL_PATH, "Tabla276", date(2025, 3, 1), date(2025, 3, 31), [3, 6, 7])
+    for f in res.filas: print(f.fecha, f.fila, f.valores)
+
+Como script: ajusta FECHA_DESDE/FECHA_HASTA y ejecuta `python extraccion_rango.py`.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import cache_tabla
+from tabla_excel import (LibroAbierto, UbicacionTabla, construir_indice_tablas, huella_o_none, indice_tablas,
+                         leer_rango_tabla, nombres_hoja_del_dia, origen_lectura, ubicar_tabla_por_hoja)
+
+# ====== VARIABLES AJUSTABLES ======
+EXCEL_PATH = r"C:\Users\ealpiste\OneDrive - Unacem.corp\Compartido Victor\DESPACHO DE AGREGADOS_YB 2025 2.3.xlsx"
+TABLE_NAME = "Tabla276"
+FECHA_DESDE = date.today().replace(day=1)   # primer día del mes
+FECHA_HASTA = date.today()
+COLUMNAS = [3, 6, 7]                         # placa, cubicaje, agregado-destino (1-based en la tabla)
+
+PROCESOS = None               # None: uno por núcleo
+MIN_HOJAS_POR_PROCESO = 4     # con menos hojas no compensa levantar procesos
+
+
+class FilaRango(NamedTuple):
+    fecha: date
+    hoja: str
+    fila: int          # fila dentro de la tabla (sin cabecera)
+    valores: tuple
+
+
+class TiempoHoja(NamedTuple):
+    fecha: date
+    hoja: str
+    filas: int
+    segundos: float
+    desde_cache: bool
+    error: Optional[str]
+
+
+class ResultadoRango(NamedTuple):
+    filas: List[FilaRango]
+    tiempos: List[TiempoHoja]
+    segundos: float
+
+
+# (fecha, hoja, nombre de la tabla en esa hoja, ubicación)
+Tarea = Tuple[date, str, str, UbicacionTabla]
+
+
+def fechas_en_rango(desde: date, hasta: date) -> List[date]:
+    return [desde + timedelta(days=i) for i in range((hasta - desde).days + 1)]
+
+
+# ====== TRABAJO DE CADA PROCESO ======
+def _leer_hoja(origen, huella, tarea: Tarea, columnas: Sequence[int]) -> Tuple[List[tuple], bool]:
+    """Filas de la tabla de una hoja (solo `columnas`) y si salieron de la caché."""
+    _, hoja, nombre, ubicacion = tarea
+    tabla = cache_tabla.obtener(huella, hoja, nombre) if huella is not None else None
+    desde_cache = tabla is not None
+    if tabla is None:
+        todas = range(1, ubicacion.columnas + 1)
+        tabla = [v for _, v in leer_rango_tabla(origen, ubicacion, 1, ubicacion.filas_datos, todas)]
+        if huella is not None:
+            cache_tabla.guardar(huella, hoja, nombre, tabla)
+    return [tuple(fila[c - 1] for c in columnas) for fila in tabla], desde_cache
+
+
+def _extraer_lote(xlsx_path: str, huella, tareas: List[Tarea],
+                  columnas: Sequence[int]) -> List[Tuple[TiempoHoja, List[FilaRango]]]:
+    """Lee un lote de hojas abriendo el libro una sola vez (corre dentro de un proceso del pool)."""
+    salida = []
+    with LibroAbierto(origen_lectura(xlsx_path)) as libro:
+        for tarea in tareas:
+            fecha, hoja = tarea[0], tarea[1]
+            t0 = time.perf_counter()
+            try:
+                filas, desde_cache = _leer_hoja(libro, huella, tarea, columnas)
+                error = None
+            except Exception as e:
+                filas, desde_cache, error = [], False, repr(e)
+            tiempo = TiempoHoja(fecha, hoja, len(filas), time.perf_counter() - t0, desde_cache, error)
+            salida.append((tiempo, [FilaRango(fecha, hoja, i, v) for i, v in enumerate(filas, start=1)]))
+    return salida
+
+
+def _repartir(tareas: List[Tarea], n: int) -> List[List[Tarea]]:
+    """n lotes contiguos de tamaño parecido (las hojas vecinas suelen ocupar partes vecinas del zip)."""
+    base, resto = divmod(len(tareas), n)
+    lotes, i = [], 0
+    for k in range(n):
+        tam = base + (1 if k < resto else 0)
+        lotes.append(tareas[i:i + tam])
+        i += tam
+    return [lote for lote in lotes if lote]
+
+
+# ====== API ======
+def extraer_rango_fechas(xlsx_path: str, table_name: str, desde: date, hasta: date,
+                         columnas: Sequence[int], procesos: Optional[int] = None) -> ResultadoRango:
+    """
+    Devuelve las filas (solo `columnas`, 1-based) de la tabla de cada hoja dd.mm entre
+    `desde` y `hasta` (inclusive), ordenadas por fecha y fila, con el tiempo por hoja.
+    Una hoja que falla se informa en `tiempos[i].error` y no corta la extracción.
+    """
+    if hasta < desde:
+        raise ValueError("La fecha final no puede ser menor que la inicial.")
+    t0 = time.perf_counter()
+
+    origen = origen_lectura(xlsx_path)
+    huella = huella_o_none(xlsx_path, origen)
+    indice = indice_tablas(origen, huella) if huella is not None else construir_indice_tablas(origen)
+
+    candidatas = {f: nombres_hoja_del_dia(f) for f in fechas_en_rango(desde, hasta)}
+    ubicadas = ubicar_tabla_por_hoja(indice, table_name, [h for hs in candidatas.values() for h in hs])
+    tareas: List[Tarea] = []
+    for fecha, hojas in candidatas.items():
+        hoja = next((h for h in hojas if h in ubicadas), None)
+        if hoja is not None:
+            nombre, ubicacion = ubicadas[hoja]
+            for c in columnas:
+                if c < 1 or c > ubicacion.columnas:
+                    raise IndexError(f"La columna {c} está fuera del rango de la tabla '{nombre}' "
+                                     f"en la hoja '{hoja}' (1..{ubicacion.columnas}).")
+            tareas.append((fecha, hoja, nombre, ubicacion))
+
+    n = procesos or PROCESOS or os.cpu_count() or 1
+    n = max(1, min(n, len(tareas) // MIN_HOJAS_POR_PROCESO))
+    if n == 1:
+        resultados = _extraer_lote(xlsx_path, huella, tareas, columnas) if tareas else []
+    else:
+        resultados = []
+        with ProcessPoolExecutor(max_workers=n) as pool:
+            futuros = [pool.submit(_extraer_lote, xlsx_path, huella, lote, columnas)
+                       for lote in _repartir(tareas, n)]
+            for futuro in futuros:
+                resultados.extend(futuro.result())
+
+    resultados.sort(key=lambda r: r[0].fecha)
+    filas = [f for _, fs in resultados for f in fs]
+    tiempos = [t for t, _ in resultados]
+    return ResultadoRango(filas, tiempos, time.perf_counter() - t0)
+
+
+def imprimir_tiempos(res: ResultadoRango) -> None:
+    for t in res.tiempos:
+        origen = "caché" if t.desde_cache else "libro"
+        estado = f"ERROR {t.error}" if t.error else f"{t.filas} filas"
+        print(f"  {t.hoja:>6} | {t.segundos * 1000:8.1f} ms | {origen:<5} | {estado}")
+    suma = sum(t.segundos for t in res.tiempos)
+    print(f"[INFO] {len(res.tiempos)} hoja(s), {len(res.filas)} fila(s) en {res.segundos:.2f} s "
+          f"(suma por hoja: {suma:.2f} s).")
+
+
+def main():
+    print(f"Extrayendo '{TABLE_NAME}' del {FECHA_DESDE:%d.%m.%Y} al {FECHA_HASTA:%d.%m.%Y}...")
+    res = extraer_rango_fechas(EXCEL_PATH, TABLE_NAME, FECHA_DESDE, FECHA_HASTA, COLUMNAS)
+    imprimir_tiempos(res)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+Flujos de teclado declarativos: pasos como datos, compilados a un plan de ejecución.
+
+Los flujos (despacho de placa, ingreso de pedido, impresión de guía) eran largas series
+de send_keys / pag.press sueltos, cada uno con su time.sleep. Aquí un flujo es una tupla
+de pasos:
+
+    Teclas("+{TAB}", veces=8)          teclas en sintaxis de pywinauto.send_keys
+    Texto(Param("placa"))              texto literal (se escapan + ^ % ~ ( ) { } [ ])
+    Esperar("DELAY_MEDIO")             espera en segundos o por nombre (se resuelve al compilar)
+    Accion(funcion, "Salidas")         llamada a Python: funcion(params) (imagen, ventanas, F8...)
+    Si("down_planta", (...), (...))    pasos según un parámetro (o una función de los parámetros)
+
+compilar() resuelve parámetros, condiciones y esperas y produce un Plan:
+- Los pasos de teclas contiguos (sin espera ni acción entre ellos) con el mismo
+  espaciado se juntan en UN solo envío ('+{TAB}' x8 -> un send_keys).
+- Cada Esperar es una barrera: las teclas de antes y de después nunca se juntan en un envío.
+  Las esperas seguidas se suman en una sola (mismo tiempo que dormirlas una tras otra), así
+  que el plan tarda lo mismo que el flujo sin compilar; solo cambia la cantidad de llamadas.
+- Con ACORTAR_ESPERAS = True (opcional) además se descuenta de cada espera la pausa que
+  send_keys deja tras la última tecla y las esperas seguidas se colapsan en la más larga.
+- El plan sabe cuántas teclas envía, en cuántos envíos, y su tiempo mínimo (esperas +
+  espaciado entre teclas; las acciones se cuentan aparte porque su duración depende de la UI),
+  junto con las mismas cifras del flujo sin compilar.
+
+Con latencia.LATENCIA_ADAPTATIVA las esperas nombradas se miden y ajustan (latencia.py); con
+espera_ui.CORTAR_ESPERAS terminan apenas la pantalla cambió y se asentó tras el envío.
+
+ejecutar() recorre el plan con la función de envío que se le pase (por defecto el backend
+de teclado.py: send_keys o SendInput en lote), o solo lo imprime con dry_run.
+"""
+
+import time
+from typing import Callable, List, Mapping, NamedTuple, Optional, Sequence, Union
+
+import espera_ui
+import latencia
+import teclado
+
+PAUSA_TECLA = 0.05            # espaciado por defecto entre teclas (el de pywinauto.send_keys)
+ACORTAR_ESPERAS = False       # True: descuenta la pausa de la última tecla y colapsa esperas seguidas en la más larga
+_ESPECIALES = set("+^%~(){}[]")
+
+
+# ====== PASOS ======
+class Param(NamedTuple):
+    """Referencia a un parámetro del flujo (se reemplaza al compilar)."""
+    nombre: str
+
+
+class Teclas(NamedTuple):
+    teclas: Union[str, Param]
+    veces: Union[int, Param] = 1
+    pausa: Union[None, float, str] = None       # espaciado entre teclas (None: PAUSA_TECLA)
+
+
+class Texto(NamedTuple):
+    texto: Union[str, Param]
+    pausa: Union[None, float, str] = None
+
+
+class Esperar(NamedTuple):
+    segundos: Union[float, str, Param]
+
+
+class Accion(NamedTuple):
+    funcion: Callable[[dict], object]
+    nombre: str = ""
+    requerida: bool = False                     # si devuelve un valor falso, el flujo se detiene
+    latencia: bool = False                      # si devuelve False, la UI iba lenta (latencia.py frena)
+
+
+class Si(NamedTuple):
+    condicion: Union[str, Callable[[dict], bool]]
+    entonces: tuple
+    sino: tuple = ()
+
+
+Paso = Union[Teclas, Texto, Esperar, Accion, Si]
+
+
+# ====== PLAN ======
+class Envio(NamedTuple):
+    teclas: str
+    pausa: float
+    cantidad: int          # teclas que envía
+
+
+class Espera(NamedTuple):
+    segundos: float
+    nombre: str = ""       # nombre de la espera (la primera con nombre si se juntaron varias)
+
+
+class Llamada(NamedTuple):
+    funcion: Callable[[dict], object]
+    nombre: str
+    requerida: bool
+    latencia: bool = False
+
+
+class Plan(NamedTuple):
+    nombre: str
+    operaciones: List[Union[Envio, Espera, Llamada]]
+    params: dict
+    pasos_teclas: int      # pasos de teclas antes de juntar (envíos sin compilar)
+    pasos_espera: int      # esperas antes de juntar
+    segundos_sin_compilar: float
+
+    @property
+    def teclas(self) -> int:
+        return sum(op.cantidad for op in self.operaciones if isinstance(op, Envio))
+
+    @property
+    def envios(self) -> int:
+        return sum(1 for op in self.operaciones if isinstance(op, Envio))
+
+    @property
+    def esperas(self) -> int:
+        return sum(1 for op in self.operaciones if isinstance(op, Espera))
+
+    @property
+    def acciones(self) -> int:
+        return sum(1 for op in self.operaciones if isinstance(op, Llamada))
+
+    @property
+    def nombres_espera(self) -> List[str]:
+        return sorted({op.nombre for op in self.operaciones if isinstance(op, Espera) and op.nombre})
+
+    @property
+    def segundos_minimos(self) -> float:
+        return sum(op.cantidad * op.pausa if isinstance(op, Envio) else op.segundos
+                   for op in self.operaciones if not isinstance(op, Llamada))
+
+
+def escapar(texto: str) -> str:
+    """Texto literal -> sintaxis de send_keys."""
+    return "".join("{" + c + "}" if c in _ESPECIALES else c for c in str(texto))
+
+
+def contar_teclas(teclas: str) -> int:
+    """Teclas (sin contar modificadores) que envía una cadena de send_keys: '{TAB 8}' cuenta 8."""
+    return len(teclado.parsear(teclas))
+
+
+def _valor(v, params: Mapping):
+    return params[v.nombre] if isinstance(v, Param) else v
+
+
+def _segundos(v, params: Mapping, esperas: Mapping[str, float]) -> float:
+    v = _valor(v, params)
+    return float(esperas[v]) if isinstance(v, str) else float(v)
+
+
+def _nombre(v, params: Mapping) -> str:
+    v = _valor(v, params)
+    return v if isinstance(v, str) else ""
+
+
+def compilar(nombre: str, pasos: Sequence[Paso], params: Optional[dict] = None,
+             esperas: Optional[Mapping[str, float]] = None) -> Plan:
+    """Resuelve parámetros, condiciones y esperas; junta teclas contiguas y suma esperas seguidas."""
+    params = dict(params or {})
+    esperas = esperas or {}
+    ops: List[Union[Envio, Espera, Llamada]] = []
+    contadores = {"teclas": 0, "esperas": 0, "segundos": 0.0, "barrera": False}
+
+    def agregar_teclas(teclas: str, pausa: float):
+        contadores["teclas"] += 1
+        if not teclas:
+            return
+        contadores["segundos"] += contar_teclas(teclas) * pausa
+        previa = ops[-1] if ops else None
+        if isinstance(previa, Envio) and previa.pausa == pausa and not contadores["barrera"]:
+            ops[-1] = Envio(previa.teclas + teclas, pausa, previa.cantidad + contar_teclas(teclas))
+        else:
+            ops.append(Envio(teclas, pausa, contar_teclas(teclas)))
+        contadores["barrera"] = False
+
+    def agregar_espera(s: float, nombre_espera: str):
+        contadores["barrera"] = True
+        previa = ops[-1] if ops else None
+        if isinstance(previa, Espera):
+            if not ACORTAR_ESPERAS:
+                ops[-1] = Espera(previa.segundos + s, previa.nombre or nombre_espera)
+                return
+            antes = ops[-2] if len(ops) > 1 else None
+            s -= antes.pausa if isinstance(antes, Envio) else 0.0
+            if s > previa.segundos:
+                ops[-1] = Espera(s, nombre_espera)
+            return
+        if ACORTAR_ESPERAS:
+            s -= previa.pausa if isinstance(previa, Envio) else 0.0
+        if s > 0:
+            ops.append(Espera(s, nombre_espera))
+
+    def recorrer(secuencia: Sequence[Paso]):
+        for paso in secuencia:
+            if isinstance(paso, Teclas):
+                pausa = PAUSA_TECLA if paso.pausa is None else _segundos(paso.pausa, params, esperas)
+                agregar_teclas(str(_valor(paso.teclas, params)) * int(_valor(paso.veces, params)), pausa)
+            elif isinstance(paso, Texto):
+                pausa = PAUSA_TECLA if paso.pausa is None else _segundos(paso.pausa, params, esperas)
+                agregar_teclas(escapar(_valor(paso.texto, params)), pausa)
+            elif isinstance(paso, Esperar):
+                contadores["esperas"] += 1
+                s = _segundos(paso.segundos, params, esperas)
+                contadores["segundos"] += max(s, 0.0)
+                agregar_espera(max(s, 0.0), _nombre(paso.segundos, params))
+            elif isinstance(paso, Accion):
+                contadores["barrera"] = False
+                ops.append(Llamada(paso.funcion, paso.nombre or getattr(paso.funcion, "__name__", "accion"),
+                                   paso.requerida, paso.latencia))
+            elif isinstance(paso, Si):
+                cond = paso.condicion(params) if callable(paso.condicion) else params.get(paso.condicion)
+                recorrer(paso.entonces if cond else paso.sino)
+            else:
+                raise TypeError(f"Paso desconocido en el flujo '{nombre}': {paso!r}")
+
+    recorrer(pasos)
+    return Plan(nombre, ops, params, contadores["teclas"], contadores["esperas"], contadores["segundos"])
+
+
+def resumen(plan: Plan) -> str:
+    acciones = f" + {plan.acciones} acción(es)" if plan.acciones else ""
+    return (f"[PLAN] {plan.nombre}: {plan.teclas} tecla(s) en {plan.envios} envío(s) "
+            f"(antes {plan.pasos_teclas}), {plan.esperas} espera(s) (antes {plan.pasos_espera}), "
+            f"mínimo {plan.segundos_minimos:.2f} s (antes {plan.segundos_sin_compilar:.2f} s){acciones}.")
+
+
+# ====== EJECUCIÓN ======
+def ejecutar(plan: Plan, enviar: Optional[Callable[[str, float], None]] = None,
+             dry_run: bool = False, log: Callable[[str], None] = print,
+             control: Optional[latencia.ControladorLatencia] = None) -> bool:
+    """
+    Ejecuta el plan. `enviar(teclas, pausa)` envía un grupo de teclas (por defecto teclado.actual()).
+    Las esperas nombradas pasan por `control` (latencia.controlador() por defecto): si toca medir
+    (o con espera_ui.CORTAR_ESPERAS), se toma la huella de la pantalla antes del envío y se mide la
+    respuesta durante la espera; con CORTAR_ESPERAS la espera termina cuando la UI respondió.
+    Devuelve False si una acción requerida devolvió un valor falso (el resto no se ejecuta).
+    """
+    enviar = enviar or (None if dry_run else teclado.actual())
+    control = control or latencia.controlador()
+    referencia, desde = None, None
+    for k, op in enumerate(plan.operaciones):
+        if isinstance(op, Envio):
+            if dry_run:
+                log(f"[DRY] send_keys({op.teclas!r}, pause={op.pausa})")
+                continue
+            siguiente = plan.operaciones[k + 1] if k + 1 < len(plan.operaciones) else None
+            medir = isinstance(siguiente, Espera) and bool(siguiente.nombre) and (
+                control.debe_medir(siguiente.nombre) | espera_ui.CORTAR_ESPERAS)
+            referencia = control.huella() if medir else None
+            enviar(op.teclas, op.pausa)
+            desde = time.perf_counter()
+        elif isinstance(op, Espera):
+            control.esperar(op.nombre, op.segundos, referencia, desde, cortar=espera_ui.CORTAR_ESPERAS)
+            referencia = None
+        else:
+            referencia = None
+            resultado = op.funcion(plan.params)
+            if op.latencia and resultado is False:
+                control.fallo(plan.nombres_espera)
+            if op.requerida and not resultado:
+                log(f"[WARN] {plan.nombre}: '{op.nombre}' falló; se detiene el flujo.")
+                return False
+    return True
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Historial placa -> conductor, para elegir el conductor sin la pausa manual (F8).
+
+En flujo_despacho_para_placa el paso más lento es esperar a que el operador elija el
+conductor y presione F8. La mayoría de los camiones los maneja siempre el mismo conductor:
+con el historial de despachos del espejo SQLite (espejo_sqlite.py) se sugiere, por placa,
+el conductor más frecuente entre sus últimos VENTANA_RECIENTE despachos (ante empate, el
+más reciente).
+
+La sugerencia es confiable si la placa tiene al menos MIN_DESPACHOS despachos en la
+ventana y el conductor sugerido aparece en al menos CONFIANZA_MINIMA de ellos. Las placas
+sin historial o con baja confianza siguen el camino manual (F8).
+"""
+
+import json
+import os
+import re
+import sqlite3
+from collections import Counter, deque
+from datetime import date
+from typing import Deque, Dict, NamedTuple, Optional, Tuple
+
+import espejo_sqlite
+from indice_placas import clave_placa
+
+# ====== VARIABLES AJUSTABLES ======
+COL_CONDUCTOR = 4          # Columna (1-based) del conductor dentro de la tabla
+VENTANA_RECIENTE = 10      # últimos despachos de cada placa que se consideran
+MIN_DESPACHOS = 3          # despachos mínimos en la ventana para confiar en la sugerencia
+CONFIANZA_MINIMA = 0.8     # fracción mínima de la ventana que debe tener el conductor sugerido
+
+_ESPACIOS = re.compile(r"\s+")
+
+
+class Sugerencia(NamedTuple):
+    conductor: str
+    confianza: float       # fracción de la ventana con ese conductor
+    despachos: int         # despachos de la placa en la ventana
+    ultimo: Optional[str]  # fecha ISO del último despacho con ese conductor
+
+
+def _conductor(valor) -> Optional[str]:
+    if valor is None:
+        return None
+    texto = _ESPACIOS.sub(" ", str(valor)).strip().upper()
+    return texto or None
+
+
+class HistorialConductores:
+    """Últimos despachos (fecha, conductor) por placa, en orden cronológico."""
+
+    def __init__(self, ventana: int = VENTANA_RECIENTE):
+        self.ventana = ventana
+        self._despachos: Dict[str, Deque[Tuple[Optional[str], str]]] = {}
+
+    def agregar(self, placa, conductor, fecha: Optional[str] = None) -> None:
+        """Agrega un despacho; deben llegar en orden cronológico."""
+        clave, nombre = clave_placa(placa), _conductor(conductor)
+        if not clave or nombre is None:
+            return
+        self._despachos.setdefault(clave, deque(maxlen=self.ventana)).append((fecha, nombre))
+
+    def __len__(self) -> int:
+        return len(self._despachos)
+
+    def sugerir(self, placa) -> Optional[Sugerencia]:
+        """Conductor más frecuente en la ventana de la placa (empate: el más reciente), o None sin historial."""
+        despachos = self._despachos.get(clave_placa(placa))
+        if not despachos:
+            return None
+        conteo = Counter(nombre for _, nombre in despachos)
+        ultimo: Dict[str, Tuple[int, Optional[str]]] = {nombre: (i, fecha) for i, (fecha, nombre) in enumerate(despachos)}
+        conductor = max(conteo, key=lambda nombre: (conteo[nombre], ultimo[nombre][0]))
+        return Sugerencia(conductor, conteo[conductor] / len(despachos), len(despachos), ultimo[conductor][1])
+
+    @staticmethod
+    def es_confiable(sugerencia: Optional[Sugerencia]) -> bool:
+        return (sugerencia is not None and sugerencia.despachos >= MIN_DESPACHOS
+                and sugerencia.confianza >= CONFIANZA_MINIMA)
+
+
+def cargar_historial(db_path: str = None, hasta: Optional[date] = None,
+                     col_conductor: int = COL_CONDUCTOR) -> HistorialConductores:
+    """Historial con los despachos del espejo SQLite anteriores a `hasta` (hoy por defecto)."""
+    historial = HistorialConductores()
+    db_path = db_path or espejo_sqlite.DB_PATH
+    if not os.path.exists(db_path):
+        return historial
+    hasta = hasta or date.today()
+    con = sqlite3.connect(db_path)
+    try:
+        filas = con.execute("SELECT fecha, placa, datos FROM filas WHERE placa IS NOT NULL AND fecha < ? "
+                            "ORDER BY fecha, fila", (hasta.isoformat(),))
+        for fecha, placa, datos in filas:
+            valores = json.loads(datos)
+            if col_conductor - 1 < len(valores):
+                historial.agregar(placa, valores[col_conductor - 1], fecha)
+    except sqlite3.OperationalError:   # base sin el esquema del espejo
+        pass
+    finally:
+        con.close()
+    return historial
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Índice de placas conocidas de la flota, para validar la cola antes de despachar.
+
+Un error de tipeo en la placa ('ABC-12' en vez de 'ABC-123') solo se notaba después de
+un ciclo completo en el SDC. Con el índice, cada placa de la cola se revisa en memoria:
+
+- La clave de una placa es su texto en mayúsculas y sin separadores ('abc 123' y
+  'ABC-123' -> 'ABC123'). Las claves conocidas están en un dict (búsqueda O(1)) que
+  guarda la forma escrita más frecuente; una placa conocida se despacha con esa forma.
+- Las claves también se guardan en un árbol BK (distancia de edición), así una placa
+  desconocida se informa con las placas conocidas más parecidas sin recorrer toda la flota.
+  En una flota real hay muchas placas a un carácter de distancia ('ABC-123' y 'ABC-124'),
+  así que una placa parecida solo se avisa; se descarta únicamente con rechazar_parecidas.
+
+Fuentes:
+- Historial: las placas del espejo SQLite (espejo_sqlite.py) de días anteriores a hoy,
+  que aparecen al menos MIN_APARICIONES veces (un error de tipeo aislado no entra).
+- Maestro: archivo de texto/CSV con una placa por línea (primera columna).
+"""
+
+import csv
+import os
+import re
+import sqlite3
+from collections import Counter
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import espejo_sqlite
+from validacion_lotes import Placa, Rechazo
+
+# ====== VARIABLES AJUSTABLES ======
+MIN_APARICIONES = 2        # veces que una placa debe aparecer en el historial para contarse como conocida
+DISTANCIA_MAXIMA = 1       # distancia de edición máxima para sugerir una placa parecida
+SUGERENCIAS = 3            # cuántas placas parecidas se informan
+
+_NO_ALFANUMERICO = re.compile(r"[^0-9A-Z]")
+
+
+def clave_placa(texto) -> str:
+    """'abc 123' / 'ABC-123' / 'ABC.123' -> 'ABC123'."""
+    return _NO_ALFANUMERICO.sub("", str(texto).upper())
+
+
+def distancia_edicion(a: str, b: str) -> int:
+    """Distancia de Levenshtein (inserción, borrado y sustitución cuestan 1)."""
+    if len(a) < len(b):
+        a, b = b, a
+    previa = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        actual = [i]
+        for j, cb in enumerate(b, start=1):
+            actual.append(min(previa[j] + 1, actual[j - 1] + 1, previa[j - 1] + (ca != cb)))
+        previa = actual
+    return previa[-1]
+
+
+class ArbolBK:
+    """Árbol BK sobre claves de placa: búsqueda por distancia de edición sin comparar contra todas."""
+
+    def __init__(self):
+        self._raiz: Optional[Tuple[str, Dict[int, tuple]]] = None
+
+    def agregar(self, clave: str) -> None:
+        if self._raiz is None:
+            self._raiz = (clave, {})
+            return
+        nodo = self._raiz
+        while True:
+            d = distancia_edicion(clave, nodo[0])
+            if d == 0:
+                return
+            hijo = nodo[1].get(d)
+            if hijo is None:
+                nodo[1][d] = (clave, {})
+                return
+            nodo = hijo
+
+    def buscar(self, clave: str, distancia_max: int) -> List[Tuple[int, str]]:
+        """[(distancia, clave)] de las claves a distancia <= distancia_max, de la más cercana a la más lejana."""
+        if self._raiz is None:
+            return []
+        encontradas = []
+        pendientes = [self._raiz]
+        while pendientes:
+            valor, hijos = pendientes.pop()
+            d = distancia_edicion(clave, valor)
+            if d <= distancia_max:
+                encontradas.append((d, valor))
+            for dh, hijo in hijos.items():
+                if d - distancia_max <= dh <= d + distancia_max:
+                    pendientes.append(hijo)
+        return sorted(encontradas)
+
+
+class IndicePlacas:
+    """Placas conocidas: clave -> forma escrita más frecuente, más el árbol BK de claves."""
+
+    def __init__(self):
+        self._formas: Dict[str, Counter] = {}
+        self._arbol = ArbolBK()
+
+    def agregar(self, placa, veces: int = 1) -> None:
+        texto = str(placa).strip().upper()
+        clave = clave_placa(texto)
+        if not clave:
+            return
+        if clave not in self._formas:
+            self._formas[clave] = Counter()
+            self._arbol.agregar(clave)
+        self._formas[clave][texto] += veces
+
+    def __len__(self) -> int:
+        return len(self._formas)
+
+    def __contains__(self, placa) -> bool:
+        return clave_placa(placa) in self._formas
+
+    def forma(self, placa) -> Optional[str]:
+        """Forma escrita más frecuente de la placa, o None si no es conocida."""
+        formas = self._formas.get(clave_placa(placa))
+        return formas.most_common(1)[0][0] if formas else None
+
+    def cercanas(self, placa, n: int = SUGERENCIAS, distancia_max: int = DISTANCIA_MAXIMA) -> List[Tuple[int, str]]:
+        """[(distancia, forma)] de las n placas conocidas más parecidas."""
+        return [(d, self._formas[c].most_common(1)[0][0])
+                for d, c in self._arbol.buscar(clave_placa(placa), distancia_max)[:n]]
+
+
+# ====== FUENTES ======
+def placas_del_historial(db_path: str = None, hasta: Optional[date] = None) -> List[Tuple[str, int]]:
+    """[(placa, veces)] del espejo SQLite en días anteriores a `hasta` (hoy por defecto)."""
+    db_path = db_path or espejo_sqlite.DB_PATH
+    if not os.path.exists(db_path):
+        return []
+    hasta = hasta or date.today()
+    con = sqlite3.connect(db_path)
+    try:
+        return con.execute("SELECT placa, COUNT(*) FROM filas WHERE placa IS NOT NULL AND fecha < ? "
+                           "GROUP BY placa", (hasta.isoformat(),)).fetchall()
+    except sqlite3.OperationalError:   # base sin el esquema del espejo
+        return []
+    finally:
+        con.close()
+
+
+def placas_del_maestro(path: str) -> List[str]:
+    """Placas de un archivo de texto/CSV (primera columna; se ignoran líneas vacías y cabecera 'PLACA')."""
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        placas = [fila[0].strip() for fila in csv.reader(f) if fila and fila[0].strip()]
+    return [p for p in placas if p.upper() != "PLACA"]
+
+
+def cargar_indice(maestro: Optional[str] = None, db_path: str = None,
+                  min_apariciones: int = MIN_APARICIONES) -> IndicePlacas:
+    """Índice con las placas del maestro (siempre) y las del historial con al menos `min_apariciones`."""
+    indice = IndicePlacas()
+    if maestro:
+        for placa in placas_del_maestro(maestro):
+            indice.agregar(placa, min_apariciones)
+    historial = placas_del_historial(db_path)
+    conteo = Counter()
+    for placa, veces in historial:
+        conteo[clave_placa(placa)] += veces
+    for placa, veces in historial:
+        if conteo[clave_placa(placa)] >= min_apariciones:
+            indice.agregar(placa, veces)
+    return indice
+
+
+# ====== VALIDACIÓN ======
+def validar_contra_indice(placas: Sequence[Placa], indice: IndicePlacas, rechazar_nuevas: bool = False,
+                          rechazar_parecidas: bool = False) -> Tuple[List[Placa], List[Rechazo]]:
+    """
+    Placas conocidas -> se normalizan a su forma escrita habitual.
+    Placas desconocidas con alguna conocida a DISTANCIA_MAXIMA o menos -> aviso con las sugerencias y
+    pasan (puede ser un camión nuevo); con rechazar_parecidas -> rechazo (probable error de tipeo).
+    Placas desconocidas sin parecidas -> camión nuevo: pasan (o se rechazan con rechazar_nuevas).
+    """
+    validas: List[Placa] = []
+    rechazos: List[Rechazo] = []
+    for p in placas:
+        forma = indice.forma(p.placa)
+        if forma is not None:
+            validas.append(p._replace(placa=forma))
+            continue
+        cercanas = indice.cercanas(p.placa)
+        if cercanas:
+            sugeridas = ", ".join(f"{f} (dist. {d})" for d, f in cercanas)
+            if rechazar_parecidas:
+                rechazos.append(Rechazo(p.fila, "PLACA", p.placa, f"desconocida; ¿quisiste decir {sugeridas}?"))
+            else:
+                print(f"[WARN] Placa '{p.placa}' (fila {p.fila}) no está en el índice; parecidas: {sugeridas}. "
+                      f"Se despacha igual.")
+                validas.append(p)
+        elif rechazar_nuevas:
+            rechazos.append(Rechazo(p.fila, "PLACA", p.placa, "desconocida (no está en el maestro ni en el historial)"))
+        else:
+            print(f"[WARN] Placa '{p.placa}' (fila {p.fila}) no está en el índice de la flota; se despacha igual.")
+            validas.append(p)
+    return validas, rechazos
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+Control adaptativo de las esperas nombradas (DELAY_*, WAIT_*) según la respuesta real de la UI.
+
+Los DELAY_* están afinados a mano para el peor día de Citrix: en una sesión rápida casi
+todo el ciclo es espera. Con LATENCIA_ADAPTATIVA = True cada espera nombrada de los flujos
+(flujos.py) toma su valor de un perfil por equipo que se ajusta en cada corrida:
+
+- Medición: antes de un envío de teclas seguido de una espera nombrada se toma una huella
+  de la pantalla (si el script conoce la ventana, solo la zona REGION_SONDA de ella: sin
+  barra de título ni de estado, donde un reloj o un cursor cambian solos); durante la espera se sondea
+  (espera_ui.wait_until) hasta ver un cambio. El tiempo hasta el cambio es la respuesta de la UI a esas teclas.
+  Se mide una de cada MEDIR_CADA esperas de cada nombre (la captura también cuesta).
+- Regla AIMD: si la respuesta × MARGEN cabe en la espera, se acorta PASO_DISMINUCION
+  segundos (aceleración lenta); si no cabe, se multiplica por FACTOR_AUMENTO (frenado
+  rápido). Una acción marcada como señal de latencia que falla ('Salidas' no encontrado,
+  timeout de la ventana Información) también multiplica las esperas de su flujo.
+- Sin cambio visible dentro de la espera la UI respondió tarde (o no respondió): también
+  se multiplica. Hay teclas que no cambian la pantalla: tras RACHA_SIN_CAMBIO mediciones
+  seguidas sin cambio la espera vuelve al valor previo a la racha y deja de medirse.
+- Límites: entre MINIMO_RELATIVO y MAXIMO_RELATIVO veces el valor de la constante.
+- Perfil: latencia/<equipo>.json en la carpeta de datos local, se guarda al salir.
+- Calibración: `python latencia.py --calibrar` mide la respuesta a TAB / Shift+TAB en la
+  ventana que esté al frente; los nombres sin valor en el perfil arrancan escalados por
+  (respuesta calibrada / LATENCIA_REFERENCIA).
+
+Con LATENCIA_ADAPTATIVA = False todo sigue como antes (valores de las constantes, sleep).
+"""
+
+import argparse
+import atexit
+import hashlib
+import json
+import os
+import re
+import socket
+import statistics
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, Mapping, Optional, Tuple
+
+import cache_tabla
+import espera_ui
+
+# ====== VARIABLES AJUSTABLES ======
+LATENCIA_ADAPTATIVA = False   # True: las esperas nombradas se ajustan con la respuesta medida de la UI
+MARGEN = 1.5                  # la espera debe cubrir respuesta × MARGEN
+PASO_DISMINUCION = 0.02       # s que se acorta una espera cuando la UI respondió holgada
+FACTOR_AUMENTO = 1.5          # factor con que se alarga una espera ante respuesta lenta o fallo
+MINIMO_RELATIVO = 0.25        # piso: fracción del valor de la constante
+MAXIMO_RELATIVO = 3.0         # techo: múltiplo del valor de la constante
+MEDIR_CADA = 3                # se mide 1 de cada N esperas de cada nombre
+LATENCIA_REFERENCIA = 0.30    # respuesta (s) del día para el que se afinaron las constantes
+RACHA_SIN_CAMBIO = 4          # mediciones seguidas sin cambio visible para dar la tecla por invisible
+REGION_SONDA = (0.0, 0.08, 1.0, 0.84)  # zona sondeada de la ventana (izq, arriba, ancho, alto en fracciones)
+PERFILES_DIR = os.path.join(cache_tabla.DATA_DIR, "latencia")
+
+Sonda = Callable[[], object]  # huella de lo visible; dos huellas distintas = la UI cambió
+
+
+def ruta_perfil(equipo: Optional[str] = None) -> str:
+    equipo = re.sub(r"[^\w.-]", "_", equipo or socket.gethostname()) or "equipo"
+    return os.path.join(PERFILES_DIR, f"{equipo}.json")
+
+
+def sonda_pantalla(region: Optional[Tuple[int, int, int, int]] = None) -> Sonda:
+    """Huella (hash) de una captura de la pantalla o de `region` (left, top, width, height)."""
+    import pyautogui
+
+    def huella():
+        return hashlib.blake2b(pyautogui.screenshot(region=region).tobytes(), digest_size=8).digest()
+    return huella
+
+
+def subregion(region: Tuple[int, int, int, int],
+              fracciones: Optional[Tuple[float, float, float, float]] = None) -> Tuple[int, int, int, int]:
+    """Zona `fracciones` (REGION_SONDA por defecto) de `region` (left, top, width, height)."""
+    izq, arriba, ancho, alto = REGION_SONDA if fracciones is None else fracciones
+    left, top, width, height = region
+    return (left + round(width * izq), top + round(height * arriba),
+            max(1, round(width * ancho)), max(1, round(height * alto)))
+
+
+def esperar_cambio(sonda: Sonda, referencia, tope: float, desde: Optional[float] = None,
+                   asentar: bool = False, nombre: str = "respuesta UI") -> Optional[float]:
+    """S desde `desde` hasta que la huella difiere de `referencia`, o None si no cambia en `tope` s desde `desde`."""
+    desde = time.perf_counter() if desde is None else desde
+    plazo = espera_ui.Plazo(tope - (time.perf_counter() - desde))
+    return espera_ui.esperar_respuesta(sonda, referencia, plazo, desde, nombre, asentar)
+
+
+def _leer(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"[WARN] No se pudo leer el perfil de latencia {path} ({e}). Se usan las constantes.")
+        return {}
+
+
+class ControladorLatencia:
+    """Valores vigentes de las esperas nombradas de un equipo, ajustados por AIMD."""
+
+    def __init__(self, path: Optional[str] = None, activo: Optional[bool] = None,
+                 sonda: Optional[Sonda] = None):
+        self.path = path or ruta_perfil()
+        self.activo = LATENCIA_ADAPTATIVA if activo is None else activo
+        self.sonda = sonda
+        perfil = _leer(self.path) if self.activo else {}
+        self.latencia: Optional[float] = perfil.get("latencia")      # respuesta calibrada (s)
+        self.valores: Dict[str, float] = dict(perfil.get("esperas", {}))
+        self._iniciales: Dict[str, float] = dict(self.valores)
+        self._base: Dict[str, float] = {}
+        self._esperas = Counter()
+        self.medidas = Counter()
+        self._sin_cambio = Counter()                 # mediciones seguidas sin cambio visible
+        self._antes_racha: Dict[str, float] = {}     # valor al empezar la racha sin cambio
+        self._invisibles = set()                     # esperas tras teclas que no cambian la pantalla
+
+    def _acotar(self, nombre: str, segundos: float) -> float:
+        base = self._base[nombre]
+        return min(max(segundos, base * MINIMO_RELATIVO), base * MAXIMO_RELATIVO)
+
+    def valor(self, nombre: str, base: float) -> float:
+        """Valor vigente de la espera `nombre` cuya constante vale `base`."""
+        if not self.activo or base <= 0:
+            return base
+        self._base[nombre] = base
+        if nombre not in self.valores:
+            escala = self.latencia / LATENCIA_REFERENCIA if self.latencia else 1.0
+            self.valores[nombre] = base * escala
+            self._iniciales.setdefault(nombre, base)
+        self.valores[nombre] = self._acotar(nombre, self.valores[nombre])
+        return self.valores[nombre]
+
+    def esperas(self, base: Mapping[str, float]) -> Dict[str, float]:
+        """{nombre: constante} -> {nombre: valor vigente} (para flujos.compilar)."""
+        return {nombre: self.valor(nombre, segundos) for nombre, segundos in base.items()}
+
+    # ====== AJUSTE ======
+    def registrar(self, nombre: str, respuesta: float) -> None:
+        """Respuesta medida de la UI (s) durante la espera `nombre`: regla AIMD."""
+        if nombre not in self._base:
+            return
+        actual = self.valores[nombre]
+        self._sin_cambio.pop(nombre, None)
+        self._antes_racha.pop(nombre, None)
+        if respuesta * MARGEN > actual:
+            actual = max(actual * FACTOR_AUMENTO, respuesta * MARGEN)
+        else:
+            actual -= PASO_DISMINUCION
+        self.valores[nombre] = self._acotar(nombre, actual)
+        self.medidas[nombre] += 1
+
+    def sin_cambio(self, nombre: str) -> None:
+        """La pantalla no cambió durante la espera `nombre`: la UI va más lenta que la espera, frenar."""
+        if nombre not in self._base or nombre in self._invisibles:
+            return
+        self._sin_cambio[nombre] += 1
+        self._antes_racha.setdefault(nombre, self.valores[nombre])
+        if self._sin_cambio[nombre] >= RACHA_SIN_CAMBIO:
+            # nunca responde: tecla sin efecto visible, no latencia
+            self.valores[nombre] = self._antes_racha.pop(nombre)
+            self._invisibles.add(nombre)
+            print(f"[INFO] {nombre}: {RACHA_SIN_CAMBIO} mediciones sin cambio visible; deja de medirse.")
+            return
+        self.valores[nombre] = self._acotar(nombre, self.valores[nombre] * FACTOR_AUMENTO)
+        self.medidas[nombre] += 1
+
+    def fallo(self, nombres: Iterable[str]) -> None:
+        """La UI no respondió a tiempo (imagen no encontrada, ventana que no apareció): frenar."""
+        if not self.activo:
+            return
+        for nombre in set(nombres) & set(self._base):
+            self.valores[nombre] = self._acotar(nombre, self.valores[nombre] * FACTOR_AUMENTO)
+
+    # ====== ESPERA ======
+    def debe_medir(self, nombre: str) -> bool:
+        """Cuenta la espera y dice si esta se mide (1 de cada MEDIR_CADA por nombre)."""
+        if not self.activo or not nombre or nombre not in self._base or nombre in self._invisibles:
+            return False
+        self._esperas[nombre] += 1
+        return (self._esperas[nombre] - 1) % MEDIR_CADA == 0
+
+    def usar_region(self, region: Tuple[int, int, int, int]) -> None:
+        """Sondear solo la zona REGION_SONDA de la ventana del script (left, top, width, height)."""
+        self.sonda = sonda_pantalla(subregion(region))
+
+    def huella(self):
+        if self.sonda is None:
+            self.sonda = sonda_pantalla()
+        return self.sonda()
+
+    def esperar(self, nombre: str, segundos: float, referencia=None, desde: Optional[float] = None,
+                cortar: bool = False) -> None:
+        """
+        Espera `segundos`; con `referencia` (huella previa al envío) mide la respuesta mientras tanto.
+        Con `cortar` termina apenas la pantalla cambió y se asentó (espera_ui.CORTAR_ESPERAS).
+        """
+        if referencia is None:
+            time.sleep(segundos)
+            return
+        desde = time.perf_counter() if desde is None else desde
+        respuesta = esperar_cambio(self.sonda, referencia, segundos, desde, asentar=cortar,
+                                   nombre=f"{nombre} (respuesta)")
+        if respuesta is None:
+            self.sin_cambio(nombre)
+        else:
+            self.registrar(nombre, respuesta)
+            if cortar:
+                return
+        restante = segundos - (time.perf_counter() - desde)
+        if restante > 0:
+            time.sleep(restante)
+
+    # ====== PERFIL ======
+    def resumen(self) -> str:
+        partes = [f"{n} {self._iniciales.get(n, self._base[n]):.2f}→{self.valores[n]:.2f}"
+                  for n in sorted(self._base) if n in self.valores]
+        return "[LATENCIA] " + (", ".join(partes) if partes else "sin esperas ajustadas")
+
+    def guardar(self) -> None:
+        if not self.activo or not self._base:
+            return
+        perfil = {"latencia": self.latencia, "esperas": {n: round(s, 4) for n, s in self.valores.items()}}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(perfil, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+_actual: Optional[ControladorLatencia] = None
+
+
+def controlador() -> ControladorLatencia:
+    """Controlador del proceso (perfil de este equipo); con LATENCIA_ADAPTATIVA se guarda al salir."""
+    global _actual
+    if _actual is None:
+        _actual = ControladorLatencia()
+        if _actual.activo:
+            def _al_salir():
+                print(_actual.resumen())
+                _actual.guardar()
+            atexit.register(_al_salir)
+    return _actual
+
+
+# ====== CALIBRACIÓN ======
+def calibrar(veces: int = 10, tope: float = 3.0, sonda: Optional[Sonda] = None,
+             enviar: Optional[Callable[[str, float], None]] = None) -> Optional[float]:
+    """Mediana de la respuesta a TAB / Shift+TAB (alternados, el foco vuelve a su lugar)."""
+    import teclado
+    sonda = sonda or sonda_pantalla()
+    enviar = enviar or teclado.actual()
+    respuestas = []
+    for k in range(veces):
+        referencia = sonda()
+        desde = time.perf_counter()
+        enviar("{TAB}" if k % 2 == 0 else "+{TAB}", 0.0)
+        respuesta = esperar_cambio(sonda, referencia, tope, desde)
+        if respuesta is None:
+            print(f"[WARN] Sin cambio visible en {tope:.1f} s (intento {k + 1}).")
+        else:
+            respuestas.append(respuesta)
+        time.sleep(max(respuesta or 0.0, espera_ui.ASENTAMIENTO) * MARGEN)   # que la UI se asiente
+    if veces % 2:
+        enviar("+{TAB}", 0.0)
+    return statistics.median(respuestas) if respuestas else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfil de latencia de este equipo.")
+    parser.add_argument("--calibrar", action="store_true",
+                        help="medir la respuesta de la ventana al frente y reiniciar el perfil")
+    parser.add_argument("--veces", type=int, default=10, help="mediciones de la calibración")
+    parser.add_argument("--espera", type=float, default=5.0, help="s para traer la ventana remota al frente")
+    args = parser.parse_args()
+
+    path = ruta_perfil()
+    if args.calibrar:
+        print(f"Trae al frente la ventana remota (SDC/UNICON); la calibración empieza en {args.espera:.0f} s...")
+        time.sleep(args.espera)
+        latencia = calibrar(args.veces)
+        if latencia is None:
+            print("[WARN] No se vio ningún cambio en pantalla; el perfil no se modificó.")
+            return
+        # Las esperas se vuelven a sembrar (escaladas) en la próxima corrida
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"latencia": latencia, "esperas": {}}, f, indent=2)
+        print(f"[INFO] Respuesta mediana: {latencia:.3f} s (referencia {LATENCIA_REFERENCIA:.2f} s, "
+              f"escala {latencia / LATENCIA_REFERENCIA:.2f}). Perfil: {path}")
+        return
+
+    perfil = _leer(path)
+    if not perfil:
+        print(f"[INFO] Sin perfil en {path}; usa --calibrar para crearlo.")
+        return
+    print(f"Perfil {path}:")
+    if perfil.get("latencia") is not None:
+        print(f"  respuesta calibrada: {perfil['latencia']:.3f} s")
+    for nombre, segundos in sorted(perfil.get("esperas", {}).items()):
+        print(f"  {nombre}: {segundos:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
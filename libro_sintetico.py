@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Generador de libros de despacho sintéticos para medir la capa de Excel (benchmark_excel.py).
+
+Imita el libro real "DESPACHO DE AGREGADOS":
+- Una hoja por día 'dd.mm' (1 a 365) terminando en `hasta` (por defecto hoy), más una
+  hoja 'Listas' con las opciones de AGREGADO-DESTINO.
+- En cada hoja diaria una tabla con cabecera en la fila 3 (columnas N, HORA, PLACA,
+  CONDUCTOR, GUIA, CUBICAJE, AGREGADO-DESTINO, OBS). La del último día se llama
+  `table_name` (Tabla276); las demás TablaNNN, como quedan al copiar la hoja en Excel.
+- Valores realistas: placas 'ABC-123', cubicajes numéricos y algunos como texto
+  ('1,000'), 'AR-MEIGGS' / 'PIEDRA HUSO 67-MATERIALES'..., celdas vacías y filas inválidas.
+- Validación de datos en la columna AGREGADO-DESTINO como extensión x14 (la que openpyxl
+  no soporta y advierte al leer), y shared strings como los guarda Excel.
+
+El XML se escribe directo al zip (openpyxl no puede escribir las extensiones x14 y
+sería lento para 365 hojas).
+
+Uso:
+    python libro_sintetico.py salida.xlsx 365 80
+"""
+
+import random
+import sys
+import zipfile
+from datetime import date, timedelta
+from typing import List, Optional
+from xml.sax.saxutils import escape
+
+from openpyxl.utils import get_column_letter
+
+CABECERA = ["N", "HORA", "PLACA", "CONDUCTOR", "GUIA", "CUBICAJE", "AGREGADO-DESTINO", "OBS"]
+AGREGADOS_DESTINO = ["AR-MEIGGS", "67-MATERIALES", "89-COLLIQUE", "5-OQUENDO", "AR-COLLIQUE",
+                     "PIEDRA HUSO 67-MATERIALES", "PIEDRA 5-OQUENDO", "89-MEIGGS"]
+CONDUCTORES = ["ALPISTE RAMIREZ", "QUISPE HUAMAN", "FLORES MENDOZA", "ROJAS CASTILLO", "TORRES VEGA"]
+FILA_CABECERA = 3
+COL_INICIO = 2          # la tabla empieza en la columna B
+
+_NS = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+_NS_R = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_CT = "application/vnd.openxmlformats-officedocument.spreadsheetml"
+
+
+class _SharedStrings:
+    def __init__(self):
+        self.indices = {}
+        self.total = 0
+
+    def __call__(self, texto: str) -> int:
+        self.total += 1
+        return self.indices.setdefault(texto, len(self.indices))
+
+    def xml(self) -> str:
+        items = "".join(f"<si><t>{escape(t)}</t></si>" for t in self.indices)
+        return (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                f'<sst {_NS} count="{self.total}" uniqueCount="{len(self.indices)}">{items}</sst>')
+
+
+def _fila_aleatoria(rnd: random.Random, n: int, guia: int) -> list:
+    placa = f"{rnd.choice('ABCDEFGHJK')}{rnd.choice('ABCDEFGHJK')}{rnd.choice('ABCDEFGHJK')}-{rnd.randint(100, 999)}"
+    cubicaje = rnd.choice([20, 25, 25.5, 30, 15, "1,000", "20 "])
+    agregado = rnd.choice(AGREGADOS_DESTINO)
+    fila = [n, rnd.uniform(0.25, 0.75), placa, rnd.choice(CONDUCTORES), guia, cubicaje, agregado, None]
+    if rnd.random() < 0.05:
+        fila[2] = None                    # placa vacía
+    if rnd.random() < 0.03:
+        fila[6] = "SIN DESTINO"           # formato inválido
+    if rnd.random() < 0.1:
+        fila[7] = "REPROGRAMADO"
+    return fila
+
+
+def _celda(ref: str, valor, sst: _SharedStrings, estilo: int = 0) -> str:
+    s = f' s="{estilo}"' if estilo else ""
+    if valor is None:
+        return ""
+    if isinstance(valor, str):
+        return f'<c r="{ref}"{s} t="s"><v>{sst(valor)}</v></c>'
+    return f'<c r="{ref}"{s}><v>{valor!r}</v></c>'
+
+
+def _xml_hoja(filas: List[list], titulo: str, sst: _SharedStrings, rango_validacion: str) -> str:
+    ultima_col = get_column_letter(COL_INICIO + len(CABECERA) - 1)
+    ultima_fila = FILA_CABECERA + len(filas)
+    partes = [f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<worksheet {_NS} {_NS_R}>',
+              f'<dimension ref="B1:{ultima_col}{ultima_fila}"/><sheetData>',
+              f'<row r="1">{_celda("B1", titulo, sst)}</row>']
+    todas = [CABECERA] + filas
+    for i, fila in enumerate(todas):
+        r = FILA_CABECERA + i
+        celdas = []
+        for j, valor in enumerate(fila):
+            estilo = 1 if i > 0 and j == 1 else 0          # HORA con formato h:mm
+            celdas.append(_celda(f"{get_column_letter(COL_INICIO + j)}{r}", valor, sst, estilo))
+        partes.append(f'<row r="{r}">{"".join(celdas)}</row>')
+    partes.append("</sheetData>")
+    partes.append('<tableParts count="1"><tablePart r:id="rId1"/></tableParts>')
+    col_ag = get_column_letter(COL_INICIO + CABECERA.index("AGREGADO-DESTINO"))
+    partes.append(
+        '<extLst><ext uri="{CCE6A557-97BC-4b89-ADB6-D9C93CAAB3DF}" '
+        'xmlns:x14="http://schemas.microsoft.com/office/spreadsheetml/2009/9/main">'
+        '<x14:dataValidations count="1" xmlns:xm="http://schemas.microsoft.com/office/excel/2006/main">'
+        '<x14:dataValidation type="list" allowBlank="1" showInputMessage="1" showErrorMessage="1">'
+        f'<x14:formula1><xm:f>{rango_validacion}</xm:f></x14:formula1>'
+        f'<xm:sqref>{col_ag}{FILA_CABECERA + 1}:{col_ag}{ultima_fila}</xm:sqref>'
+        '</x14:dataValidation></x14:dataValidations></ext></extLst>')
+    partes.append("</worksheet>")
+    return "".join(partes)
+
+
+def _xml_tabla(id_tabla: int, nombre: str, ref: str) -> str:
+    columnas = "".join(f'<tableColumn id="{i}" name="{escape(c)}"/>' for i, c in enumerate(CABECERA, start=1))
+    return (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<table {_NS} id="{id_tabla}" name="{nombre}" displayName="{nombre}" ref="{ref}" totalsRowShown="0">'
+            f'<autoFilter ref="{ref}"/><tableColumns count="{len(CABECERA)}">{columnas}</tableColumns>'
+            f'<tableStyleInfo name="TableStyleMedium2" showFirstColumn="0" showLastColumn="0" '
+            f'showRowStripes="1" showColumnStripes="0"/></table>')
+
+
+def generar_libro(path: str, hojas: int = 30, filas: int = 80, hasta: Optional[date] = None,
+                  table_name: str = "Tabla276", semilla: int = 0) -> None:
+    """Escribe en `path` un libro con `hojas` días (1..365) de `filas` filas cada uno."""
+    if not 1 <= hojas <= 365:
+        raise ValueError("El número de hojas debe estar entre 1 y 365.")
+    if table_name in {f"Tabla{1000 + k}" for k in range(1, hojas)}:
+        raise ValueError(f"El nombre '{table_name}' choca con los nombres de las tablas de días anteriores.")
+    rnd = random.Random(semilla)
+    hasta = hasta or date.today()
+    dias = [hasta - timedelta(days=hojas - 1 - k) for k in range(hojas)]
+    sst = _SharedStrings()
+    partes = {}
+    rango_validacion = f"Listas!$A$1:$A${len(AGREGADOS_DESTINO)}"
+
+    sheets_xml, wb_rels, overrides = [], [], []
+    guia = 185000
+    for k, dia in enumerate(dias, start=1):
+        nombre_hoja = f"{dia.day:02d}.{dia.month:02d}"
+        datos = []
+        for n in range(1, filas + 1):
+            datos.append(_fila_aleatoria(rnd, n, guia))
+            guia += 1
+        ref = (f"{get_column_letter(COL_INICIO)}{FILA_CABECERA}:"
+               f"{get_column_letter(COL_INICIO + len(CABECERA) - 1)}{FILA_CABECERA + filas}")
+        nombre_tabla = table_name if k == hojas else f"Tabla{1000 + k}"
+        partes[f"xl/worksheets/sheet{k}.xml"] = _xml_hoja(datos, f"DESPACHO {nombre_hoja}", sst, rango_validacion)
+        partes[f"xl/worksheets/_rels/sheet{k}.xml.rels"] = (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'<Relationship Id="rId1" Type="{_REL}/table" Target="../tables/table{k}.xml"/></Relationships>')
+        partes[f"xl/tables/table{k}.xml"] = _xml_tabla(k, nombre_tabla, ref)
+        sheets_xml.append(f'<sheet name="{nombre_hoja}" sheetId="{k}" r:id="rId{k}"/>')
+        wb_rels.append(f'<Relationship Id="rId{k}" Type="{_REL}/worksheet" Target="worksheets/sheet{k}.xml"/>')
+        overrides.append(f'<Override PartName="/xl/worksheets/sheet{k}.xml" ContentType="{_CT}.worksheet+xml"/>')
+        overrides.append(f'<Override PartName="/xl/tables/table{k}.xml" ContentType="{_CT}.table+xml"/>')
+
+    # Hoja de listas (origen de la validación de datos)
+    k = hojas + 1
+    listas = "".join(f'<row r="{i}">{_celda(f"A{i}", v, sst)}</row>' for i, v in enumerate(AGREGADOS_DESTINO, start=1))
+    partes[f"xl/worksheets/sheet{k}.xml"] = (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                                             f'<worksheet {_NS}><sheetData>{listas}</sheetData></worksheet>')
+    sheets_xml.append(f'<sheet name="Listas" sheetId="{k}" r:id="rId{k}"/>')
+    wb_rels.append(f'<Relationship Id="rId{k}" Type="{_REL}/worksheet" Target="worksheets/sheet{k}.xml"/>')
+    overrides.append(f'<Override PartName="/xl/worksheets/sheet{k}.xml" ContentType="{_CT}.worksheet+xml"/>')
+    wb_rels.append(f'<Relationship Id="rId{k + 1}" Type="{_REL}/styles" Target="styles.xml"/>')
+    wb_rels.append(f'<Relationship Id="rId{k + 2}" Type="{_REL}/sharedStrings" Target="sharedStrings.xml"/>')
+
+    partes["xl/workbook.xml"] = (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                                 f'<workbook {_NS} {_NS_R}><workbookPr/><sheets>{"".join(sheets_xml)}</sheets></workbook>')
+    partes["xl/_rels/workbook.xml.rels"] = (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">{"".join(wb_rels)}</Relationships>')
+    partes["xl/styles.xml"] = (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<styleSheet {_NS}>'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="20" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>')
+    partes["xl/sharedStrings.xml"] = sst.xml()
+    overrides += [f'<Override PartName="/xl/workbook.xml" ContentType="{_CT}.sheet.main+xml"/>',
+                  f'<Override PartName="/xl/styles.xml" ContentType="{_CT}.styles+xml"/>',
+                  f'<Override PartName="/xl/sharedStrings.xml" ContentType="{_CT}.sharedStrings+xml"/>']
+    partes["[Content_Types].xml"] = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        f'{"".join(overrides)}</Types>')
+    partes["_rels/.rels"] = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        f'<Relationship Id="rId1" Type="{_REL}/officeDocument" Target="xl/workbook.xml"/></Relationships>')
+
+    orden = ["[Content_Types].xml", "_rels/.rels", "xl/workbook.xml", "xl/_rels/workbook.xml.rels"]
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for nombre in orden + sorted(n for n in partes if n not in orden):
+            zf.writestr(nombre, partes[nombre])
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python libro_sintetico.py salida.xlsx [hojas=30] [filas=80]")
+        sys.exit(1)
+    generar_libro(sys.argv[1],
+                  int(sys.argv[2]) if len(sys.argv) > 2 else 30,
+                  int(sys.argv[3]) if len(sys.argv) > 3 else 80)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Lista de guías a imprimir (print_guias.py) tomada de los datos reales del despacho.
+
+Recorrer GUIA_INICIO..GUIA_FIN cuesta ~5 s por número aunque la guía sea de otra sede o
+esté anulada. Aquí la lista sale de la columna de guías de la tabla del día (o de las
+hojas indicadas) o de una lista exportada (.txt/.csv), sin duplicados y ordenada: los
+huecos del rango no cuestan nada.
+
+Formatos aceptados por guía: 185267, '0185267', '195-0185267', '195 - 185267'. Si la
+guía trae prefijo y no es GUIA_PREFIJO_FIJO, se descarta (es de otra serie).
+"""
+
+import csv
+import re
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from tabla_excel import (construir_indice_tablas, huella_o_none, indice_tablas, leer_rango_tabla,
+                         origen_lectura, ubicar_tabla_por_hoja)
+from validacion_lotes import Rechazo, imprimir_rechazos
+
+_GUIA = re.compile(r"^\s*(?:(\d{1,4})\s*-\s*)?(\d{1,7})\s*$")
+
+
+def parsear_guia(valor, prefijo: str) -> Tuple[Optional[int], Optional[str]]:
+    """Devuelve (sufijo, None) o (None, motivo) si el valor no es una guía de la serie `prefijo`."""
+    if valor is None or (isinstance(valor, str) and not valor.strip()):
+        return None, "celda vacía"
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    m = _GUIA.match(str(valor))
+    if not m:
+        return None, "no es un número de guía"
+    serie, numero = m.groups()
+    if serie is not None and int(serie) != int(prefijo):
+        return None, f"serie {serie} (se imprime la {prefijo})"
+    return int(numero), None
+
+
+def guias_de_valores(filas: Sequence[Tuple[int, object]], prefijo: str) -> Tuple[List[int], List[Rechazo]]:
+    """[(fila, valor)] -> (guías sin duplicados y ordenadas, rechazos). Las celdas vacías no se informan."""
+    guias = set()
+    rechazos: List[Rechazo] = []
+    for fila, valor in filas:
+        numero, motivo = parsear_guia(valor, prefijo)
+        if numero is not None:
+            guias.add(numero)
+        elif motivo != "celda vacía":
+            rechazos.append(Rechazo(fila, "GUIA", valor, motivo))
+    return sorted(guias), rechazos
+
+
+def guias_desde_tabla(xlsx_path: str, table_name: str, hojas: Iterable, columna: int,
+                      prefijo: str) -> List[int]:
+    """
+    Guías de la columna `columna` (1-based) de la tabla en cada hoja de `hojas`. Cada elemento
+    es un nombre de hoja o una lista de nombres alternativos (p.ej. nombres_hoja_del_dia()).
+    Los nombres de tabla son únicos en el libro, así que en las hojas de días anteriores la
+    tabla se llama distinto: se ubica por hoja con el índice de tablas (ubicar_tabla_por_hoja).
+    """
+    origen = origen_lectura(xlsx_path)
+    huella = huella_o_none(xlsx_path, origen)
+    indice = indice_tablas(origen, huella) if huella is not None else construir_indice_tablas(origen)
+    grupos = [[hoja] if isinstance(hoja, str) else list(hoja) for hoja in hojas]
+    ubicadas = ubicar_tabla_por_hoja(indice, table_name, [h for alternativas in grupos for h in alternativas])
+
+    filas: List[Tuple[int, object]] = []
+    for alternativas in grupos:
+        hoja = next((h for h in alternativas if h in ubicadas), None)
+        if hoja is None:
+            raise ValueError(f"No se encontró la tabla '{table_name}' (ni una equivalente) "
+                             f"en la(s) hoja(s) {alternativas}.")
+        nombre, ubicacion = ubicadas[hoja]
+        if columna < 1 or columna > ubicacion.columnas:
+            raise IndexError(f"La columna {columna} está fuera del rango de la tabla '{nombre}' "
+                             f"en la hoja '{hoja}' (1..{ubicacion.columnas}).")
+        valores = leer_rango_tabla(origen, ubicacion, 1, ubicacion.filas_datos, [columna])
+        if hasattr(origen, "seek"):
+            origen.seek(0)
+        filas.extend((fila, valor) for fila, (valor,) in valores)
+    guias, rechazos = guias_de_valores(filas, prefijo)
+    imprimir_rechazos(rechazos, "guías")
+    return guias
+
+
+def _dialecto_csv(muestra: str):
+    """Dialecto de la lista: ',' o ';' (Excel en español exporta con ';'); una sola columna usa el de Excel."""
+    try:
+        return csv.Sniffer().sniff(muestra, delimiters=",;\t")
+    except csv.Error:
+        return csv.excel
+
+
+def guias_desde_archivo(path: str, prefijo: str) -> List[int]:
+    """
+    Guías de una lista exportada: una por línea (primera columna si es CSV, separado por ',' o ';').
+    La primera fila se ignora solo si parece cabecera (sin dígitos); las demás filas que no sean
+    guías se informan como rechazos.
+    """
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        dialecto = _dialecto_csv(f.read(4096))
+        f.seek(0)
+        filas = [(i, fila[0]) for i, fila in enumerate(csv.reader(f, dialecto), start=1) if fila]
+    if filas and filas[0][0] == 1 and not any(c.isdigit() for c in str(filas[0][1])):
+        filas = filas[1:]
+    guias, rechazos = guias_de_valores(filas, prefijo)
+    imprimir_rechazos(rechazos, "guías")
+    return guias
@@ -28,16 +28,24 @@ Archivo destino: C:\\Users\\ealpiste\\Documents\\Mis scripts\\pedidos_distribuci
 import time
 import sys
 import os
-import tempfile
-import shutil
 from datetime import datetime
 from pywinauto.keyboard import send_keys
-from typing import List, Tuple
-import warnings
+from typing import List, Optional, Tuple
 
 # === Librerías de Excel ===
-from openpyxl import load_workbook
-from openpyxl.utils import range_boundaries
+from planificador_pedidos import SEG_POR_ACCION, CostoPedido, Plan, imprimir_ahorro_real, imprimir_plan, planificar
+from consolidacion_pedidos import PedidoConsolidado, consolidar_pedidos, imprimir_consolidacion, sin_consolidar
+from espejo_sqlite import LectorEspejo
+import latencia
+from espera_ui import imprimir_metricas
+import teclado
+from flujos import Accion, Esperar, Param, Si, Teclas, Texto, compilar, ejecutar, escapar, resumen
+from flujos import Plan as PlanFlujo
+from estado_despacho import RegistroEstados, medir, omitir_ya_ok
+from registro_despachos import RegistroDespachos
+from tabla_excel import LectorTabla, UbicacionTabla
+from validacion_lotes import Pedido, imprimir_rechazos, validar_pedidos
+from vigilante_tabla import VigilanteTabla
 
 # === Automatización por teclado/imagen ===
 try:
@@ -70,6 +78,14 @@ START_ROW_IN_TABLE = 53               # Fila inicial dentro de la tabla (sin con
 END_ROW_IN_TABLE =   62                  # Fila final dentro de la tabla (sin contar cabecera)
 TARGET_COLUMN_INDEX1 = 7              # 7ma columna de la tabla (agregado-destino)
 TARGET_COLUMN_INDEX2 = 6              # 6ta columna de la tabla (cubicaje)
+MODO_VIGILANCIA = False               # True: ingresa las filas nuevas a medida que se escriben (ignora END_ROW_IN_TABLE)
+USAR_ESPEJO_SQLITE = False            # True: lee la cola desde el espejo SQLite (espejo_sqlite.py) en vez del xlsx
+COLUMNA_ESTADO = None                 # Columna de la tabla (1-based) donde se escribe OK/ERROR por pedido; None: no se escribe
+CONSOLIDAR_PEDIDOS = False            # True: junta filas con el mismo (agregado, planta) en un solo pedido con el cubicaje sumado
+MAX_CUBICAJE_CONSOLIDADO = None       # Tope de m3 por pedido consolidado (None: sin tope)
+AGREGADOS_CONSOLIDABLES = None        # Agregados que se pueden juntar, p.ej. ["AR", "67"] (None: todos)
+PERMITIR_DUPLICADOS = False           # True: ingresa igual las filas ya ingresadas en corridas anteriores (registro_despachos.py)
+REORDENAR_PEDIDOS = False             # True: si el orden no importa, ingresa en el orden de menor costo (planta, luego agregado)
 
 # Ventana (solo informativo; si instalas pygetwindow, puedes usarlo para enfocar)
 WINDOW_TITLE_HINT = "UNICON - Módulo de PEDIDOS_y   bDISTRIBUCION - AGREGADOS"
@@ -83,6 +99,11 @@ DELAY_SHORT = 0.1   # pequeño entre teclas
 DELAY_MED = 0.25     # mediano entre pasos
 DELAY_LONG = 0.60    # largo cuando la UI cambia de grilla
 WAIT_AFTER_REFRESH = 1.20  # después de presionar 'b'b
+PAUSA_ENTRE_PEDIDOS = 0.8  # pausa de estabilidad entre pedidos
+
+# Navegación entre pedidos seguidos (dependen de cómo responde la UI; verifícalos antes de activarlos)
+REFRESCAR_SOLO_AL_CAMBIAR_PLANTA = False  # True: no presiona 'b' si la planta es la misma del pedido anterior
+PLANTA_CONSERVA_SELECCION = False         # True: la grilla de plantas queda en la planta anterior (flechas relativas)
 
 DRY_RUN = False  # True para simular sin enviar teclas
 
@@ -122,9 +143,8 @@ def type_text(text: str):
         log(f"[DRY] type_text('{text}')")
         return
     try:
-        # pywinauto.send_keys suele funcionar mejor en sesiones remotas/Citrix.
-        # send_keys interpreta modificadores especiales, pero para números/puntos no hay problema.
-        send_keys(str(text), pause=0.02)
+        # Backend de teclado.py (send_keys suele funcionar mejor en sesiones remotas/Citrix que pyautogui).
+        teclado.actual()(escapar(text), 0.02)
     except Exception:
         # Fallback a pyautogui si send_keys falla por alguna razón.
         pyautogui.typewrite(str(text), interval=0.02)
@@ -194,23 +214,40 @@ def locate_and_click_salidas() -> bool:
     log("[WARN] No se pudo localizar el botón 'Salidas'. Asegúrate de preparar 'salidas.png' o ajustar el flujo de TABs.")
     return False
 
-# ====== UTILIDADES ADICIONALES ======
-def crear_copia_temporal(xlsx_path: str) -> str:
-    """Crea una copia temporal del archivo xlsx y devuelve la ruta (delete=False)."""
-    fd, tmp_path = tempfile.mkstemp(suffix=".xlsx")
-    os.close(fd)
-    shutil.copy2(xlsx_path, tmp_path)
-    return tmp_path
-
 # ======================================================================
 # Lectura del Excel (tabla)
 # ======================================================================
-def leer_pedidos_desde_excel() -> List[Tuple[str, str, float]]:
-    """Lee (agregado-destino, planta, cubicaje) por fila desde la tabla.
+PROYECCION_PEDIDOS = "pedidos"
+PROYECCION_ESTADO_PEDIDOS = "estado_pedidos"
+
+def registrar_pedidos(lector: LectorTabla) -> None:
+    """Registra en el lector compartido las columnas agregado-destino y cubicaje del rango."""
+    lector.registrar(PROYECCION_PEDIDOS, START_ROW_IN_TABLE, END_ROW_IN_TABLE,
+                     [TARGET_COLUMN_INDEX1, TARGET_COLUMN_INDEX2])
+    if COLUMNA_ESTADO:
+        lector.registrar(PROYECCION_ESTADO_PEDIDOS, START_ROW_IN_TABLE, END_ROW_IN_TABLE, [COLUMNA_ESTADO])
+
+def pedidos_desde_lectura(lectura) -> List[Pedido]:
+    """Valida la proyección de pedidos de una lectura (ubicacion, proyecciones) de LectorTabla.
+    Con COLUMNA_ESTADO se omiten las filas ya ingresadas (estado OK).
+    """
+    ubicacion, proyecciones = lectura
+    pedidos = validar_lote_pedidos(proyecciones[PROYECCION_PEDIDOS])
+    if COLUMNA_ESTADO:
+        pedidos = omitir_ya_ok(pedidos, proyecciones[PROYECCION_ESTADO_PEDIDOS], EXCEL_PATH, ubicacion, COLUMNA_ESTADO)
+    return pedidos
+
+def leer_pedidos_desde_excel() -> List[Pedido]:
+    """Lee los pedidos del rango de la tabla (ver cargar_pedidos)."""
+    return cargar_pedidos()[1]
 
-    Retorna una lista de tuplas: (agregado, planta, cubicaje)
-    donde 'agregado' es uno de {'5','AR','67','89'} y 'planta' es
-    {'MEIGGS','OQUENDO','MATERIALES','COLLIQUE'}.
+def cargar_pedidos() -> Tuple[UbicacionTabla, List[Pedido]]:
+    """Lee los pedidos (agregado-destino, cubicaje) del rango de la tabla.
+
+    Retorna (ubicacion, pedidos) con Pedido(fila, agregado, planta, cubicaje)
+    donde 'agregado' es uno de AGREGADO_TO_DOWN_PRESSES ('5','AR','67','89') y
+    'planta' uno de PLANTA_TO_DOWN_PRESSES ('MEIGGS','OQUENDO','MATERIALES','COLLIQUE').
+    Las filas inválidas se informan juntas al final de la lectura.
     """
     # Hoja del día y mes actual en formato dd.mm
     sheet_name = datetime.now().strftime('%d.%m')
@@ -219,231 +256,173 @@ def leer_pedidos_desde_excel() -> List[Tuple[str, str, float]]:
     if not os.path.exists(EXCEL_PATH):
         raise FileNotFoundError(f"No existe el archivo de Excel: {EXCEL_PATH}")
 
-    wb = None
-    tmp_path = None
-    try:
-        try:
-            # Suprimir la advertencia conocida de openpyxl al leer ciertas validaciones
-            with warnings.catch_warnings():
-                warnings.filterwarnings(
-                    "ignore",
-                    message=".*Data Validation extension is not supported.*",
-                    category=UserWarning,
-                )
-                wb = load_workbook(EXCEL_PATH, data_only=True)
-        except (PermissionError, OSError) as e:
-            # Intentar crear y usar una copia temporal si el archivo original está bloqueado
-            log(f"[WARN] No se pudo abrir '{EXCEL_PATH}' directamente: {e}. Intentando copia temporal...")
-            try:
-                tmp_path = crear_copia_temporal(EXCEL_PATH)
-                with warnings.catch_warnings():
-                    warnings.filterwarnings(
-                        "ignore",
-                        message=".*Data Validation extension is not supported.*",
-                        category=UserWarning,
-                    )
-                    wb = load_workbook(tmp_path, data_only=True)
-            except Exception:
-                # Re-raise original error si no se puede leer ni la copia
-                raise
-    finally:
-        # eliminar la copia temporal si fue creada
-        if tmp_path and os.path.exists(tmp_path):
-            try:
-                os.remove(tmp_path)
-            except Exception:
-                pass
-
-    if wb is None:
-        raise ValueError("No se pudo cargar el libro de Excel.")
-
-    if sheet_name not in wb.sheetnames:
-        raise ValueError(f"La hoja '{sheet_name}' no existe en el Excel. Verifica el nombre (formato dd.mm).")
-
-    ws = wb[sheet_name]
-
-    # Obtener la tabla por nombre
-    table_obj = None
-    try:
-        # openpyxl >=3.1
-        if hasattr(ws, 'tables') and isinstance(ws.tables, dict) and TABLE_NAME in ws.tables:
-            table_obj = ws.tables[TABLE_NAME]
-        else:
-            # Compatibilidad con versiones que exponen _tables como lista
-            for t in getattr(ws, '_tables', []):
-                if getattr(t, 'name', None) == TABLE_NAME:
-                    table_obj = t
-                    break
-    except Exception:
-        pass
-
-    if table_obj is None:
-        raise ValueError(f"No se encontró la tabla '{TABLE_NAME}' en la hoja '{sheet_name}'.")
-
-    # Rango de la tabla, ej. 'A1:M200'
-    min_col, min_row, max_col, max_row = range_boundaries(table_obj.ref)
-
-    # Columnas destino dentro del rango de la tabla
-    col_agregado_destino = min_col + (TARGET_COLUMN_INDEX1 - 1)
-    col_cubicaje = min_col + (TARGET_COLUMN_INDEX2 - 1)
-
-    # Filas reales dentro del rango (sumar header: +1)
-    start_row = min_row + START_ROW_IN_TABLE
-    end_row = min_row + END_ROW_IN_TABLE
-
-    pedidos: List[Tuple[str, str, float]] = []
-
-    for r in range(start_row, end_row + 1):
-        celda_ag_dest = ws.cell(row=r, column=col_agregado_destino).value
-        celda_cubicaje = ws.cell(row=r, column=col_cubicaje).value
-
-        if celda_ag_dest is None:
-            continue
-
-        texto = str(celda_ag_dest).strip()
-        # esperado: 'AR-MEIGGS', '67-MATERIALES', etc.
-        if '-' not in texto:
-            log(f"[WARN] Formato inesperado en fila {r}: '{texto}' (se espera 'AGREGADO-DESTINO')")
-            continue
-        agregado, planta = [s.strip().upper() for s in texto.split('-', 1)]
-
-        # normalizar agregado numérico a string
-        if agregado in {'5', '67', '89', 'AR'}:
-            pass
-        else:
-            # intentar quitar sufijos (p.ej. '5 ')
-            agregado = agregado.replace('PIEDRA', '').replace('HUSO', '').strip()
-
-        # cubicaje numérico
-        try:
-            cubicaje = float(str(celda_cubicaje).replace(',', '').strip())
-        except Exception:
-            log(f"[WARN] Cubicaje inválido en fila {r}: '{celda_cubicaje}'")
-            continue
-
-        pedidos.append((agregado, planta, cubicaje))
+    # Solo se lee la hoja del día (streaming) y las dos columnas del rango
+    Lector = LectorEspejo if USAR_ESPEJO_SQLITE else LectorTabla
+    lector = Lector(EXCEL_PATH, TABLE_NAME, hojas_preferidas=[sheet_name], buscar_en_todas=False)
+    registrar_pedidos(lector)
+    lectura = lector.leer()
+    return lectura[0], pedidos_desde_lectura(lectura)
+
+def omitir_ingresados(despachados: RegistroDespachos, pedidos: List[Pedido]) -> List[Pedido]:
+    """Descarta las filas ya ingresadas en corridas anteriores y las repetidas en el lote (un solo reporte)."""
+    pedidos, rechazos = despachados.filtrar("pedido", pedidos, lambda p: (p.agregado, p.planta, p.cubicaje),
+                                            PERMITIR_DUPLICADOS)
+    imprimir_rechazos(rechazos, "pedidos (duplicados)")
+    return pedidos
 
+def consolidar_lote_pedidos(pedidos: List[Pedido]) -> List[PedidoConsolidado]:
+    """Con CONSOLIDAR_PEDIDOS junta las filas por (agregado, planta) e imprime la auditoría; si no, uno por fila."""
+    if not CONSOLIDAR_PEDIDOS:
+        return sin_consolidar(pedidos)
+    consolidados = consolidar_pedidos(pedidos, MAX_CUBICAJE_CONSOLIDADO, AGREGADOS_CONSOLIDABLES)
+    imprimir_consolidacion(consolidados)
+    return consolidados
+
+def costo_pedido(anterior, pedido) -> CostoPedido:
+    """Costo de procesar_pedido tras `anterior`, sacado del flujo compilado (esperas + teclas + acciones)."""
+    plan = plan_pedido(pedido.agregado, pedido.planta, pedido.cubicaje,
+                       anterior.planta if anterior is not None else None)
+    return CostoPedido(plan.segundos_minimos + plan.acciones * SEG_POR_ACCION + PAUSA_ENTRE_PEDIDOS, plan.teclas)
+
+def ordenar_lote_pedidos(pedidos: List[PedidoConsolidado]) -> Tuple[List[PedidoConsolidado], Optional[Plan]]:
+    """Con REORDENAR_PEDIDOS elige el orden de menor costo e imprime la estimación; si no, mantiene el de la tabla (sin plan)."""
+    if not REORDENAR_PEDIDOS:
+        return pedidos, None
+    plan = planificar(costo_pedido, pedidos, PLANTA_TO_DOWN_PRESSES, AGREGADO_TO_DOWN_PRESSES)
+    imprimir_plan(plan)
+    return plan.pedidos, plan
+
+def validar_lote_pedidos(filas) -> List[Pedido]:
+    """Valida por columnas [(fila, (agregado_destino, cubicaje))] e imprime un solo reporte de rechazos."""
+    pedidos, rechazos = validar_pedidos(filas, PLANTA_TO_DOWN_PRESSES, AGREGADO_TO_DOWN_PRESSES)
+    imprimir_rechazos(rechazos, "pedidos")
     return pedidos
 
 # ======================================================================
 # Flujo principal de envío a UNICON
 # ======================================================================
-def procesar_pedido(index: int, agregado: str, planta: str, cubicaje: float) -> None:
-    log(f"\n[INFO] Procesando pedido: {index} | Agregado='{agregado}' | Planta='{planta}' | Cubicaje={cubicaje}")  
-
+# Pasos de un pedido (ver flujos.py). Las esperas se nombran con las constantes DELAY_*/WAIT_*.
+FLUJO_PEDIDO = (
     # 2) refrescar búsqueda (posicionamiento inicial)
-    send_keys('b', pause=DELAY_SHORT)
-    time.sleep(WAIT_AFTER_REFRESH)
-
+    Si("refrescar", (Teclas("b", pausa="DELAY_SHORT"), Esperar("WAIT_AFTER_REFRESH"))),
     # 3) 2 TABs para ir a primera fila de la grilla superior (selección de planta)
-    send_keys("{TAB}{TAB}")
-    time.sleep(DELAY_MED)
-
-    # 4) Seleccionar planta por flechas abajo
-    down_planta = PLANTA_TO_DOWN_PRESSES.get(planta.upper(), 0)
-    if down_planta > 0:
-        # Usar send_keys para flechas
-        if DRY_RUN:
-            log(f"[DRY] send_keys('{{DOWN}}' * {down_planta})")
-        else:
-            send_keys("{DOWN}" * down_planta, pause=DELAY_SHORT)
-        time.sleep(DELAY_MED)
-
+    Teclas("{TAB}{TAB}"), Esperar("DELAY_MED"),
+    # 4) Seleccionar planta por flechas (abajo desde la primera fila, o relativas a la planta anterior)
+    Si("flechas_planta", (Teclas(Param("flecha_planta"), veces=Param("flechas_planta"), pausa="DELAY_SHORT"),
+                          Esperar("DELAY_MED"))),
     # 5) Pasar a la grilla inferior: tab, luego flecha abajo, clic en "Salidas", luego 8 tab
-    send_keys("{TAB}")
-    time.sleep(DELAY_SHORT)
-    # reemplazo de press('down')
-    if DRY_RUN:
-        log("[DRY] send_keys('{DOWN}')")
-    else:
-        send_keys('{DOWN}', pause=DELAY_SHORT)
-    time.sleep(DELAY_SHORT)
-    locate_and_click_salidas()
-    time.sleep(DELAY_MED)
-    # reemplazo de press('tab', presses=8)
-    if DRY_RUN:
-        log("[DRY] send_keys('{TAB}' * 8)")
-    else:
-        send_keys('{TAB}' * 8, pause=DELAY_SHORT)
-    time.sleep(DELAY_LONG)
-
+    Teclas("{TAB}"), Esperar("DELAY_SHORT"),
+    Teclas("{DOWN}", pausa="DELAY_SHORT"), Esperar("DELAY_SHORT"),
+    Accion(lambda p: locate_and_click_salidas(), "Salidas", latencia=True), Esperar("DELAY_MED"),
+    Teclas("{TAB}", veces=8, pausa="DELAY_SHORT"), Esperar("DELAY_LONG"),
     # 6) Seleccionar agregado en segunda tablilla
-    down_agregado = AGREGADO_TO_DOWN_PRESSES.get(agregado.upper(), 0)
-    if down_agregado > 0:
-        if DRY_RUN:
-            log(f"[DRY] send_keys('{{DOWN}}' * {down_agregado})")
-        else:
-            send_keys('{DOWN}' * down_agregado, pause=DELAY_SHORT)
-        time.sleep(DELAY_MED)
-
-    # 7) Seleccionar el número por defecto y sobreescribir con cubicaje
-    # usar pywinauto.send_keys con modificadores: ^ = Ctrl, + = Shift, {RIGHT} = flecha derecha
-    if DRY_RUN:
-        log("[DRY] send_keys('^+{RIGHT}')")
-    else:
-        send_keys('^+{RIGHT}', pause=DELAY_SHORT)
-    time.sleep(DELAY_SHORT)
-    type_text(str(int(cubicaje) if cubicaje.is_integer() else cubicaje))
-    time.sleep(DELAY_SHORT)
-
+    Si("down_agregado", (Teclas("{DOWN}", veces=Param("down_agregado"), pausa="DELAY_SHORT"), Esperar("DELAY_MED"))),
+    # 7) Seleccionar el número por defecto (Ctrl+Shift+Derecha) y sobreescribir con cubicaje
+    Teclas("^+{RIGHT}", pausa="DELAY_SHORT"), Esperar("DELAY_SHORT"),
+    Texto(Param("cubicaje"), pausa=0.02), Esperar("DELAY_SHORT"),
     # 8) Tab -> check -> despachar -> confirmar -> aceptar aviso
-    # reemplazo de press('tab')
-    if DRY_RUN:
-        log("[DRY] send_keys('{TAB}')")
-    else:
-        send_keys('{TAB}', pause=DELAY_SHORT)
-    time.sleep(DELAY_SHORT)
-    # reemplazo de press('space')
-    if DRY_RUN:
-        log("[DRY] send_keys('{SPACE}')")
-    else:
-        send_keys('{SPACE}', pause=DELAY_SHORT)
-    time.sleep(DELAY_SHORT)
-    # reemplazo de press('d')
-    if DRY_RUN:
-        log("[DRY] send_keys('d')")
-    else:
-        send_keys('d', pause=DELAY_SHORT)
-    time.sleep(DELAY_MED)
-    # reemplazo de press('y')
-    if DRY_RUN:
-        log("[DRY] send_keys('y')")
-    else:
-        send_keys('y', pause=DELAY_MED)
-    time.sleep(DELAY_MED)
-    # reemplazo de press('space')
-    if DRY_RUN:
-        log("[DRY] send_keys('{SPACE}')")
-    else:
-        send_keys('{SPACE}', pause=DELAY_MED)
-    time.sleep(DELAY_MED)
-
-    # 9) 1? TAB para volver al punto inicial
-    if DRY_RUN:
-        log("[DRY] send_keys('{TAB}' * 4)")
-    else:
-        send_keys('{TAB}', pause=DELAY_MED)
-    time.sleep(DELAY_MED)
-
+    Teclas("{TAB}", pausa="DELAY_SHORT"), Esperar("DELAY_SHORT"),
+    Teclas("{SPACE}", pausa="DELAY_SHORT"), Esperar("DELAY_SHORT"),
+    Teclas("d", pausa="DELAY_SHORT"), Esperar("DELAY_MED"),
+    Teclas("y", pausa="DELAY_MED"), Esperar("DELAY_MED"),
+    Teclas("{SPACE}", pausa="DELAY_MED"), Esperar("DELAY_MED"),
+    # 9) TAB para volver al punto inicial
+    Teclas("{TAB}", pausa="DELAY_MED"), Esperar("DELAY_MED"),
+)
+
+def esperas() -> dict:
+    """Valores vigentes de las esperas nombradas en FLUJO_PEDIDO (ajustados con LATENCIA_ADAPTATIVA)."""
+    return latencia.controlador().esperas({"DELAY_SHORT": DELAY_SHORT, "DELAY_MED": DELAY_MED,
+                                           "DELAY_LONG": DELAY_LONG, "WAIT_AFTER_REFRESH": WAIT_AFTER_REFRESH})
+
+def plan_pedido(agregado: str, planta: str, cubicaje: float, planta_anterior: Optional[str] = None) -> PlanFlujo:
+    """Compila FLUJO_PEDIDO para un pedido (ver procesar_pedido)."""
+    misma_planta = planta_anterior is not None and planta_anterior.upper() == planta.upper()
+    down_planta = PLANTA_TO_DOWN_PRESSES.get(planta.upper(), 0)
+    if planta_anterior is not None and PLANTA_CONSERVA_SELECCION:
+        down_planta -= PLANTA_TO_DOWN_PRESSES.get(planta_anterior.upper(), 0)
+    params = {
+        "refrescar": not (misma_planta and REFRESCAR_SOLO_AL_CAMBIAR_PLANTA),
+        "flecha_planta": "{DOWN}" if down_planta > 0 else "{UP}",
+        "flechas_planta": abs(down_planta),
+        "down_agregado": AGREGADO_TO_DOWN_PRESSES.get(agregado.upper(), 0),
+        "cubicaje": str(int(cubicaje) if cubicaje.is_integer() else cubicaje),
+    }
+    return compilar("pedido", FLUJO_PEDIDO, params, esperas())
+
+def procesar_pedido(index: int, agregado: str, planta: str, cubicaje: float,
+                    planta_anterior: Optional[str] = None) -> None:
+    """`planta_anterior`: planta del pedido procesado justo antes (None si es el primero)."""
+    log(f"\n[INFO] Procesando pedido: {index} | Agregado='{agregado}' | Planta='{planta}' | Cubicaje={cubicaje}")  
+    plan = plan_pedido(agregado, planta, cubicaje, planta_anterior)
+    if index == 1:
+        log(resumen(plan))
+    ejecutar(plan, dry_run=DRY_RUN, log=log)
     log(f"[OK] Pedido {index} procesado.")
 
+def main_vigilancia():
+    """Ingresa cada pedido nuevo de la hoja del día apenas se escribe (Ctrl+C para terminar).
+    La primera vez en la hoja empieza en START_ROW_IN_TABLE; luego sigue desde la marca de agua.
+    """
+    vigilante = VigilanteTabla(EXCEL_PATH, TABLE_NAME, [TARGET_COLUMN_INDEX1, TARGET_COLUMN_INDEX2],
+                               fila_inicial=START_ROW_IN_TABLE)
+    log("[INFO] Modo vigilancia: esperando pedidos nuevos (Ctrl+C para salir)...")
+    procesados = 0
+    try:
+        for lote in vigilante.iterar_lotes():
+            # Mientras se espera, el foco suele estar en Excel: volver a UNICON con Alt+Tab
+            focus_unicon_window()
+            validos = {p.fila: p for p in validar_lote_pedidos(lote)}
+            for fila, _ in lote:
+                pedido = validos.get(fila)
+                if pedido is not None:
+                    procesados += 1
+                    procesar_pedido(procesados, pedido.agregado, pedido.planta, pedido.cubicaje)
+                    time.sleep(PAUSA_ENTRE_PEDIDOS)
+                vigilante.confirmar(fila)
+    except KeyboardInterrupt:
+        pass
+    log(f"\n[DONE] Vigilancia terminada. Pedidos procesados: {procesados}")
+
 def main():
+    if MODO_VIGILANCIA:
+        main_vigilancia()
+        return
+
     # Leer pedidos
-    pedidos = leer_pedidos_desde_excel()
+    ubicacion, pedidos = cargar_pedidos()
+    despachados = RegistroDespachos(EXCEL_PATH, ubicacion.hoja)
+    pedidos = omitir_ingresados(despachados, pedidos)
     if not pedidos:
         log("[WARN] No se encontraron pedidos válidos en el rango especificado.")
         return
     
+    pedidos = consolidar_lote_pedidos(pedidos)
+    pedidos, plan = ordenar_lote_pedidos(pedidos)
+
     # 1) Enfocar UNICON
     focus_unicon_window()
 
-    # Iterar por fila -> un pedido por fila
-    for i, (agregado, planta, cubicaje) in enumerate(pedidos, start=1):
-        procesar_pedido(i, agregado, planta, cubicaje)
-        # Pequeña pausa entre pedidos por estabilidad
-        time.sleep(0.8)
+    # Un pedido por fila (o por grupo consolidado); con COLUMNA_ESTADO el resultado se escribe en la tabla al final
+    estados = RegistroEstados(EXCEL_PATH, ubicacion, COLUMNA_ESTADO) if COLUMNA_ESTADO else None
+    t0 = time.perf_counter()
+    try:
+        anterior = None
+        for i, pedido in enumerate(pedidos, start=1):
+            with medir(estados, pedido.filas):
+                procesar_pedido(i, pedido.agregado, pedido.planta, pedido.cubicaje, anterior)
+            despachados.confirmar("pedido", pedido.filas)
+            anterior = pedido.planta
+            # Pequeña pausa entre pedidos por estabilidad
+            time.sleep(PAUSA_ENTRE_PEDIDOS)
+    finally:
+        despachados.guardar()
+        if estados is not None:
+            estados.escribir()
+    imprimir_ahorro_real(plan, time.perf_counter() - t0)
 
     log("\n[DONE] Se procesaron todos los pedidos del rango indicado.")
+    imprimir_metricas()
 
 if __name__ == '__main__':
     main()
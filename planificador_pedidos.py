@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Orden de ingreso de pedidos con menor costo de navegación en UNICON.
+
+procesar_pedido() refresca con 'b' y baja a la planta con flechas en cada pedido. Si
+la UI permite aprovechar el pedido anterior (REFRESCAR_SOLO_AL_CAMBIAR_PLANTA y
+PLANTA_CONSERVA_SELECCION en pedidos_distribucion.py), agrupar los pedidos por planta y luego por
+agregado evita la mayor parte de esa navegación.
+
+El planificador estima cuánto cuesta cada orden candidato con una función de costo
+costo(anterior, pedido) -> CostoPedido y elige el más barato. pedidos_distribucion.py la
+arma compilando el mismo flujo que se ejecuta (plan_pedido(...).segundos_minimos), así el
+modelo no se separa del flujo. Al terminar, imprimir_ahorro_real() compara el tiempo
+estimado con el real de la corrida.
+
+Solo debe usarse cuando el orden de los pedidos no importa (REORDENAR_PEDIDOS).
+"""
+
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+SEG_POR_ACCION = 0.5          # duración estimada de una acción del flujo (búsqueda de 'Salidas' por imagen)
+
+
+class CostoPedido(NamedTuple):
+    segundos: float
+    teclas: int
+
+
+# costo(anterior, pedido): costo de procesar `pedido` justo después de `anterior` (None: primer pedido)
+Costo = Callable[[Optional[object], object], CostoPedido]
+
+
+class Plan(NamedTuple):
+    """Orden elegido y costos estimados del orden original y del elegido."""
+    pedidos: list
+    criterio: str
+    original: CostoPedido
+    elegido: CostoPedido
+
+    @property
+    def ahorro_estimado(self) -> float:
+        return self.original.segundos - self.elegido.segundos
+
+
+def costo_secuencia(costo: Costo, pedidos: Sequence) -> CostoPedido:
+    seg, teclas = 0.0, 0
+    anterior = None
+    for p in pedidos:
+        c = costo(anterior, p)
+        seg += c.segundos
+        teclas += c.teclas
+        anterior = p
+    return CostoPedido(seg, teclas)
+
+
+def _agrupar(pedidos: Sequence, clave_planta: Callable, clave_agregado: Callable) -> list:
+    # sorted es estable: dentro de cada (planta, agregado) se respeta el orden de las filas
+    return sorted(pedidos, key=lambda p: (clave_planta(p), clave_agregado(p)))
+
+
+def ordenes_candidatos(pedidos: Sequence, plantas: Dict[str, int],
+                       agregados: Dict[str, int]) -> List[Tuple[str, list]]:
+    """
+    Órdenes a evaluar: el original y agrupaciones por planta y luego agregado.
+    `plantas` / `agregados`: posición en la grilla (PLANTA_TO_DOWN_PRESSES / AGREGADO_TO_DOWN_PRESSES).
+    """
+    primera: Dict[Tuple[str, str], int] = {}
+    for i, p in enumerate(pedidos):
+        primera.setdefault(("P", p.planta.upper()), i)
+        primera.setdefault(("A", p.agregado.upper()), i)
+    abajo_planta = lambda p: plantas.get(p.planta.upper(), 0)
+    abajo_agregado = lambda p: agregados.get(p.agregado.upper(), 0)
+    return [
+        ("original", list(pedidos)),
+        ("planta/agregado por aparición",
+         _agrupar(pedidos, lambda p: primera[("P", p.planta.upper())], lambda p: primera[("A", p.agregado.upper())])),
+        ("planta/agregado por posición en la grilla", _agrupar(pedidos, abajo_planta, abajo_agregado)),
+        ("planta/agregado por posición inversa", _agrupar(pedidos, lambda p: -abajo_planta(p), abajo_agregado)),
+    ]
+
+
+def planificar(costo: Costo, pedidos: Sequence, plantas: Dict[str, int], agregados: Dict[str, int]) -> Plan:
+    """Elige el orden candidato más barato; ante empate se queda con el primero (el original)."""
+    evaluados = [(costo_secuencia(costo, orden), i, criterio, orden)
+                 for i, (criterio, orden) in enumerate(ordenes_candidatos(pedidos, plantas, agregados))]
+    original = evaluados[0][0]
+    costo_elegido, _, criterio, orden = min(evaluados, key=lambda e: (round(e[0].segundos, 6), e[1]))
+    return Plan(orden, criterio, original, costo_elegido)
+
+
+def imprimir_plan(plan: Plan) -> None:
+    print(f"[INFO] Orden de ingreso: {plan.criterio}. Estimado {plan.elegido.segundos:.1f} s / "
+          f"{plan.elegido.teclas} teclas (original {plan.original.segundos:.1f} s / {plan.original.teclas} teclas; "
+          f"ahorro estimado {plan.ahorro_estimado:.1f} s).")
+
+
+def imprimir_ahorro_real(plan: Optional[Plan], segundos_reales: float) -> None:
+    """
+    Compara la corrida real con el modelo. El ahorro real se estima escalando el costo del
+    orden original por la razón real/estimado observada en esta corrida. Sin plan (no se
+    reordenó) no imprime nada.
+    """
+    if plan is None or plan.elegido.segundos <= 0:
+        return
+    razon = segundos_reales / plan.elegido.segundos
+    ahorro_real = plan.original.segundos * razon - segundos_reales
+    print(f"[TIEMPO] Pedidos: real {segundos_reales:.1f} s vs estimado {plan.elegido.segundos:.1f} s "
+          f"(x{razon:.2f}). Ahorro estimado {plan.ahorro_estimado:.1f} s, real ~{ahorro_real:.1f} s.")
@@ -10,7 +10,7 @@ Flujo:
 - TAB x15 hasta "Guía 7 dígitos", limpia, escribe sufijo (7 dígitos) y Enter para buscar
 - Localiza "Obtener PDF" por imagen (región de la ventana) y hace clic
 - Espera la apertura del PDF y **restituye el foco al SDC** (ENTER + ALT+TAB / ALT+ESC)
-- Repite para el rango
+- Repite para cada guía de la lista (GUIAS_ORIGEN: rango, tabla del día o lista exportada)
 
 Requisitos:
   python -m pip install --upgrade pillow pyscreeze opencv-python pyautogui pywinauto
@@ -24,16 +24,34 @@ import os
 import time
 import ctypes
 from datetime import datetime
-import pyautogui, re
-from pywinauto import Application, Desktop
+import pyautogui
 from pywinauto.keyboard import send_keys
 
+import latencia
+import registro_ventanas
+from espera_ui import SONDEO_VENTANAS, Plazo, imprimir_metricas, ventana_presente, wait_until
+from flujos import Accion, Esperar, Param, Teclas, Texto, compilar, ejecutar, resumen
+from lista_guias import guias_desde_archivo, guias_desde_tabla
+from tabla_excel import nombres_hoja_del_dia
+
 # ============== CONFIGURACIÓN ===
 # ===========
 GUIA_PREFIJO_FIJO = "195"     # lo estableces manualmente en el campo 'Guía (prefijo)' antes de ejecutar
 GUIA_INICIO = 185267
           # ej.: 184241 -> se convertirá en "0184241"
 GUIA_FIN    = 185276
+
+# Origen de la lista de guías:
+#   "rango"   -> todos los números de GUIA_INICIO a GUIA_FIN
+#   "tabla"   -> columna de guías de la tabla de despacho (hoja del día o HOJAS_GUIAS)
+#   "archivo" -> lista exportada GUIAS_ARCHIVO (.txt/.csv, una guía por línea)
+# Con "tabla"/"archivo" solo se recorren guías reales (sin duplicados, ordenadas).
+GUIAS_ORIGEN = "rango"
+EXCEL_PATH = r"C:\Users\ealpiste\OneDrive - Unacem.corp\Compartido Victor\DESPACHO DE AGREGADOS_YB 2025 2.3.xlsx"
+TABLE_NAME = "Tabla276"
+COLUMNA_GUIA = 5              # columna (1-based) de la guía dentro de la tabla
+HOJAS_GUIAS = None            # p.ej. ["06.03", "07.03"]; None: hoja del día
+GUIAS_ARCHIVO = None          # ruta de la lista exportada
 # Tabs según tu mapeo (AJUSTADO A 15)
 TABS_PREFIJO_A_7D = 15        # de 'Guía (prefijo)' -> 'Guía (7 dígitos)'
 
@@ -58,25 +76,10 @@ DEBUG_SHOT = os.path.join(SCRIPT_DIR, "debug_window_region.png")
 # ============== UTILIDADES DE VENTANA/Foco ==============
 user32 = ctypes.windll.user32
 
-def _match_sdc_title(title: str) -> bool:
-    """Identifica la ventana del RemoteApp por substrings tolerantes."""
-    return bool(title) and ("unicon" in title.lower()) and ("almacen" in title.lower())
-
 def conectar_sdc():
-    """Conecta a la ventana principal del SDC (ALMACEN) probando UIA/Win32."""
-    for backend in ("uia", "win32"):
-        try:
-            desktop = Desktop(backend=backend)
-            candidates = [w for w in desktop.windows() if _match_sdc_title(w.window_text())]
-            if candidates:
-                target = candidates[0]
-                app = Application(backend=backend).connect(handle=target.handle)
-                win = app.window(handle=target.handle)
-                print(f"[INFO] Conectado a: '{target.window_text()}' (backend={backend}, handle={target.handle})")
-                return app, win
-        except Exception:
-            continue
-    raise RuntimeError("No pude conectar al SDC (ALMACEN). Verifica que esté visible y maximizado.")
+    """Conecta a la ventana principal del SDC (ALMACEN) vía registro_ventanas."""
+    app, win, _ = registro_ventanas.conectar("ALMACEN")
+    return app, win
 
 def get_window_region(win):
     """Región de la ventana (left, top, width, height) para locateOnScreen."""
@@ -126,15 +129,17 @@ def focus_window_hard_enter(win, retries=4, pause=0.2):
 # ============== Envío de teclas ==============
 DEBUG_DELAY = 0.01  # sube/baja para observar cada paso más claro
 
+def asegurar_foco_sdc(win) -> bool:
+    """Verifica/forcea foco con focus_window_hard_enter (sin clic)."""
+    return is_sdc_foreground(win) or focus_window_hard_enter(win)
+
 def ensure_sdc_and_send_keys_hard(win, keys: str, desc: str = ""):
     """
     Verifica/forcea foco con focus_window_hard_enter (sin clic),
     luego envía teclas y espera DEBUG_DELAY para observar en depuración.
     """
-    ok = is_sdc_foreground(win)
-    if not ok:
-        ok = focus_window_hard_enter(win)
-        # print(f"[FOCUS] {'OK' if ok else 'FAIL'} foco antes de '{desc or keys}' (fg={get_foreground_handle()}, sdc={win.handle})")
+    ok = asegurar_foco_sdc(win)
+    # print(f"[FOCUS] {'OK' if ok else 'FAIL'} foco antes de '{desc or keys}' (fg={get_foreground_handle()}, sdc={win.handle})")
     send_keys(keys)
     # print(f"[KEYS] Enviadas: {keys}  ({desc})")
     time.sleep(DEBUG_DELAY)
@@ -225,60 +230,25 @@ def print_3_copies(win):
     PRINT_DIALOG_TRY_INTERVAL = 0.4   # espera entre reintentos de enviar Ctrl+P (seg)
     INNER_CHECK_TIMEOUT = 2.5         # espera tras cada Ctrl+P para que aparezca el diálogo (seg)
 
-    t0 = time.time()
+    plazo = Plazo(PRINT_DIALOG_MAX_WAIT)
     dlg_ok = False
+    # Diálogo de impresión: UIA o Win32, títulos ES/EN, tamaño mínimo plausible (evita elementos pequeños)
+    dialogo = ventana_presente(r"\b(imprimir|print)\b", ("uia", "win32"), regex=True,
+                               ancho_min=80, alto_min=30, visible=True)
 
     print(f"[INFO] Espera de {INNER_CHECK_TIMEOUT: .2f}s antes de intentar imprimir...")
     time.sleep(INNER_CHECK_TIMEOUT)
-    while time.time() - t0 < PRINT_DIALOG_MAX_WAIT:
+    while not plazo.vencido:
         try:
             print(f"[INFO] Intento")
             send_keys("^p")  # Ctrl+P
         except Exception:
             pass
 
-        # Esperar breve y comprobar si apareció el diálogo (prueba UIA y Win32, títulos ES/EN)
-        t_inner = time.time()
-        while time.time() - t_inner < INNER_CHECK_TIMEOUT:
-            dlg_found = False
-            for backend in ("uia", "win32"):
-                try:
-                    d = Desktop(backend=backend)
-                    for w in d.windows():
-                        try:
-                            title = (w.window_text() or "")
-                            if not re.search(r"(?i)\b(imprimir|print)\b", title):
-                                continue
-                            # comprobar tamaño mínimo plausible (evita coincidencias con elementos pequeños)
-                            try:
-                                rect = w.rectangle()
-                                wwidth = rect.right - rect.left
-                                wheight = rect.bottom - rect.top
-                                if wwidth < 80 or wheight < 30:
-                                    continue
-                            except Exception:
-                                pass
-                            # comprobar visibilidad si disponible
-                            try:
-                                if hasattr(w, "is_visible") and not w.is_visible():
-                                    continue
-                            except Exception:
-                                pass
-                            dlg_found = True
-                            break
-                        except Exception:
-                            continue
-                    if dlg_found:
-                        break
-                except Exception:
-                    continue
-            if dlg_found:
-                print(f"[INFO] Apareció el diálogo de impresión")
-                dlg_ok = True
-                break
-            time.sleep(0.2)
-
-        if dlg_ok:
+        # Esperar a que aparezca el diálogo (sin pasarse del plazo total)
+        if wait_until(dialogo, INNER_CHECK_TIMEOUT, SONDEO_VENTANAS, plazo, nombre="diálogo de impresión"):
+            print(f"[INFO] Apareció el diálogo de impresión")
+            dlg_ok = True
             break
 
         # Espera antes de reintentar enviar Ctrl+P
@@ -288,17 +258,7 @@ def print_3_copies(win):
         print("[WARN] No apareció el diálogo de impresión tras reintentos — el PDF puede no haber cargado.")
         return False
 
-    # Navegar en el diálogo con TABs
-    time.sleep(0.12)
-    for _ in range(4):
-        send_keys("{TAB}")
-
-    # Escribir número de copias y confirmar
-    send_keys("3")
-    time.sleep(0.08)
-    send_keys("{ENTER}")
-    #send_keys("{ESC}")  # Cerrar diálogo para evitar IMPRIMIR en pruebas
-    time.sleep(0.4)
+    ejecutar(compilar("copias", FLUJO_COPIAS))
     return True
 
 # ============== Retorno robusto a SDC tras abrir PDF ==============
@@ -311,7 +271,7 @@ def return_to_sdc(win, timeout=6.0):
     4) Si aún falla, ALT+ESC (ciclo rápido de ventanas)
     """
     t0 = time.time()
-    time.sleep(WAIT_AFTER_PDF_OPEN)
+    time.sleep(latencia.controlador().valor("WAIT_AFTER_PDF_OPEN", WAIT_AFTER_PDF_OPEN))
 
     # 1) Intento directo (no funciona)
     """ if focus_window_hard_enter(win):
@@ -338,38 +298,77 @@ def return_to_sdc(win, timeout=6.0):
     # 4) Último intento directo
     """ return focus_window_hard_enter(win) """
 
+# ============== FLUJOS DE TECLADO (ver flujos.py) ==============
+# Buscar una guía: foco 'hard' → TAB x15 hasta 'Guía 7 dígitos' → limpiar, escribir y Enter.
+# El foco se verifica una vez antes de escribir (las tres teclas salen en un solo envío).
+FLUJO_BUSCAR_GUIA = (
+    # 1) Foco 'hard' con ENTER al inicio
+    Accion(lambda p: focus_window_hard_enter(p["win"]), "foco SDC"), Esperar("DEBUG_DELAY"),
+    # 2) Ir de 'Guía (prefijo)' a 'Guía 7 dígitos'
+    Teclas("{TAB}", veces=TABS_PREFIJO_A_7D),
+    # 3) Escribir sufijo y Enter para 'Buscar'
+    Accion(lambda p: asegurar_foco_sdc(p["win"]), "foco antes de escribir"),
+    Teclas("^a{BACKSPACE}"), Texto(Param("sufijo")), Teclas("{ENTER}"),
+    Esperar("WAIT_AFTER_SEARCH"),
+)
+
+# Diálogo de impresión: TAB x4 hasta 'Copias' → 3 → Enter ({ESC} en vez de {ENTER} para pruebas)
+FLUJO_COPIAS = (
+    Esperar(0.12),
+    Teclas("{TAB}", veces=4), Teclas("3"), Esperar(0.08),
+    Teclas("{ENTER}"), Esperar(0.4),
+)
+
+
+def esperas() -> dict:
+    """Valores vigentes de las esperas nombradas en los flujos (ajustados con LATENCIA_ADAPTATIVA)."""
+    return latencia.controlador().esperas({"DEBUG_DELAY": DEBUG_DELAY, "WAIT_AFTER_SEARCH": WAIT_AFTER_SEARCH})
+
+
+def plan_buscar_guia(win, sufijo_7d: str):
+    return compilar("buscar guía", FLUJO_BUSCAR_GUIA, {"win": win, "sufijo": sufijo_7d}, esperas())
+
+# ============== LISTA DE GUÍAS ==============
+def guias_a_imprimir():
+    """Sufijos de guía a imprimir según GUIAS_ORIGEN."""
+    if GUIAS_ORIGEN == "tabla":
+        hojas = HOJAS_GUIAS or [nombres_hoja_del_dia()]
+        return guias_desde_tabla(EXCEL_PATH, TABLE_NAME, hojas, COLUMNA_GUIA, GUIA_PREFIJO_FIJO)
+    if GUIAS_ORIGEN == "archivo":
+        return guias_desde_archivo(GUIAS_ARCHIVO, GUIA_PREFIJO_FIJO)
+    inicio, fin = sorted((GUIA_INICIO, GUIA_FIN))
+    return list(range(inicio, fin + 1))
+
 # ============== FLUJO PRINCIPAL ==============
 def main():
     if not os.path.isfile(IM_OBTENER_PDF):
         raise FileNotFoundError(f"Imagen 'Obtener PDF' no existe: {IM_OBTENER_PDF}")
 
+    guias = guias_a_imprimir()
+    if not guias:
+        print("[WARN] No hay guías para imprimir.")
+        return
+    print(f"[INFO] {len(guias)} guía(s) a imprimir ({GUIAS_ORIGEN}).")
+
     app, win = conectar_sdc()
 
-    inicio, fin = sorted((GUIA_INICIO, GUIA_FIN))
     procesadas, errores = 0, []
+    latencia.controlador().usar_region(get_window_region(win))
+    print(resumen(plan_buscar_guia(win, f"{guias[0]:07d}")))
 
-    for sfx in range(inicio, fin + 1):
+    for sfx in guias:
         sufijo_7d = f"{sfx:07d}"
         print(f"\n[INFO] Procesando guía: {GUIA_PREFIJO_FIJO}-{sufijo_7d}")
 
-        # 1) Foco 'hard' con ENTER al inicio
-        _ = focus_window_hard_enter(win)
-        time.sleep(DEBUG_DELAY)
-
-        # 2) Ir de 'Guía (prefijo)' a 'Guía 7 dígitos' (TAB x15)
-        tab_hard(win, TABS_PREFIJO_A_7D, desc="A Guía 7 dígitos")
-
-        # 3) Escribir sufijo y Enter para 'Buscar'
-        ensure_sdc_and_send_keys_hard(win, "^a{BACKSPACE}", "Limpiar 7 dígitos")
-        ensure_sdc_and_send_keys_hard(win, sufijo_7d, "Escribir 7 dígitos")
-        ensure_sdc_and_send_keys_hard(win, "{ENTER}", "Buscar (Enter)")
-        time.sleep(WAIT_AFTER_SEARCH)
+        # 1-3) Foco, TAB x15 a 'Guía 7 dígitos', sufijo y Enter para 'Buscar'
+        ejecutar(plan_buscar_guia(win, sufijo_7d))
 
         # 4) Click en 'Obtener PDF' por imagen
         if not click_obtener_pdf_por_imagen(win, IM_OBTENER_PDF):
             msg = f"No se encontró 'Obtener PDF' (guía {sufijo_7d}). Revisa debug_window_region_*.png y la plantilla."
             print("[WARN]", msg)
             errores.append(msg)
+            latencia.controlador().fallo(["WAIT_AFTER_SEARCH"])
             print(f"\n[INFO] PASÓ POR:errores.append(msg)")
             continue
 
@@ -392,6 +391,7 @@ def main():
         print("[ERRORES]")
         for e in errores:
             print(" -", e)
+    imprimir_metricas()
 
 if __name__ == "__main__":
     main()
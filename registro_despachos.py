@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Registro persistente de lo ya despachado, para no despachar dos veces la misma fila.
+
+Si el rango de filas de hoy se cruza con el de la corrida anterior (o se vuelve a correr
+una hoja), nada impedía repetir una placa o un pedido: un ciclo de UI perdido más la
+limpieza manual en UNICON. Antes de despachar, cada lote se revisa contra un conjunto
+de hashes de lo ya despachado (búsqueda O(1) por registro).
+
+- La clave de un registro es un hash corto (blake2b, 8 bytes) de: tipo ('placa'/'pedido'),
+  fecha de la hoja, fila de la tabla y sus campos (placa normalizada; agregado, planta y
+  cubicaje). La fila entra en la clave porque un mismo camión o el mismo pedido se repiten
+  legítimamente en el día; lo que no se repite es la misma fila con el mismo contenido.
+- Por la misma razón, dentro del lote las filas con igual contenido no se descartan (son
+  viajes repetidos): solo se avisa cuántas hay, comparando por contenido sin la fila.
+- Filas desplazadas: si se insertan u ordenan filas por encima de las ya despachadas, el
+  mismo contenido cambia de fila y su clave ya no coincide. Por eso también se guarda una
+  clave solo de contenido (tipo, fecha y campos); una fila nueva cuyo contenido ya se
+  despachó desde otra fila de la hoja se avisa para revisarla (no se descarta: puede ser
+  otro viaje del mismo camión).
+- Solo se guardan las filas confirmadas (despacho terminado sin error).
+- El conjunto vive en despachados.json (carpeta de datos local) como {hash: fecha del
+  despacho} y se podan las entradas despachadas hace más de RETENCION_DIAS días, así se
+  mantiene chico.
+- PERMITIR_DUPLICADOS (en cada script) despacha igual los repetidos, avisando.
+"""
+
+import hashlib
+import json
+import os
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import cache_tabla
+from espejo_sqlite import anio_libro, fecha_de_hoja
+from validacion_lotes import Rechazo
+
+# ====== VARIABLES AJUSTABLES ======
+DESPACHADOS_PATH = os.path.join(cache_tabla.DATA_DIR, "despachados.json")
+RETENCION_DIAS = 14          # días (desde el despacho) que se recuerda una fila despachada
+
+
+def _leer(path: str) -> Dict[str, str]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"[WARN] No se pudo leer {path} ({e}). Se empieza sin registro de despachados.")
+        return {}
+
+
+class RegistroDespachos:
+    """Conjunto de filas ya despachadas de una hoja; filtra lotes y confirma lo despachado."""
+
+    def __init__(self, xlsx_path: str, hoja: str, path: Optional[str] = None,
+                 retencion_dias: int = RETENCION_DIAS):
+        self.path = path or DESPACHADOS_PATH
+        self.retencion_dias = retencion_dias
+        self.hoja = hoja
+        fecha = fecha_de_hoja(hoja, anio_libro(xlsx_path))
+        # hojas que no son días dd.mm: la hoja entra en la clave en vez de la fecha
+        self._contexto = fecha.isoformat() if fecha else f"hoja:{hoja}"
+        self._items = self._vigentes(_leer(self.path))
+        self._pendientes: Dict[Tuple[str, int], str] = {}
+        self._contenidos: Dict[Tuple[str, int], str] = {}
+        self._confirmados: Dict[str, str] = {}
+
+    def _vigentes(self, items: Dict[str, str]) -> Dict[str, str]:
+        limite = (date.today() - timedelta(days=self.retencion_dias)).isoformat()
+        return {k: f for k, f in items.items() if f >= limite}
+
+    def clave(self, tipo: str, fila: int, campos: Iterable) -> str:
+        texto = "|".join([tipo, self._contexto, str(fila)] + [str(c) for c in campos])
+        return hashlib.blake2b(texto.encode("utf-8"), digest_size=8).hexdigest()
+
+    def clave_contenido(self, tipo: str, campos: Iterable) -> str:
+        """Clave sin la fila: detecta el mismo contenido en otra fila (filas desplazadas)."""
+        return self.clave(f"{tipo}:contenido", 0, campos)
+
+    def __contains__(self, clave: str) -> bool:
+        return clave in self._items or clave in self._confirmados
+
+    def filtrar(self, tipo: str, registros: Sequence, campos: Callable[[object], tuple],
+                permitir_duplicados: bool = False) -> Tuple[list, List[Rechazo]]:
+        """
+        Separa (nuevos, rechazos): rechaza las filas ya despachadas en corridas anteriores
+        (con permitir_duplicados pasan igual, con aviso). Avisa, sin descartarlas, las filas con
+        el mismo contenido que otra del lote y las nuevas cuyo contenido ya se despachó desde
+        otra fila de la hoja (posibles filas desplazadas).
+        `registros` deben tener `.fila`; `campos(registro)` da los campos que identifican su contenido.
+        """
+        nuevos, rechazos, forzados = [], [], 0
+        en_lote: Dict[str, int] = {}
+        desplazadas: List[int] = []
+        for r in registros:
+            valores = campos(r)
+            k = self.clave(tipo, r.fila, valores)
+            kc = self.clave_contenido(tipo, valores)
+            en_lote[kc] = en_lote.get(kc, 0) + 1
+            if k in self:
+                if not permitir_duplicados:
+                    rechazos.append(Rechazo(r.fila, tipo.upper(), valores,
+                                            f"ya despachada (hoja {self.hoja}); PERMITIR_DUPLICADOS para repetir"))
+                    continue
+                forzados += 1
+            elif kc in self:
+                desplazadas.append(r.fila)
+            self._pendientes[(tipo, r.fila)] = k
+            self._contenidos[(tipo, r.fila)] = kc
+            nuevos.append(r)
+        if forzados:
+            print(f"[WARN] {forzados} fila(s) ya despachada(s) se despachan igual (PERMITIR_DUPLICADOS).")
+        repetidas = sum(n - 1 for n in en_lote.values())
+        if repetidas:
+            print(f"[INFO] {repetidas} fila(s) del lote repiten el contenido de otra (viajes repetidos); se despachan.")
+        if desplazadas:
+            print(f"[WARN] Fila(s) {desplazadas} ({tipo}): el mismo contenido ya se despachó desde otra fila de la hoja "
+                  f"(¿se insertaron u ordenaron filas?). Revisa antes de continuar; se despachan.")
+        return nuevos, rechazos
+
+    def confirmar(self, tipo: str, filas: Iterable[int]) -> None:
+        """Marca como despachadas las filas (de un lote filtrado) que terminaron bien."""
+        hoy = date.today().isoformat()
+        for fila in filas:
+            k = self._pendientes.pop((tipo, fila), None)
+            if k is not None:
+                self._confirmados[k] = hoy
+                self._confirmados[self._contenidos.pop((tipo, fila))] = hoy
+
+    def guardar(self) -> None:
+        """Une lo confirmado con lo que haya en disco (otro script pudo escribir), poda y guarda."""
+        if not self._confirmados:
+            return
+        items = self._vigentes({**_leer(self.path), **self._confirmados})
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(items, f)
+        os.replace(tmp_path, self.path)
+        self._items = items
+        self._confirmados = {}
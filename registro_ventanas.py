@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Registro persistente de las ventanas de los módulos UNICON (handle, backend, PID, título).
+
+conectar_sdc() estaba copiado en despacho_placas.py, print_guias.py y dump_sdc_controls.py,
+cada uno con su variante del filtro de título, y en cada arranque armaba Desktop(backend=...)
+y recorría todas las ventanas de primer nivel en UIA y luego en Win32 (segundos dentro del
+cliente Citrix). Aquí:
+
+- es_titulo_modulo(titulo, modulo): un solo filtro tolerante (sin mayúsculas ni tildes) por
+  módulo, según las palabras de MODULOS.
+- conectar(modulo): prueba primero la entrada guardada en DATA_DIR/ventanas.json; la valida
+  con IsWindow + título (+ PID si se conoce), todo ctypes, y conecta por handle con el backend
+  que funcionó la vez anterior. Solo si no sirve enumera (EnumWindows por ctypes; fuera de
+  Windows, Desktop de pywinauto) y guarda lo encontrado para la próxima corrida.
+
+El archivo es un caché: si se borra o queda viejo, la conexión vuelve a enumerar sola.
+"""
+
+import ctypes
+import json
+import os
+import sys
+import time
+import unicodedata
+from ctypes import wintypes
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+import cache_tabla
+import vigia_ventanas
+
+# ====== VARIABLES AJUSTABLES ======
+REGISTRO_VENTANAS = True      # False: enumerar siempre (no leer ni escribir el caché)
+BACKENDS = ("uia", "win32")   # orden de preferencia al conectar tras enumerar
+REGISTRO_PATH = os.path.join(cache_tabla.DATA_DIR, "ventanas.json")
+
+# Palabras que debe contener el título (minúsculas, sin tildes) para cada módulo UNICON
+MODULOS: Dict[str, Tuple[str, ...]] = {
+    "ALMACEN": ("unicon", "almacen"),
+    "PEDIDOS": ("unicon", "pedidos"),
+}
+
+
+class EntradaVentana(NamedTuple):
+    handle: int
+    backend: str
+    pid: int
+    titulo: str
+
+
+# ====== TÍTULOS ======
+def _normalizar(texto: str) -> str:
+    descompuesto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in descompuesto if not unicodedata.combining(c)).lower()
+
+
+def es_titulo_modulo(titulo: str, modulo: str = "ALMACEN") -> bool:
+    """True si el título contiene todas las palabras del módulo (p.ej. 'UNICON - Módulo de ALMACEN')."""
+    t = _normalizar(titulo)
+    return bool(t) and all(palabra in t for palabra in MODULOS[modulo.upper()])
+
+
+# ====== WINDOWS (ctypes) ======
+def _es_ventana(handle: int) -> bool:
+    return sys.platform == "win32" and bool(vigia_ventanas._user32().IsWindow(handle))
+
+
+def pid_de(handle: int) -> int:
+    if sys.platform != "win32":
+        return 0
+    pid = wintypes.DWORD()
+    vigia_ventanas._user32().GetWindowThreadProcessId(handle, ctypes.byref(pid))
+    return pid.value
+
+
+# ====== ESTADO ======
+def cargar(path: str = REGISTRO_PATH) -> Dict[str, EntradaVentana]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            datos = json.load(f)
+        return {m: EntradaVentana(int(e["handle"]), e["backend"], int(e.get("pid", 0)), e.get("titulo", ""))
+                for m, e in datos.items()}
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return {}
+
+
+def guardar(modulo: str, entrada: EntradaVentana, path: str = REGISTRO_PATH) -> None:
+    entradas = cargar(path)
+    entradas[modulo.upper()] = entrada
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({m: e._asdict() for m, e in entradas.items()}, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def validar(entrada: EntradaVentana, modulo: str) -> Optional[str]:
+    """Título actual si el handle guardado sigue siendo la ventana del módulo (mismo proceso); si no, None."""
+    if not _es_ventana(entrada.handle):
+        return None
+    titulo = vigia_ventanas.titulo_de(entrada.handle)
+    if not es_titulo_modulo(titulo, modulo):
+        return None
+    if entrada.pid and pid_de(entrada.handle) != entrada.pid:
+        return None
+    return titulo
+
+
+# ====== BÚSQUEDA ======
+def _candidatos(modulo: str) -> Iterable[Tuple[int, str]]:
+    """(handle, título) de las ventanas del módulo, visibles primero; sin Windows, vía pywinauto."""
+    if sys.platform == "win32":
+        ventanas = sorted(vigia_ventanas.enumerar_ventanas().values(), key=lambda v: not v.visible)
+        yield from ((v.handle, v.titulo) for v in ventanas if es_titulo_modulo(v.titulo, modulo))
+        return
+    from pywinauto import Desktop
+    for backend in BACKENDS:
+        try:
+            for w in Desktop(backend=backend).windows():
+                if es_titulo_modulo(w.window_text(), modulo):
+                    yield w.handle, w.window_text()
+        except Exception:
+            continue
+
+
+def _conectar_handle(handle: int, backends: Iterable[str]):
+    """(app, win, backend) con el primer backend que conecte al handle; None si ninguno."""
+    from pywinauto import Application
+    for backend in backends:
+        try:
+            app = Application(backend=backend).connect(handle=handle)
+            return app, app.window(handle=handle), backend
+        except Exception:
+            continue
+    return None
+
+
+def conectar(modulo: str = "ALMACEN", path: str = REGISTRO_PATH):
+    """
+    Conecta a la ventana del módulo UNICON. Devuelve (app, win, backend) o lanza RuntimeError.
+    Usa el handle guardado si sigue válido; si no, enumera y actualiza el registro.
+    """
+    modulo = modulo.upper()
+    t0 = time.perf_counter()
+    entrada = cargar(path).get(modulo) if REGISTRO_VENTANAS else None
+    if entrada is not None:
+        titulo = validar(entrada, modulo)
+        orden = (entrada.backend,) + tuple(b for b in BACKENDS if b != entrada.backend)
+        conexion = _conectar_handle(entrada.handle, orden) if titulo else None
+        if conexion is not None:
+            print(f"[INFO] Conectado a: '{titulo}' (backend={conexion[2]}, handle={entrada.handle}, registro)")
+            print(f"[TIEMPO] Conexión {modulo}: {time.perf_counter() - t0:.3f} s")
+            return conexion
+        print(f"[INFO] Ventana {modulo} guardada ya no es válida (handle={entrada.handle}); se enumera.")
+
+    for handle, titulo in _candidatos(modulo):
+        conexion = _conectar_handle(handle, BACKENDS)
+        if conexion is None:
+            continue
+        if REGISTRO_VENTANAS:
+            try:
+                guardar(modulo, EntradaVentana(handle, conexion[2], pid_de(handle), titulo), path)
+            except OSError as e:
+                print(f"[WARN] No pude guardar el registro de ventanas: {e}")
+        print(f"[INFO] Conectado a: '{titulo}' (backend={conexion[2]}, handle={handle})")
+        print(f"[TIEMPO] Conexión {modulo}: {time.perf_counter() - t0:.3f} s")
+        return conexion
+    raise RuntimeError(f"No pude conectar al SDC ({modulo}). Verifica que esté visible y maximizado.")
@@ -0,0 +1,767 @@
+# -*- coding: utf-8 -*-
+"""
+Lectura de tablas de Excel (ListObjects) en modo streaming para los scripts de despacho.
+
+El libro "DESPACHO DE AGREGADOS" tiene una hoja por día (dd.mm), cientos al año.
+Cargarlo con openpyxl en modo completo parsea todas las hojas solo para leer un rango.
+Aquí:
+- La tabla se ubica leyendo únicamente las partes XML pequeñas del zip
+  (workbook.xml, rels y la definición de la tabla), sin tocar las hojas.
+- Las filas se leen con openpyxl en modo read_only e iter_rows acotado a la
+  hoja, filas y columnas pedidas, así el tiempo y la memoria no crecen con el año.
+- Con MOTOR_LECTURA = "ooxml" las filas se leen directamente del XML de la hoja
+  (iterparse hasta la última fila pedida, shared strings resueltos a demanda);
+  si algo no está soportado se vuelve a openpyxl.
+- La tabla extraída se guarda en una caché local (cache_tabla.py); si el libro no
+  cambió desde la corrida anterior, no se abre openpyxl.
+- Si Excel/OneDrive tiene el archivo bloqueado, se lee una sola vez a memoria
+  (BytesIO, con reintentos) en vez de copiarlo a un temporal en disco.
+
+Requisitos:
+    pip install openpyxl
+"""
+
+import io
+import posixpath
+import time
+import warnings
+import zipfile
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager, nullcontext
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    import openpyxl
+    from openpyxl.utils import range_boundaries
+except Exception:
+    print("ERROR: No se pudo importar openpyxl. Instálalo con: pip install openpyxl")
+    raise
+
+import cache_tabla
+
+# Usar la caché local de tablas (cache_tabla.py) cuando el libro no cambió
+USAR_CACHE = True
+
+# Libro bloqueado por Excel/OneDrive: reintentos con espera exponencial al leerlo a memoria
+REINTENTOS_BLOQUEO = 5
+ESPERA_BLOQUEO_INICIAL = 0.2   # segundos (se duplica en cada reintento)
+
+# Motor para leer las filas: "ooxml" (lee solo el XML de la hoja, más rápido)
+# o "openpyxl" (read_only). Si "ooxml" falla con el libro, se usa openpyxl.
+MOTOR_LECTURA = "ooxml"
+
+# Advertencia conocida de openpyxl con las validaciones de datos del libro
+AVISO_DATA_VALIDATION = ".*Data Validation extension is not supported.*"
+
+_REL_OFFICE_DOCUMENT = "/officeDocument"
+_REL_TABLE = "/table"
+
+
+class UbicacionTabla(NamedTuple):
+    """Hoja y rango (coordenadas absolutas, cabecera incluida) de una tabla."""
+    hoja: str
+    ref: str
+    min_col: int
+    min_row: int
+    max_col: int
+    max_row: int
+    nombres_columnas: tuple = ()   # cabeceras según la definición de la tabla (si se conocen)
+
+    @property
+    def columnas(self) -> int:
+        return self.max_col - self.min_col + 1
+
+    @property
+    def filas_datos(self) -> int:
+        """Filas de datos (sin contar la cabecera)."""
+        return self.max_row - self.min_row
+
+
+# ====== UTILIDADES ======
+def nombres_hoja_del_dia(fecha: Optional[date] = None) -> List[str]:
+    """Nombres posibles de la hoja del día: 'DD.MM' (p.ej. 07.01) y 'D.M' (p.ej. 7.1)."""
+    fecha = fecha or date.today()
+    nombres = [f"{fecha.day:02d}.{fecha.month:02d}", f"{fecha.day}.{fecha.month}"]
+    return list(dict.fromkeys(nombres))
+
+
+def _local(tag: str) -> str:
+    """Quita el namespace de un tag XML ('{ns}sheet' -> 'sheet')."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _attr(elem, nombre: str) -> Optional[str]:
+    """Obtiene un atributo ignorando su namespace (r:id, id, ...)."""
+    for k, v in elem.attrib.items():
+        if _local(k) == nombre:
+            return v
+    return None
+
+
+def _leer_rels(zf: zipfile.ZipFile, part: str) -> List[Tuple[str, str, str]]:
+    """Devuelve [(Id, Type, Target absoluto)] de las relaciones de `part`."""
+    carpeta, archivo = posixpath.split(part)
+    rels_path = posixpath.join(carpeta, "_rels", archivo + ".rels")
+    try:
+        root = ET.fromstring(zf.read(rels_path))
+    except KeyError:
+        return []
+    rels = []
+    for rel in root:
+        if rel.get("TargetMode") == "External":
+            continue
+        target = rel.get("Target", "")
+        if target.startswith("/"):
+            destino = target.lstrip("/")
+        else:
+            destino = posixpath.normpath(posixpath.join(carpeta, target))
+        rels.append((rel.get("Id", ""), rel.get("Type", ""), destino))
+    return rels
+
+
+def _parte_workbook(zf: zipfile.ZipFile) -> str:
+    """Ruta de workbook.xml dentro del zip (según _rels/.rels)."""
+    for _, tipo, destino in _leer_rels(zf, ""):
+        if tipo.endswith(_REL_OFFICE_DOCUMENT):
+            return destino
+    return "xl/workbook.xml"
+
+
+def _es_fecha_1904(zf: zipfile.ZipFile) -> bool:
+    """True si el libro usa el calendario 1904 (workbookPr date1904)."""
+    root = ET.fromstring(zf.read(_parte_workbook(zf)))
+    for elem in root:
+        if _local(elem.tag) == "workbookPr":
+            return elem.get("date1904", "").lower() in ("1", "true")
+    return False
+
+
+def _partes_de_hojas(zf: zipfile.ZipFile) -> List[Tuple[str, str]]:
+    """Devuelve [(nombre_hoja, parte_xml)] en el orden del libro, leyendo solo workbook.xml y rels."""
+    wb_part = _parte_workbook(zf)
+    destinos = {rid: destino for rid, _, destino in _leer_rels(zf, wb_part)}
+    root = ET.fromstring(zf.read(wb_part))
+    hojas = []
+    for elem in root.iter():
+        if _local(elem.tag) != "sheet":
+            continue
+        parte = destinos.get(_attr(elem, "id") or "")
+        if parte:
+            hojas.append((elem.get("name", ""), parte))
+    return hojas
+
+
+def parte_de_hoja(zf: zipfile.ZipFile, hoja: str) -> str:
+    """Ruta de la parte XML de la hoja `hoja` dentro del zip (KeyError si no existe)."""
+    for nombre_hoja, parte in _partes_de_hojas(zf):
+        if nombre_hoja == hoja:
+            return parte
+    raise KeyError(f"No existe la hoja '{hoja}' en el libro.")
+
+
+def _tablas_de_hoja(zf: zipfile.ZipFile, parte_hoja: str) -> Iterator[dict]:
+    """Genera la definición (name, displayName, ref, cabecera, columnas) de cada tabla de la hoja."""
+    for _, tipo, destino in _leer_rels(zf, parte_hoja):
+        if not tipo.endswith(_REL_TABLE):
+            continue
+        try:
+            root = ET.fromstring(zf.read(destino))
+        except KeyError:
+            continue
+        columnas = []
+        for elem in root:
+            if _local(elem.tag) == "tableColumns":
+                columnas = [col.get("name", "") for col in elem]
+        yield {
+            "name": root.get("name", ""),
+            "displayName": root.get("displayName", ""),
+            "ref": root.get("ref", ""),
+            "cabecera": int(root.get("headerRowCount", "1")),
+            "columnas": columnas,
+        }
+
+
+def _ubicacion_desde_definicion(hoja: str, tabla: dict, table_name: str) -> UbicacionTabla:
+    ref = tabla["ref"]
+    if not ref:
+        raise ValueError(f"La tabla '{table_name}' no tiene rango definido (ref).")
+    min_col, min_row, max_col, max_row = range_boundaries(ref)
+    return UbicacionTabla(hoja, ref, min_col, min_row, max_col, max_row, tuple(tabla["columnas"]))
+
+
+# ====== ÍNDICE DE TABLAS ======
+def construir_indice_tablas(origen) -> dict:
+    """
+    Recorre una sola vez las partes de tabla del libro y devuelve
+    {nombre_tabla: {"hoja", "ref", "fila_cabecera", "columnas"}} para todas las hojas
+    (incluidas las que no son dd.mm). Se indexa por displayName y por name.
+    """
+    indice = {}
+    with zipfile.ZipFile(origen) as zf:
+        for nombre_hoja, parte in _partes_de_hojas(zf):
+            for tabla in _tablas_de_hoja(zf, parte):
+                entrada = {
+                    "hoja": nombre_hoja,
+                    "ref": tabla["ref"],
+                    "fila_cabecera": range_boundaries(tabla["ref"])[1] if tabla["ref"] and tabla["cabecera"] else None,
+                    "columnas": tabla["columnas"],
+                }
+                for nombre in (tabla["displayName"], tabla["name"]):
+                    if nombre:
+                        indice.setdefault(nombre, entrada)
+    return indice
+
+
+def firmas_hojas(origen, hojas: Optional[Iterable[str]] = None) -> Dict[str, str]:
+    """
+    {nombre_hoja: firma} con los CRC32 (del directorio central del zip) de la hoja y sus
+    tablas; `hojas` limita el resultado a esas hojas. Las partes compartidas (sharedStrings,
+    styles) no entran: cambian con cualquier edición del libro, y Excel renumera los índices
+    de texto al guardar, así que un cambio en lo que muestra la hoja cambia su propio XML.
+    Si la firma de una hoja no cambió, su contenido tampoco; no hace falta descomprimir nada.
+    """
+    pedidas = None if hojas is None else set(hojas)
+    with zipfile.ZipFile(origen) as zf:
+        crc = {info.filename: f"{info.CRC:08x}" for info in zf.infolist()}
+        firmas = {}
+        for nombre_hoja, parte in _partes_de_hojas(zf):
+            if pedidas is not None and nombre_hoja not in pedidas:
+                continue
+            tablas = [crc.get(destino, "-") for _, tipo, destino in _leer_rels(zf, parte)
+                      if tipo.endswith(_REL_TABLE)]
+            firmas[nombre_hoja] = "|".join([crc.get(parte, "-")] + tablas)
+    return firmas
+
+
+def indice_tablas(origen, huella) -> dict:
+    """Índice de tablas del libro persistido junto a la caché; se reconstruye si cambió la huella."""
+    indice = cache_tabla.obtener_indice(huella)
+    if indice is None:
+        indice = construir_indice_tablas(origen)
+        cache_tabla.guardar_indice(huella, indice)
+    return indice
+
+
+# ====== UBICACIÓN DE LA TABLA ======
+def encontrar_tabla_en_libro(origen, table_name: str,
+                             hojas_preferidas: Optional[Iterable[str]] = None,
+                             buscar_en_todas: bool = True,
+                             indice: Optional[dict] = None,
+                             huella=None) -> UbicacionTabla:
+    """
+    Busca la tabla por nombre y devuelve su UbicacionTabla.
+    Con `indice` (ver indice_tablas) la búsqueda es directa; si el índice no la tiene (índice
+    viejo), se reconstruye recorriendo el libro y, con `huella`, se guarda de nuevo.
+    Sin índice, primero revisa `hojas_preferidas` (p.ej. la hoja del día); si no está ahí y
+    `buscar_en_todas` es True, revisa las demás hojas.
+    Solo lee workbook.xml, los rels y el XML de las tablas.
+    `origen` puede ser una ruta o un objeto tipo archivo (lo que acepte zipfile).
+    """
+    preferidas = list(hojas_preferidas or [])
+    if indice is not None:
+        def encontrada(indice: dict) -> Optional[dict]:
+            entrada = indice.get(table_name)
+            return entrada if entrada is not None and (buscar_en_todas or entrada["hoja"] in preferidas) else None
+
+        entrada = encontrada(indice)
+        if entrada is None:
+            print(f"[INFO] La tabla '{table_name}' no está en el índice guardado; se reconstruye recorriendo el libro.")
+            indice = construir_indice_tablas(origen)
+            if huella is not None:
+                cache_tabla.guardar_indice(huella, indice)
+            entrada = encontrada(indice)
+        if entrada is not None:
+            return _ubicacion_desde_definicion(entrada["hoja"], entrada, table_name)
+    else:
+        with zipfile.ZipFile(origen) as zf:
+            hojas = _partes_de_hojas(zf)
+            orden = [h for p in preferidas for h in hojas if h[0] == p]
+            if buscar_en_todas:
+                orden += [h for h in hojas if h[0] not in preferidas]
+
+            for nombre_hoja, parte in orden:
+                for tabla in _tablas_de_hoja(zf, parte):
+                    if table_name in (tabla["name"], tabla["displayName"]):
+                        return _ubicacion_desde_definicion(nombre_hoja, tabla, table_name)
+
+    if not buscar_en_todas:
+        raise ValueError(f"No se encontró la tabla '{table_name}' en la(s) hoja(s) {preferidas}.")
+    raise ValueError(f"No se encontró la tabla '{table_name}' en el libro: {origen}")
+
+
+def ubicar_tabla_por_hoja(indice: dict, table_name: str,
+                          hojas: Iterable[str]) -> Dict[str, Tuple[str, UbicacionTabla]]:
+    """
+    Para cada hoja de `hojas` devuelve {hoja: (nombre_tabla, UbicacionTabla)} de la tabla
+    equivalente a `table_name`. Excel exige nombres de tabla únicos en el libro, así que al
+    copiar la hoja del día la tabla se renombra: se toma la de ese nombre si está en la hoja;
+    si no, la de la hoja con las mismas columnas; si no, la única tabla de la hoja.
+    Las hojas sin una tabla así no aparecen en el resultado.
+    """
+    por_hoja: Dict[str, List[Tuple[str, dict]]] = {}
+    for nombre, entrada in indice.items():
+        tablas = por_hoja.setdefault(entrada["hoja"], [])
+        if all(e["ref"] != entrada["ref"] for _, e in tablas):   # name y displayName -> misma tabla
+            tablas.append((nombre, entrada))
+    referencia = indice.get(table_name)
+    columnas_ref = referencia["columnas"] if referencia else None
+
+    resultado = {}
+    for hoja in hojas:
+        tablas = por_hoja.get(hoja, [])
+        elegida = next((t for t in tablas if t[0] == table_name), None)
+        if elegida is None and columnas_ref:
+            elegida = next((t for t in tablas if t[1]["columnas"] == columnas_ref), None)
+        if elegida is None and len(tablas) == 1:
+            elegida = tablas[0]
+        if elegida is not None:
+            nombre, entrada = elegida
+            resultado[hoja] = (nombre, _ubicacion_desde_definicion(hoja, entrada, nombre))
+    return resultado
+
+
+# ====== LECTURA DE FILAS ======
+def leer_en_memoria(xlsx_path: str,
+                    reintentos: int = None,
+                    espera_inicial: float = None) -> io.BytesIO:
+    """
+    Lee el archivo completo una sola vez a memoria (BytesIO).
+    Reintenta con espera exponencial si OneDrive/Excel lo tiene bloqueado un momento.
+    """
+    reintentos = REINTENTOS_BLOQUEO if reintentos is None else reintentos
+    espera = ESPERA_BLOQUEO_INICIAL if espera_inicial is None else espera_inicial
+    for intento in range(1, reintentos + 1):
+        try:
+            with open(xlsx_path, "rb") as f:
+                return io.BytesIO(f.read())
+        except FileNotFoundError:
+            raise
+        except (PermissionError, OSError) as e:
+            if intento == reintentos:
+                raise
+            print(f"[WARN] Libro bloqueado ({e}). Reintento {intento}/{reintentos - 1} en {espera:.1f}s...")
+            time.sleep(espera)
+            espera *= 2
+
+
+def origen_lectura(xlsx_path: str):
+    """
+    Devuelve desde dónde leer el libro: la ruta si se puede abrir directamente,
+    o una copia en memoria (BytesIO) si el archivo está bloqueado (Excel/OneDrive).
+    Así no se escribe ni se borra ninguna copia temporal en disco.
+    """
+    try:
+        with open(xlsx_path, "rb"):
+            pass
+        return xlsx_path
+    except FileNotFoundError:
+        raise
+    except (PermissionError, OSError) as e:
+        print(f"[WARN] No se pudo abrir '{xlsx_path}' directamente ({e}). Leyendo a memoria...")
+        return leer_en_memoria(xlsx_path)
+
+
+@contextmanager
+def sin_aviso_data_validation():
+    """
+    Silencia el aviso de openpyxl sobre la extensión de Data Validation. En modo read_only
+    la hoja se parsea recién al recorrer iter_rows, así que también debe envolver ese recorrido.
+    """
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message=AVISO_DATA_VALIDATION, category=UserWarning)
+        yield
+
+
+def abrir_libro_lectura(origen):
+    """Abre el libro con openpyxl en modo read_only (streaming). El llamador debe cerrarlo."""
+    with sin_aviso_data_validation():
+        return openpyxl.load_workbook(origen, read_only=True, data_only=True)
+
+
+class LibroAbierto:
+    """
+    Libro abierto una sola vez para leer varias hojas seguidas (leer_rango_tabla acepta uno
+    como `origen`): el zip para el motor OOXML y, si hace falta, el libro de openpyxl se abren
+    al primer uso y se reutilizan hasta close(). Se usa como context manager.
+    """
+
+    def __init__(self, origen):
+        self.origen = origen
+        self._zip: Optional[zipfile.ZipFile] = None
+        self._libro = None
+
+    @property
+    def zip(self) -> zipfile.ZipFile:
+        if self._zip is None:
+            self._zip = zipfile.ZipFile(self.origen)
+        return self._zip
+
+    @property
+    def libro(self):
+        if self._libro is None:
+            self._libro = abrir_libro_lectura(self.origen)
+        return self._libro
+
+    def close(self) -> None:
+        for recurso in (self._libro, self._zip):
+            if recurso is not None:
+                try:
+                    recurso.close()
+                except Exception:
+                    pass
+        self._zip = self._libro = None
+
+    def __enter__(self) -> "LibroAbierto":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def iterar_filas_tabla(ws, ubicacion: UbicacionTabla,
+                       fila_inicio: int, fila_fin: int,
+                       columnas: Sequence[int]) -> Iterator[Tuple[int, tuple]]:
+    """
+    Genera (fila_en_tabla, valores) para las filas de datos [fila_inicio..fila_fin]
+    (1 = primera fila bajo la cabecera). `valores` trae solo las columnas pedidas
+    (índices 1-based dentro de la tabla), en el mismo orden que `columnas`.
+    La hoja se parsea al recorrer: consumir dentro de sin_aviso_data_validation().
+    """
+    col_min = min(columnas)
+    col_max = max(columnas)
+    offsets = [c - col_min for c in columnas]
+    fila_abs = ubicacion.min_row + fila_inicio
+    for idx, valores in enumerate(
+            ws.iter_rows(min_row=fila_abs,
+                         max_row=ubicacion.min_row + fila_fin,
+                         min_col=ubicacion.min_col + col_min - 1,
+                         max_col=ubicacion.min_col + col_max - 1,
+                         values_only=True),
+            start=fila_inicio):
+        # iter_rows puede devolver tuplas cortas si la fila no tiene celdas al final
+        yield idx, tuple(valores[o] if o < len(valores) else None for o in offsets)
+
+
+def _leer_rango_openpyxl(origen, ubicacion: UbicacionTabla,
+                         fila_inicio: int, fila_fin: int,
+                         columnas: Sequence[int]) -> List[Tuple[int, tuple]]:
+    """Lee con openpyxl (streaming) las filas/columnas pedidas de la tabla ya ubicada."""
+    propio = not isinstance(origen, LibroAbierto)
+    wb = abrir_libro_lectura(origen) if propio else origen.libro
+    try:
+        with sin_aviso_data_validation():
+            return list(iterar_filas_tabla(wb[ubicacion.hoja], ubicacion, fila_inicio, fila_fin, columnas))
+    finally:
+        if propio:
+            try:
+                wb.close()
+            except Exception:
+                pass
+
+
+# ====== MOTOR OOXML DIRECTO ======
+# Lee el xlsx como zip: solo la parte XML de la hoja de la tabla (iterparse, hasta la
+# última fila pedida), los shared strings que realmente se usan y, si hay números con
+# estilo, la lista de formatos para reconocer fechas. Los valores se convierten igual
+# que openpyxl (data_only=True) para que ambos motores den el mismo resultado.
+
+def _col_de_ref(ref: str) -> int:
+    """Índice 1-based de columna desde una referencia tipo 'AB12'."""
+    col = 0
+    for ch in ref:
+        if "A" <= ch <= "Z":
+            col = col * 26 + (ord(ch) - 64)
+        elif "a" <= ch <= "z":
+            col = col * 26 + (ord(ch) - 96)
+        else:
+            break
+    return col
+
+
+def _texto_plano(elem) -> str:
+    """Texto de un <si>/<is>: <t> directo + <t> de cada run <r> (sin fonética <rPh>), como Text.content."""
+    partes = []
+    for hijo in elem:
+        tag = _local(hijo.tag)
+        if tag == "t":
+            partes.append(hijo.text or "")
+        elif tag == "r":
+            for sub in hijo:
+                if _local(sub.tag) == "t":
+                    partes.append(sub.text or "")
+    return "".join(partes)
+
+
+def _leer_shared_strings(zf: zipfile.ZipFile, parte: str, indices: set) -> dict:
+    """Resuelve solo los índices pedidos; deja de leer al pasar el mayor índice necesario."""
+    if not indices:
+        return {}
+    maximo = max(indices)
+    textos = {}
+    i = 0
+    with zf.open(parte) as f:
+        for _, elem in ET.iterparse(f, events=("end",)):
+            if _local(elem.tag) != "si":
+                continue
+            if i in indices:
+                textos[i] = _texto_plano(elem).replace("x005F_", "")
+            elem.clear()
+            if i >= maximo:
+                break
+            i += 1
+    return textos
+
+
+def _estilos_fecha(zf: zipfile.ZipFile, parte: str, estilos: set) -> Tuple[set, set]:
+    """Devuelve (estilos_fecha, estilos_timedelta) entre los índices de cellXfs pedidos."""
+    from openpyxl.styles.numbers import builtin_format_code, is_date_format, is_timedelta_format
+
+    fechas, duraciones = set(), set()
+    if not estilos:
+        return fechas, duraciones
+    root = ET.fromstring(zf.read(parte))
+    custom = {}
+    xfs = []
+    for elem in root:
+        tag = _local(elem.tag)
+        if tag == "numFmts":
+            for nf in elem:
+                custom[int(nf.get("numFmtId", "0"))] = nf.get("formatCode", "")
+        elif tag == "cellXfs":
+            xfs = [int(xf.get("numFmtId", "0")) for xf in elem]
+    for idx in estilos:
+        if idx >= len(xfs):
+            continue
+        fmt = custom.get(xfs[idx]) or builtin_format_code(xfs[idx])
+        if fmt and is_date_format(fmt):
+            fechas.add(idx)
+        if fmt and is_timedelta_format(fmt):
+            duraciones.add(idx)
+    return fechas, duraciones
+
+
+def _leer_rango_ooxml(origen, ubicacion: UbicacionTabla,
+                      fila_inicio: int, fila_fin: int,
+                      columnas: Sequence[int]) -> List[Tuple[int, tuple]]:
+    """Misma salida que _leer_rango_openpyxl, leyendo el XML de la hoja directamente."""
+    from openpyxl.utils.datetime import CALENDAR_MAC_1904, WINDOWS_EPOCH, from_excel, from_ISO8601
+
+    fila_ini_abs = ubicacion.min_row + fila_inicio
+    fila_fin_abs = ubicacion.min_row + fila_fin
+    col_abs = [ubicacion.min_col + c - 1 for c in columnas]
+    cols_buscadas = set(col_abs)
+
+    abierto = nullcontext(origen.zip) if isinstance(origen, LibroAbierto) else zipfile.ZipFile(origen)
+    with abierto as zf:
+        partes = dict(_partes_de_hojas(zf))
+        parte_hoja = partes[ubicacion.hoja]
+
+        # 1) Celdas crudas del rango: {(fila, col): (tipo, valor, estilo)}
+        crudas = {}
+        fila_actual = 0
+        with zf.open(parte_hoja) as f:
+            for _, elem in ET.iterparse(f, events=("end",)):
+                if _local(elem.tag) != "row":
+                    continue
+                r = elem.get("r")
+                fila_actual = int(r) if r else fila_actual + 1
+                if fila_actual > fila_fin_abs:
+                    break
+                if fila_actual >= fila_ini_abs:
+                    col_actual = 0
+                    for c in elem:
+                        if _local(c.tag) != "c":
+                            continue
+                        ref = c.get("r")
+                        col_actual = _col_de_ref(ref) if ref else col_actual + 1
+                        if col_actual not in cols_buscadas:
+                            continue
+                        tipo = c.get("t", "n")
+                        if tipo == "inlineStr":
+                            valor = None
+                            for hijo in c:
+                                if _local(hijo.tag) == "is":
+                                    valor = _texto_plano(hijo)
+                        else:
+                            valor = None
+                            for hijo in c:
+                                if _local(hijo.tag) == "v":
+                                    valor = hijo.text or None
+                        crudas[(fila_actual, col_actual)] = (tipo, valor, int(c.get("s") or 0))
+                elem.clear()
+
+        # 2) Solo lo que hace falta para convertir: shared strings usados, formatos de fecha, epoch
+        rels_wb = {tipo.rsplit("/", 1)[-1]: destino
+                   for _, tipo, destino in _leer_rels(zf, _parte_workbook(zf))}
+        indices_ss = {int(v) for t, v, _ in crudas.values() if t == "s" and v is not None}
+        textos = _leer_shared_strings(zf, rels_wb["sharedStrings"], indices_ss) if indices_ss else {}
+        estilos_num = {s for t, v, s in crudas.values() if t == "n" and v is not None and s}
+        fechas, duraciones = (_estilos_fecha(zf, rels_wb["styles"], estilos_num)
+                              if estilos_num else (set(), set()))
+        epoch = CALENDAR_MAC_1904 if _es_fecha_1904(zf) else WINDOWS_EPOCH
+
+    def convertir(tipo, valor, estilo):
+        if valor is None:
+            return None
+        if tipo == "n":
+            numero = float(valor) if ("." in valor or "E" in valor or "e" in valor) else int(valor)
+            if estilo in fechas:
+                try:
+                    return from_excel(numero, epoch, timedelta=estilo in duraciones)
+                except (OverflowError, ValueError):
+                    return "#VALUE!"  # openpyxl trata así una fecha fuera de rango
+            return numero
+        if tipo == "s":
+            return textos[int(valor)]
+        if tipo == "b":
+            return bool(int(valor))
+        if tipo == "d":
+            return from_ISO8601(valor)
+        return valor  # 'str', 'inlineStr', 'e'
+
+    filas = []
+    for idx in range(fila_inicio, fila_fin + 1):
+        fila = ubicacion.min_row + idx
+        valores = []
+        for col in col_abs:
+            celda = crudas.get((fila, col))
+            valores.append(convertir(*celda) if celda else None)
+        filas.append((idx, tuple(valores)))
+    return filas
+
+
+def leer_rango_tabla(origen, ubicacion: UbicacionTabla,
+                     fila_inicio: int, fila_fin: int,
+                     columnas: Sequence[int]) -> List[Tuple[int, tuple]]:
+    """
+    Lee las filas/columnas pedidas de la tabla ya ubicada con el motor de MOTOR_LECTURA.
+    Si el motor OOXML no puede con el libro, usa openpyxl. `origen` puede ser un LibroAbierto
+    para leer varias hojas sin reabrir el libro.
+    """
+    if MOTOR_LECTURA == "ooxml":
+        try:
+            return _leer_rango_ooxml(origen, ubicacion, fila_inicio, fila_fin, columnas)
+        except Exception as e:
+            print(f"[WARN] Motor OOXML no soporta este libro ({e!r}). Usando openpyxl...")
+            if hasattr(origen, "seek"):
+                origen.seek(0)
+    return _leer_rango_openpyxl(origen, ubicacion, fila_inicio, fila_fin, columnas)
+
+
+def huella_o_none(xlsx_path: str, origen):
+    """Huella del libro para la caché, o None si la caché está desactivada o no se pudo calcular."""
+    if not USAR_CACHE:
+        return None
+    try:
+        return cache_tabla.huella_libro(xlsx_path, origen)
+    except Exception as e:
+        print(f"[WARN] Caché de tablas no disponible: {e}")
+        return None
+
+
+def leer_tabla_completa(origen, ubicacion: UbicacionTabla, table_name: str,
+                        huella=None) -> List[tuple]:
+    """
+    Devuelve todas las filas de datos de la tabla (todas sus columnas).
+    Con `huella` usa la caché local (cache_tabla.py) si el libro no cambió; si no, lee y la guarda.
+    """
+    if huella is not None:
+        filas = cache_tabla.obtener(huella, ubicacion.hoja, table_name)
+        if filas is not None:
+            print(f"[INFO] Tabla '{table_name}' ({ubicacion.hoja}) leída desde caché.")
+            return filas
+
+    todas = range(1, ubicacion.columnas + 1)
+    filas = [valores for _, valores in leer_rango_tabla(origen, ubicacion, 1, ubicacion.filas_datos, todas)]
+    if huella is not None:
+        cache_tabla.guardar(huella, ubicacion.hoja, table_name, filas)
+    return filas
+
+
+class LectorTabla:
+    """
+    Lee una tabla una sola vez para varios consumidores (p.ej. placas y pedidos).
+    Cada consumidor registra su proyección (rango de filas + columnas) con registrar();
+    leer() ubica la tabla, la recorre una vez sobre la unión de filas y columnas y
+    reparte el resultado por nombre de proyección.
+    """
+
+    def __init__(self, xlsx_path: str, table_name: str,
+                 hojas_preferidas: Optional[Iterable[str]] = None,
+                 buscar_en_todas: bool = True):
+        self.xlsx_path = xlsx_path
+        self.table_name = table_name
+        self.hojas_preferidas = list(hojas_preferidas or [])
+        self.buscar_en_todas = buscar_en_todas
+        self._proyecciones: Dict[str, Tuple[int, int, List[int]]] = {}
+
+    def registrar(self, nombre: str, fila_inicio: int, fila_fin: int, columnas: Sequence[int]) -> None:
+        """Registra la proyección `nombre`: filas [fila_inicio, fila_fin] (sin cabecera) y columnas 1-based."""
+        if nombre in self._proyecciones:
+            raise ValueError(f"La proyección '{nombre}' ya está registrada.")
+        if fila_inicio < 1 or fila_fin < 1:
+            raise IndexError("Las filas dentro de la tabla deben ser >= 1 (sin contar cabecera).")
+        if fila_fin < fila_inicio:
+            raise IndexError("La fila final no puede ser menor que la inicial.")
+        self._proyecciones[nombre] = (fila_inicio, fila_fin, list(columnas))
+
+    def leer(self) -> Tuple[UbicacionTabla, Dict[str, List[Tuple[int, tuple]]]]:
+        """
+        Devuelve (ubicacion, {proyeccion: [(fila_en_tabla, valores)]}).
+        `fila_fin` de cada proyección se recorta al final de la tabla.
+        Con USAR_CACHE, una corrida sobre el libro sin cambios no abre openpyxl.
+        """
+        origen = origen_lectura(self.xlsx_path)
+        huella = huella_o_none(self.xlsx_path, origen)
+        indice = indice_tablas(origen, huella) if huella is not None else None
+        ubicacion = encontrar_tabla_en_libro(origen, self.table_name, self.hojas_preferidas,
+                                             self.buscar_en_todas, indice, huella)
+
+        rangos = {}
+        for nombre, (fila_inicio, fila_fin, columnas) in self._proyecciones.items():
+            for c in columnas:
+                if c < 1 or c > ubicacion.columnas:
+                    raise IndexError(f"La columna {c} está fuera del rango de la tabla (1..{ubicacion.columnas}).")
+            rangos[nombre] = range(fila_inicio, min(fila_fin, ubicacion.filas_datos) + 1)
+
+        usadas = [r for r in rangos.values() if r]
+        if not usadas:
+            return ubicacion, {nombre: [] for nombre in rangos}
+
+        if huella is not None:
+            tabla = leer_tabla_completa(origen, ubicacion, self.table_name, huella)
+            valor = lambda idx, c: tabla[idx - 1][c - 1]
+        else:
+            # una sola pasada sobre la unión de filas y columnas de todas las proyecciones
+            cols = sorted({c for _, _, columnas in self._proyecciones.values() for c in columnas})
+            pos = {c: i for i, c in enumerate(cols)}
+            por_fila = dict(leer_rango_tabla(origen, ubicacion,
+                                             min(r.start for r in usadas), max(r.stop for r in usadas) - 1,
+                                             cols))
+            valor = lambda idx, c: por_fila[idx][pos[c]]
+
+        resultado = {}
+        for nombre, filas in rangos.items():
+            columnas = self._proyecciones[nombre][2]
+            resultado[nombre] = [(idx, tuple(valor(idx, c) for c in columnas)) for idx in filas]
+        return ubicacion, resultado
+
+
+def leer_columnas_tabla(xlsx_path: str,
+                        table_name: str,
+                        fila_inicio: int,
+                        fila_fin: int,
+                        columnas: Sequence[int],
+                        hojas_preferidas: Optional[Iterable[str]] = None,
+                        buscar_en_todas: bool = True
+                        ) -> Tuple[UbicacionTabla, List[Tuple[int, tuple]]]:
+    """
+    Ubica la tabla y devuelve (ubicacion, filas) donde
+    filas = [(fila_en_tabla, valores_de_columnas)] para el rango pedido.
+    Atajo de LectorTabla para un solo consumidor.
+    """
+    lector = LectorTabla(xlsx_path, table_name, hojas_preferidas, buscar_en_todas)
+    lector.registrar("filas", fila_inicio, fila_fin, columnas)
+    ubicacion, resultado = lector.leer()
+    return ubicacion, resultado["filas"]
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+Backends de teclado para los flujos (flujos.py): una interfaz, tres implementaciones.
+
+Con pywinauto.send_keys cada envío vuelve a parsear la cadena y manda cada tecla por
+separado desde Python (una llamada al sistema + la pausa por tecla): los 8 Shift+Tab del
+despacho o los 15 TAB de print_guias son 8-15 idas y vueltas.
+
+- TecladoPywinauto: send_keys de siempre (con with_spaces=True). Es el backend por defecto.
+- TecladoSendInput (Windows): parsea la cadena UNA vez (se cachea), arma el arreglo de
+  eventos INPUT (modificadores, repeticiones '{TAB 15}', texto Unicode) y lo inyecta con
+  UNA sola llamada a SendInput solo con ESPACIADO_SENDINPUT = 0. Por defecto (None) se
+  respeta la pausa del flujo: una pulsación por llamada con esa pausa entre ellas, sin
+  volver a parsear (Citrix pierde teclas si llegan todas juntas); > 0 fija otro espaciado.
+- TecladoGrabador: no envía nada; registra envíos y pulsaciones para revisar un flujo sin
+  tocar la UI (p.ej. en Linux).
+
+Todos se usan como `enviar(teclas, pausa)` (la firma que espera flujos.ejecutar). Tras la
+última tecla siempre se respeta `pausa`, como send_keys. La sintaxis es la de send_keys: + ^ % (shift, ctrl, alt), ( ) para agrupar,
+~ (Enter), {TECLA}, {TECLA n} y {x} para un carácter especial literal.
+"""
+
+import ctypes
+import sys
+import time
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Callable, List, NamedTuple, Optional, Tuple, Union
+
+# ====== VARIABLES AJUSTABLES ======
+BACKEND_TECLADO = "pywinauto"   # "pywinauto" | "sendinput" (Windows) | "grabador" (no envía nada)
+ESPACIADO_SENDINPUT = None      # s entre pulsaciones con SendInput (None: la pausa del flujo; 0: toda la secuencia en una llamada)
+UNICODE_TEXTO = True            # SendInput: caracteres sin modificadores como Unicode (False: tecla virtual + Shift)
+
+VK_SHIFT, VK_CONTROL, VK_MENU = 0x10, 0x11, 0x12
+_MODIFICADORES = {"+": VK_SHIFT, "^": VK_CONTROL, "%": VK_MENU}
+
+VK_TECLAS = {
+    "BACKSPACE": 0x08, "BS": 0x08, "BKSP": 0x08, "TAB": 0x09, "ENTER": 0x0D,
+    "ESC": 0x1B, "ESCAPE": 0x1B, "SPACE": 0x20, "PGUP": 0x21, "PGDN": 0x22,
+    "END": 0x23, "HOME": 0x24, "LEFT": 0x25, "UP": 0x26, "RIGHT": 0x27, "DOWN": 0x28,
+    "INSERT": 0x2D, "INS": 0x2D, "DELETE": 0x2E, "DEL": 0x2E,
+    **{f"F{n}": 0x6F + n for n in range(1, 13)},
+}
+# Teclas que SendInput debe marcar como extendidas (si no, Citrix/RDP las lee como el teclado numérico)
+_EXTENDIDAS = {0x21, 0x22, 0x23, 0x24, 0x25, 0x26, 0x27, 0x28, 0x2D, 0x2E}
+
+
+class Pulsacion(NamedTuple):
+    tecla: Union[int, str]             # tecla virtual (int) o carácter literal (str)
+    modificadores: Tuple[int, ...] = ()
+
+
+@lru_cache(maxsize=256)
+def parsear(teclas: str) -> Tuple[Pulsacion, ...]:
+    """Cadena de send_keys (with_spaces=True) -> pulsaciones. '+{TAB 3}' -> 3 × Shift+Tab."""
+    pulsaciones: List[Pulsacion] = []
+    pendientes: Tuple[int, ...] = ()
+    grupos: List[Tuple[int, ...]] = []
+    i = 0
+    while i < len(teclas):
+        c = teclas[i]
+        i += 1
+        if c in _MODIFICADORES:
+            pendientes += (_MODIFICADORES[c],)
+            continue
+        if c == "(":
+            grupos.append(pendientes)
+            pendientes = ()
+            continue
+        if c == ")":
+            if not grupos:
+                raise ValueError(f"Paréntesis sin abrir en {teclas!r}")
+            grupos.pop()
+            continue
+        veces = 1
+        if c == "{":
+            fin = teclas.find("}", i + 1)      # '{}}' es la llave literal
+            if fin < 0:
+                raise ValueError(f"Llave sin cerrar en {teclas!r}")
+            nombre, _, repetir = teclas[i:fin].partition(" ")
+            i = fin + 1
+            if repetir:
+                if not repetir.isdigit():
+                    raise ValueError(f"Repetición inválida '{{{nombre} {repetir}}}' en {teclas!r}")
+                veces = int(repetir)
+            if len(nombre) == 1:
+                tecla: Union[int, str] = nombre
+            elif nombre.upper() in VK_TECLAS:
+                tecla = VK_TECLAS[nombre.upper()]
+            else:
+                raise ValueError(f"Tecla desconocida '{{{nombre}}}' en {teclas!r}")
+        elif c == "~":
+            tecla = VK_TECLAS["ENTER"]
+        else:
+            tecla = c
+        modificadores = tuple(m for g in grupos for m in g) + pendientes
+        pulsaciones.extend([Pulsacion(tecla, modificadores)] * veces)
+        pendientes = ()
+    if grupos:
+        raise ValueError(f"Paréntesis sin cerrar en {teclas!r}")
+    return tuple(pulsaciones)
+
+
+class Teclado(ABC):
+    """Interfaz: enviar(teclas, pausa) envía una cadena en sintaxis de send_keys."""
+
+    nombre = "teclado"
+
+    @abstractmethod
+    def enviar(self, teclas: str, pausa: float) -> None:
+        """Envía `teclas` con `pausa` s entre pulsaciones y tras la última."""
+
+    def __call__(self, teclas: str, pausa: float) -> None:
+        self.enviar(teclas, pausa)
+
+
+class TecladoPywinauto(Teclado):
+    nombre = "pywinauto"
+
+    def enviar(self, teclas: str, pausa: float) -> None:
+        from pywinauto.keyboard import send_keys
+        send_keys(teclas, pause=pausa, with_spaces=True)
+
+
+class TecladoGrabador(Teclado):
+    """Registra lo que se enviaría: `envios` [(teclas, pausa)] y `pulsaciones` (parseadas)."""
+
+    nombre = "grabador"
+
+    def __init__(self):
+        self.envios: List[Tuple[str, float]] = []
+        self.pulsaciones: List[Pulsacion] = []
+
+    def enviar(self, teclas: str, pausa: float) -> None:
+        self.pulsaciones.extend(parsear(teclas))
+        self.envios.append((teclas, pausa))
+
+
+# ====== SENDINPUT (Windows) ======
+class _KEYBDINPUT(ctypes.Structure):
+    _fields_ = [("wVk", ctypes.c_uint16), ("wScan", ctypes.c_uint16), ("dwFlags", ctypes.c_uint32),
+                ("time", ctypes.c_uint32), ("dwExtraInfo", ctypes.c_void_p)]
+
+
+class _MOUSEINPUT(ctypes.Structure):     # solo para que la unión tenga el tamaño de INPUT
+    _fields_ = [("dx", ctypes.c_int32), ("dy", ctypes.c_int32), ("mouseData", ctypes.c_uint32),
+                ("dwFlags", ctypes.c_uint32), ("time", ctypes.c_uint32), ("dwExtraInfo", ctypes.c_void_p)]
+
+
+class _UNION_INPUT(ctypes.Union):
+    _fields_ = [("ki", _KEYBDINPUT), ("mi", _MOUSEINPUT)]
+
+
+class _INPUT(ctypes.Structure):
+    _fields_ = [("type", ctypes.c_uint32), ("u", _UNION_INPUT)]
+
+
+INPUT_KEYBOARD = 1
+KEYEVENTF_EXTENDEDKEY, KEYEVENTF_KEYUP, KEYEVENTF_UNICODE = 0x0001, 0x0002, 0x0004
+
+Evento = Tuple[int, int, int]            # (vk, scan, flags)
+
+
+def eventos_teclado(pulsaciones, unicode_texto: bool = True,
+                    vk_caracter: Optional[Callable[[str], int]] = None) -> List[Evento]:
+    """
+    Pulsaciones -> eventos (vk, scan, flags) para SendInput: modificadores abajo, tecla abajo/arriba,
+    modificadores arriba. `vk_caracter(c)` es VkKeyScanW (byte bajo: vk; byte alto: 1 shift, 2 ctrl, 4 alt;
+    -1 si no existe); sin él, o si no hay tecla, el carácter va como Unicode.
+    """
+    eventos: List[Evento] = []
+    for p in pulsaciones:
+        modificadores = list(p.modificadores)
+        if isinstance(p.tecla, int):
+            flags = KEYEVENTF_EXTENDEDKEY if p.tecla in _EXTENDIDAS else 0
+            tecla = [(p.tecla, 0, flags)]
+        else:
+            escaneo = vk_caracter(p.tecla) if vk_caracter and (modificadores or not unicode_texto) else -1
+            if escaneo != -1:
+                estado = (escaneo >> 8) & 0xFF
+                modificadores += [vk for bit, vk in ((1, VK_SHIFT), (2, VK_CONTROL), (4, VK_MENU))
+                                  if estado & bit and vk not in modificadores]
+                tecla = [(escaneo & 0xFF, 0, 0)]
+            else:
+                unidades = p.tecla.encode("utf-16-le")     # fuera del BMP: par sustituto
+                tecla = [(0, int.from_bytes(unidades[k:k + 2], "little"), KEYEVENTF_UNICODE)
+                         for k in range(0, len(unidades), 2)]
+        eventos += [(vk, 0, 0) for vk in modificadores]
+        for vk, scan, flags in tecla:
+            eventos += [(vk, scan, flags), (vk, scan, flags | KEYEVENTF_KEYUP)]
+        eventos += [(vk, 0, KEYEVENTF_KEYUP) for vk in reversed(modificadores)]
+    return eventos
+
+
+def _arreglo(eventos: List[Evento]):
+    arreglo = (_INPUT * len(eventos))()
+    for k, (vk, scan, flags) in enumerate(eventos):
+        arreglo[k].type = INPUT_KEYBOARD
+        arreglo[k].u.ki = _KEYBDINPUT(vk, scan, flags, 0, None)
+    return arreglo
+
+
+class TecladoSendInput(Teclado):
+    """Inyecta cada cadena con SendInput; los arreglos de eventos se arman una vez por cadena."""
+
+    nombre = "sendinput"
+
+    def __init__(self, espaciado: Optional[float] = ESPACIADO_SENDINPUT, unicode_texto: bool = UNICODE_TEXTO):
+        if sys.platform != "win32":
+            raise OSError("SendInput solo existe en Windows; usa BACKEND_TECLADO = 'grabador' para pruebas.")
+        self.espaciado = espaciado
+        self.unicode_texto = unicode_texto
+        self._user32 = ctypes.WinDLL("user32", use_last_error=True)
+        self._user32.VkKeyScanW.restype = ctypes.c_short
+        self._preparar = lru_cache(maxsize=256)(self._armar)
+
+    def _armar(self, teclas: str):
+        """(arreglo con toda la secuencia, [arreglo por pulsación])."""
+        vk_caracter = self._user32.VkKeyScanW
+        por_pulsacion = [_arreglo(eventos_teclado([p], self.unicode_texto, vk_caracter)) for p in parsear(teclas)]
+        return _arreglo(eventos_teclado(parsear(teclas), self.unicode_texto, vk_caracter)), por_pulsacion
+
+    def _inyectar(self, arreglo) -> None:
+        if not len(arreglo):
+            return
+        enviados = self._user32.SendInput(len(arreglo), arreglo, ctypes.sizeof(_INPUT))
+        if enviados != len(arreglo):
+            # 0 suele ser UIPI: la ventana destino corre con más privilegios que el script
+            raise OSError(f"SendInput inyectó {enviados} de {len(arreglo)} eventos "
+                          f"(error {ctypes.get_last_error()}).")
+
+    def enviar(self, teclas: str, pausa: float) -> None:
+        todo, por_pulsacion = self._preparar(teclas)
+        espaciado = pausa if self.espaciado is None else self.espaciado
+        if espaciado <= 0:
+            self._inyectar(todo)
+        else:
+            for k, arreglo in enumerate(por_pulsacion):
+                if k:
+                    time.sleep(espaciado)
+                self._inyectar(arreglo)
+        time.sleep(pausa)
+
+
+# ====== BACKEND ACTUAL ======
+_BACKENDS = {"pywinauto": TecladoPywinauto, "sendinput": TecladoSendInput, "grabador": TecladoGrabador}
+_actual: Optional[Teclado] = None
+
+
+def crear(backend: str = None) -> Teclado:
+    backend = backend or BACKEND_TECLADO
+    if backend not in _BACKENDS:
+        raise ValueError(f"BACKEND_TECLADO desconocido: {backend!r} (opciones: {', '.join(_BACKENDS)})")
+    return _BACKENDS[backend]()
+
+
+def actual() -> Teclado:
+    """Backend de BACKEND_TECLADO (se crea una vez por proceso)."""
+    global _actual
+    if _actual is None:
+        _actual = crear()
+        print(f"[INFO] Teclado: {_actual.nombre}")
+    return _actual
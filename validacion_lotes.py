@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Parseo y validación por lotes (por columnas) de las filas leídas de la tabla.
+
+En vez de parsear fila por fila con try/except y un [WARN] por fila, las celdas se
+tratan como columnas completas:
+
+- Cada columna se codifica por valores distintos (en la tabla se repiten mucho:
+  'AR-MEIGGS', '67-MATERIALES', la misma placa varias veces...). La normalización,
+  el split 'AGREGADO-DESTINO' y la conversión numérica se hacen una sola vez por
+  valor distinto y se expanden a todas las filas.
+- El resultado es una lista de registros tipados (Pedido / Placa) más una sola lista
+  de Rechazo con la fila, el campo, el valor y el motivo, que se imprime junta con
+  imprimir_rechazos().
+
+Uso típico:
+    pedidos, rechazos = validar_pedidos(filas, PLANTA_TO_DOWN_PRESSES, AGREGADO_TO_DOWN_PRESSES)
+    imprimir_rechazos(rechazos, "pedidos")
+"""
+
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+# Sufijos descriptivos que a veces se escriben en el agregado ('PIEDRA HUSO 67')
+PALABRAS_AGREGADO = ("PIEDRA", "HUSO")
+
+
+class Pedido(NamedTuple):
+    """Pedido válido listo para ingresar en UNICON. `fila` es la fila dentro de la tabla."""
+    fila: int
+    agregado: str
+    planta: str
+    cubicaje: float
+
+
+class Placa(NamedTuple):
+    """Placa lista para despachar. `fila` es la fila dentro de la tabla."""
+    fila: int
+    placa: str
+
+
+class Rechazo(NamedTuple):
+    """Fila descartada en la validación."""
+    fila: int
+    campo: str
+    valor: object
+    motivo: str
+
+
+# ====== OPERACIONES POR COLUMNA ======
+def columnas(filas: Sequence[Tuple[int, tuple]], n: int) -> Tuple[List[int], List[list]]:
+    """Convierte [(fila, (v1, .., vn))] en (filas, [col1, .., coln])."""
+    if not filas:
+        return [], [[] for _ in range(n)]
+    indices = [idx for idx, _ in filas]
+    cols = [list(c) for c in zip(*(valores for _, valores in filas))]
+    return indices, cols
+
+
+def mapear_distintos(col: Sequence, funcion: Callable) -> list:
+    """Aplica `funcion` una vez por valor distinto de la columna y expande el resultado a todas las filas."""
+    resultados: Dict = {}
+    salida = []
+    for v in col:
+        clave = (type(v), v)
+        try:
+            r = resultados[clave]
+        except KeyError:
+            r = resultados[clave] = funcion(v)
+        except TypeError:   # valor no hasheable: se calcula directo
+            r = funcion(v)
+        salida.append(r)
+    return salida
+
+
+def _texto(v) -> Optional[str]:
+    if v is None:
+        return None
+    s = str(v).strip()
+    return s or None
+
+
+def _numero(v) -> Optional[float]:
+    if isinstance(v, bool):
+        return None
+    if isinstance(v, (int, float)):
+        return float(v)
+    try:
+        return float(str(v).replace(',', '').strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def _agregado_destino(texto: Optional[str]) -> Optional[Tuple[str, str]]:
+    """'AR-MEIGGS' -> ('AR', 'MEIGGS'); 'PIEDRA HUSO 67-MATERIALES' -> ('67', 'MATERIALES')."""
+    if texto is None or '-' not in texto:
+        return None
+    agregado, planta = [s.strip().upper() for s in texto.split('-', 1)]
+    for palabra in PALABRAS_AGREGADO:
+        agregado = agregado.replace(palabra, '')
+    return agregado.strip(), planta
+
+
+def normalizar_texto(col: Sequence) -> List[Optional[str]]:
+    """Texto sin espacios en los extremos; None para celdas vacías."""
+    return mapear_distintos(col, _texto)
+
+
+def coaccionar_numeros(col: Sequence) -> List[Optional[float]]:
+    """Convierte la columna a float (acepta '1,234.5'); None donde no es numérico."""
+    return mapear_distintos(col, _numero)
+
+
+def separar_agregado_destino(col: Sequence) -> List[Optional[Tuple[str, str]]]:
+    """Separa la columna 'AGREGADO-DESTINO' en (agregado, planta) normalizados; None si no tiene el formato."""
+    return mapear_distintos(normalizar_texto(col), _agregado_destino)
+
+
+# ====== VALIDACIÓN DE LOTES ======
+def validar_pedidos(filas: Sequence[Tuple[int, tuple]],
+                    plantas_validas: Iterable[str],
+                    agregados_validos: Iterable[str]) -> Tuple[List[Pedido], List[Rechazo]]:
+    """
+    Valida filas [(fila, (agregado_destino, cubicaje))] de la tabla de pedidos.
+    Las filas con 'AGREGADO-DESTINO' vacío se ignoran sin rechazo (filas sin usar).
+    """
+    indices, (col_ag_dest, col_cubicaje) = columnas(filas, 2)
+    texto = normalizar_texto(col_ag_dest)
+    partes = separar_agregado_destino(col_ag_dest)
+    cubicajes = coaccionar_numeros(col_cubicaje)
+    plantas = {p.upper() for p in plantas_validas}
+    agregados = {a.upper() for a in agregados_validos}
+
+    pedidos: List[Pedido] = []
+    rechazos: List[Rechazo] = []
+    for i, fila in enumerate(indices):
+        if texto[i] is None:
+            continue
+        if partes[i] is None:
+            rechazos.append(Rechazo(fila, "AGREGADO-DESTINO", texto[i], "se espera 'AGREGADO-DESTINO'"))
+            continue
+        agregado, planta = partes[i]
+        if agregado not in agregados:
+            rechazos.append(Rechazo(fila, "AGREGADO", agregado, f"agregado desconocido (válidos: {sorted(agregados)})"))
+            continue
+        if planta not in plantas:
+            rechazos.append(Rechazo(fila, "PLANTA", planta, f"planta desconocida (válidas: {sorted(plantas)})"))
+            continue
+        cubicaje = cubicajes[i]
+        if cubicaje is None:
+            rechazos.append(Rechazo(fila, "CUBICAJE", col_cubicaje[i], "no es numérico"))
+            continue
+        if not cubicaje > 0:
+            rechazos.append(Rechazo(fila, "CUBICAJE", col_cubicaje[i], "debe ser mayor que 0"))
+            continue
+        pedidos.append(Pedido(fila, agregado, planta, cubicaje))
+    return pedidos, rechazos
+
+
+def validar_placas(filas: Sequence[Tuple[int, tuple]]) -> Tuple[List[Placa], List[Rechazo]]:
+    """Valida filas [(fila, (placa,))]: texto sin espacios extremos; las celdas vacías se rechazan."""
+    indices, (col_placa,) = columnas(filas, 1)
+    placas: List[Placa] = []
+    rechazos: List[Rechazo] = []
+    for fila, placa in zip(indices, normalizar_texto(col_placa)):
+        if placa is None:
+            rechazos.append(Rechazo(fila, "PLACA", None, "celda vacía"))
+        else:
+            placas.append(Placa(fila, placa))
+    return placas, rechazos
+
+
+# ====== REPORTE ======
+def imprimir_rechazos(rechazos: Sequence[Rechazo], titulo: str = "filas") -> None:
+    """Imprime en un solo bloque las filas descartadas (nada si no hay)."""
+    if not rechazos:
+        return
+    print(f"[WARN] {len(rechazos)} fila(s) de {titulo} descartada(s):")
+    for r in rechazos:
+        print(f"    fila {r.fila:>4} | {r.campo:<16} | {r.valor!r:<24} | {r.motivo}")
@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+"""
+Tabla viva de ventanas de primer nivel (handle -> título) alimentada por eventos.
+
+Las esperas de ventanas (Información, Registro de Salidas, diálogo de impresión) armaban
+Desktop(backend=...) y llamaban .windows() en cada sondeo: un objeto wrapper por cada
+ventana del escritorio, cada 0.2-0.5 s y en dos backends, dentro del cliente Citrix.
+Aquí la tabla se mantiene sola y las esperas solo la consultan:
+
+- FuenteWinEvent (Windows): SetWinEventHook fuera de proceso para creación, destrucción,
+  mostrar/ocultar, cambio de título y cambio de primer plano, con su propio hilo y bucle
+  de mensajes. Arranca con una foto de EnumWindows.
+- FuenteEnumWindows: respaldo si el hook no se puede instalar; cada INTERVALO_ENUM
+  recorre EnumWindows + GetWindowTextW (ctypes, sin wrappers) y aplica las diferencias.
+- FuenteFalsa: crear / renombrar / cerrar / enfocar a mano, para alimentar la tabla sin
+  Windows (p.ej. revisar una espera en Linux).
+
+La tabla solo guarda ventanas con título (como la foto de EnumWindows): una ventana cuyo
+título queda vacío sale de la tabla.
+
+Quien espera una ventana se suscribe a un patrón de título (regex) y su evento se
+dispara apenas cambia una ventana que coincide (`a | b` une dos suscripciones): espera_ui.wait_until despierta en ese
+momento en vez de al siguiente sondeo. Con VIGIA_VENTANAS = False (o fuera de Windows
+sin una fuente instalada) las esperas vuelven a enumerar con pywinauto.
+"""
+
+import ctypes
+import re
+import sys
+import threading
+import time
+import weakref
+from ctypes import wintypes
+from typing import Dict, Iterable, List, NamedTuple, Optional, Pattern, Sequence, Tuple, Union
+
+# ====== VARIABLES AJUSTABLES ======
+VIGIA_VENTANAS = True         # True: las esperas de ventanas consultan la tabla viva (Windows)
+INTERVALO_ENUM = 0.25         # s entre recorridos de EnumWindows cuando no hay hook de eventos
+
+Rect = Tuple[int, int, int, int]   # left, top, right, bottom
+
+
+class InfoVentana(NamedTuple):
+    handle: int
+    titulo: str
+    visible: bool = True
+    rect: Optional[Rect] = None    # None: se consulta a Windows al pedirlo
+
+
+class Suscripcion:
+    """
+    Evento que se dispara cuando aparece, cambia o desaparece una ventana cuyo título coincide.
+    `a | b` es una suscripción compuesta que se dispara con cualquiera de las dos. Se puede
+    llamar como `senal(segundos)` (ver espera_ui.Condicion).
+    """
+
+    def __init__(self, patron: Optional[Pattern], partes: Sequence["Suscripcion"] = ()):
+        self.patron = patron
+        self.evento = threading.Event()
+        self.partes = tuple(partes)                # la compuesta mantiene vivas sus partes
+        self._oyentes = weakref.WeakSet()          # compuestas que contienen a esta
+        for parte in self.partes:
+            parte._oyentes.add(self)
+
+    def avisar(self) -> None:
+        self.evento.set()
+        for oyente in list(self._oyentes):
+            oyente.avisar()
+
+    def esperar(self, segundos: float) -> None:
+        """Duerme hasta `segundos` o hasta el próximo cambio de una ventana que coincide."""
+        self.evento.wait(segundos)
+        self.evento.clear()
+
+    __call__ = esperar
+
+    def __or__(self, otra: "Suscripcion") -> "Suscripcion":
+        return Suscripcion(None, (self, otra))
+
+
+class VigiaVentanas:
+    """Tabla handle -> InfoVentana, más el handle en primer plano. Las fuentes la alimentan desde su hilo."""
+
+    def __init__(self):
+        self._ventanas: Dict[int, InfoVentana] = {}
+        self._lock = threading.Lock()
+        self._suscripciones = weakref.WeakSet()   # se van solas cuando la condición que las usa se libera
+        self.primer_plano: Optional[int] = None
+        self.eventos = 0
+        self.fuente = None
+
+    # ====== ALIMENTACIÓN (fuentes) ======
+    def _avisar(self, titulos: Iterable[str]) -> None:
+        titulos = [t for t in titulos if t]
+        for s in list(self._suscripciones):
+            if any(s.patron.search(t) for t in titulos):
+                s.avisar()
+
+    def actualizar(self, handle: int, titulo: str, visible: bool = True, rect: Optional[Rect] = None) -> None:
+        with self._lock:
+            previa = self._ventanas.get(handle)
+            info = InfoVentana(handle, titulo or "", visible, rect)
+            if previa == info:
+                return
+            self._ventanas[handle] = info
+            self.eventos += 1
+        self._avisar([info.titulo, previa.titulo if previa else ""])
+
+    def quitar(self, handle: int) -> None:
+        with self._lock:
+            previa = self._ventanas.pop(handle, None)
+            if previa is None:
+                return
+            self.eventos += 1
+        self._avisar([previa.titulo])
+
+    def enfocar(self, handle: int, titulo: Optional[str] = None) -> None:
+        with self._lock:
+            self.primer_plano = handle
+            info = self._ventanas.get(handle)
+        if titulo is not None and (info is None or info.titulo != titulo):
+            self.actualizar(handle, titulo, True if info is None else info.visible)
+        else:
+            self._avisar([titulo or (info.titulo if info else "")])
+
+    def reemplazar(self, ventanas: Dict[int, InfoVentana]) -> None:
+        """Aplica una foto completa (EnumWindows): agrega, actualiza y quita lo que cambió."""
+        with self._lock:
+            actuales = dict(self._ventanas)
+        for handle in set(actuales) - set(ventanas):
+            self.quitar(handle)
+        for handle, info in ventanas.items():
+            if actuales.get(handle) != info:
+                self.actualizar(*info)
+
+    # ====== CONSULTAS ======
+    def buscar(self, patron: Union[str, Pattern], visible: bool = False) -> List[InfoVentana]:
+        patron = re.compile(patron, re.IGNORECASE) if isinstance(patron, str) else patron
+        with self._lock:
+            ventanas = list(self._ventanas.values())
+        return [v for v in ventanas if patron.search(v.titulo) and (v.visible or not visible)]
+
+    def info(self, handle: int) -> Optional[InfoVentana]:
+        with self._lock:
+            return self._ventanas.get(handle)
+
+    def rect(self, info: InfoVentana) -> Optional[Rect]:
+        return info.rect if info.rect is not None else rect_de(info.handle)
+
+    def suscribir(self, patron: Union[str, Pattern]) -> Suscripcion:
+        patron = re.compile(patron, re.IGNORECASE) if isinstance(patron, str) else patron
+        suscripcion = Suscripcion(patron)
+        self._suscripciones.add(suscripcion)
+        return suscripcion
+
+    def __len__(self) -> int:
+        return len(self._ventanas)
+
+
+# ====== WINDOWS (ctypes) ======
+def _user32():
+    return ctypes.WinDLL("user32", use_last_error=True)
+
+
+def titulo_de(handle: int) -> str:
+    user32 = _user32()
+    largo = user32.GetWindowTextLengthW(handle)
+    if largo <= 0:
+        return ""
+    buffer = ctypes.create_unicode_buffer(largo + 1)
+    user32.GetWindowTextW(handle, buffer, largo + 1)
+    return buffer.value
+
+
+def rect_de(handle: int) -> Optional[Rect]:
+    if sys.platform != "win32":
+        return None
+    r = wintypes.RECT()
+    if not _user32().GetWindowRect(handle, ctypes.byref(r)):
+        return None
+    return r.left, r.top, r.right, r.bottom
+
+
+def enumerar_ventanas() -> Dict[int, InfoVentana]:
+    """Ventanas de primer nivel con título (EnumWindows + GetWindowTextW)."""
+    user32 = _user32()
+    ventanas: Dict[int, InfoVentana] = {}
+
+    @ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.HWND, wintypes.LPARAM)
+    def agregar(handle, _):
+        titulo = titulo_de(handle)
+        if titulo:
+            ventanas[handle] = InfoVentana(handle, titulo, bool(user32.IsWindowVisible(handle)))
+        return True
+
+    user32.EnumWindows(agregar, 0)
+    return ventanas
+
+
+# ====== FUENTES ======
+class FuenteFalsa:
+    """Fuente manual (sin Windows): cada llamada es un evento."""
+
+    def __init__(self, vigia: VigiaVentanas):
+        self.vigia = vigia
+        vigia.fuente = self
+
+    def crear(self, handle: int, titulo: str, visible: bool = True, rect: Optional[Rect] = None) -> None:
+        self.vigia.actualizar(handle, titulo, visible, rect)
+
+    def renombrar(self, handle: int, titulo: str) -> None:
+        if not titulo:
+            self.vigia.quitar(handle)
+            return
+        previa = self.vigia.info(handle)
+        self.vigia.actualizar(handle, titulo, previa.visible if previa else True, previa.rect if previa else None)
+
+    def cerrar(self, handle: int) -> None:
+        self.vigia.quitar(handle)
+
+    def enfocar(self, handle: int) -> None:
+        self.vigia.enfocar(handle)
+
+    def detener(self) -> None:
+        pass
+
+
+class FuenteEnumWindows(threading.Thread):
+    """Respaldo: foto de EnumWindows cada INTERVALO_ENUM s."""
+
+    def __init__(self, vigia: VigiaVentanas, intervalo: float = INTERVALO_ENUM):
+        super().__init__(name="vigia-enumwindows", daemon=True)
+        self.vigia = vigia
+        self.intervalo = intervalo
+        self._parar = threading.Event()
+        vigia.fuente = self
+
+    def run(self) -> None:
+        user32 = _user32()
+        while not self._parar.is_set():
+            try:
+                self.vigia.reemplazar(enumerar_ventanas())
+                self.vigia.enfocar(user32.GetForegroundWindow())
+            except Exception as e:
+                print(f"[WARN] Vigía de ventanas (EnumWindows): {e}")
+            self._parar.wait(self.intervalo)
+
+    def detener(self) -> None:
+        self._parar.set()
+
+
+EVENT_SYSTEM_FOREGROUND = 0x0003
+EVENT_OBJECT_CREATE, EVENT_OBJECT_DESTROY = 0x8000, 0x8001
+EVENT_OBJECT_SHOW, EVENT_OBJECT_HIDE = 0x8002, 0x8003
+EVENT_OBJECT_NAMECHANGE = 0x800C
+# Rangos separados: entre 0x8003 y 0x800C está LOCATIONCHANGE (0x800B), que llega a ráfagas
+_RANGOS_EVENTOS = ((EVENT_SYSTEM_FOREGROUND, EVENT_SYSTEM_FOREGROUND),
+                   (EVENT_OBJECT_CREATE, EVENT_OBJECT_HIDE),
+                   (EVENT_OBJECT_NAMECHANGE, EVENT_OBJECT_NAMECHANGE))
+WINEVENT_OUTOFCONTEXT, WINEVENT_SKIPOWNPROCESS = 0x0000, 0x0002
+OBJID_WINDOW, CHILDID_SELF, GA_ROOT, WM_QUIT = 0, 0, 2, 0x0012
+
+
+class FuenteWinEvent(threading.Thread):
+    """SetWinEventHook (fuera de proceso) en un hilo con su bucle de mensajes."""
+
+    def __init__(self, vigia: VigiaVentanas):
+        super().__init__(name="vigia-winevent", daemon=True)
+        self.vigia = vigia
+        self.listo = threading.Event()
+        self.error: Optional[str] = None
+        self._hilo_id = None
+        vigia.fuente = self
+
+    def _evento(self, hook, evento, handle, id_objeto, id_hijo, hilo, tiempo) -> None:
+        try:
+            if not handle or id_objeto != OBJID_WINDOW or id_hijo != CHILDID_SELF:
+                return
+            if evento == EVENT_OBJECT_DESTROY:
+                self.vigia.quitar(handle)
+                return
+            if evento == EVENT_SYSTEM_FOREGROUND:
+                self.vigia.enfocar(handle, titulo_de(handle))
+                return
+            if self._user32.GetAncestor(handle, GA_ROOT) != handle:
+                return                   # solo ventanas de primer nivel
+            titulo = titulo_de(handle)
+            if not titulo:
+                self.vigia.quitar(handle)    # sin título no está en la tabla (como en EnumWindows)
+                return
+            self.vigia.actualizar(handle, titulo, evento != EVENT_OBJECT_HIDE
+                                  and bool(self._user32.IsWindowVisible(handle)))
+        except Exception:
+            pass                         # una excepción en el callback no debe cortar el bucle de mensajes
+
+    def run(self) -> None:
+        self._user32 = _user32()
+        kernel32 = ctypes.WinDLL("kernel32")
+        self._hilo_id = kernel32.GetCurrentThreadId()
+        WINEVENTPROC = ctypes.WINFUNCTYPE(None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+                                          wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+        self._proc = WINEVENTPROC(self._evento)         # referencia viva mientras dure el hook
+        self._user32.SetWinEventHook.argtypes = [wintypes.DWORD, wintypes.DWORD, wintypes.HMODULE, WINEVENTPROC,
+                                                 wintypes.DWORD, wintypes.DWORD, wintypes.DWORD]
+        self._user32.SetWinEventHook.restype = wintypes.HANDLE
+        self._user32.GetAncestor.restype = wintypes.HWND
+        hooks = [self._user32.SetWinEventHook(desde, hasta, None, self._proc, 0, 0,
+                                              WINEVENT_OUTOFCONTEXT | WINEVENT_SKIPOWNPROCESS)
+                 for desde, hasta in _RANGOS_EVENTOS]
+        if not all(hooks):
+            self.error = f"SetWinEventHook falló (error {ctypes.get_last_error()})"
+            for h in filter(None, hooks):
+                self._user32.UnhookWinEvent(h)
+            self.listo.set()
+            return
+        try:
+            self.vigia.reemplazar(enumerar_ventanas())
+            self.vigia.enfocar(self._user32.GetForegroundWindow())
+        finally:
+            self.listo.set()
+        msg = wintypes.MSG()
+        while self._user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+            self._user32.TranslateMessage(ctypes.byref(msg))
+            self._user32.DispatchMessageW(ctypes.byref(msg))
+        for h in hooks:
+            self._user32.UnhookWinEvent(h)
+
+    def detener(self) -> None:
+        if self._hilo_id is not None:
+            self._user32.PostThreadMessageW(self._hilo_id, WM_QUIT, 0, 0)
+
+
+# ====== VIGÍA DEL PROCESO ======
+_actual: Optional[VigiaVentanas] = None
+
+
+def instalar(vigia: Optional[VigiaVentanas]) -> None:
+    """Reemplaza el vigía del proceso (p.ej. uno con FuenteFalsa; None para quitarlo)."""
+    global _actual
+    if _actual is not None and _actual.fuente is not None and _actual is not vigia:
+        _actual.fuente.detener()
+    _actual = vigia
+
+
+def vigia() -> Optional[VigiaVentanas]:
+    """Vigía del proceso; en Windows se crea al primer uso (hook de eventos o, si falla, EnumWindows)."""
+    global _actual
+    if _actual is not None or not VIGIA_VENTANAS or sys.platform != "win32":
+        return _actual
+    nuevo = VigiaVentanas()
+    t0 = time.perf_counter()
+    fuente = FuenteWinEvent(nuevo)
+    fuente.start()
+    fuente.listo.wait(2.0)
+    if fuente.error or not fuente.listo.is_set():
+        print(f"[WARN] Vigía de ventanas sin eventos ({fuente.error or 'sin respuesta'}); se usa EnumWindows.")
+        fuente.detener()
+        fuente = FuenteEnumWindows(nuevo)
+        fuente.start()
+    print(f"[INFO] Vigía de ventanas ({type(fuente).__name__}): {len(nuevo)} ventana(s) en "
+          f"{time.perf_counter() - t0:.2f} s.")
+    _actual = nuevo
+    return _actual
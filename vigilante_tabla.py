@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Modo vigilancia: detecta filas nuevas en la tabla del día sin editar START_ROW/END_ROW.
+
+- Por cada (libro, hoja, tabla) se guarda una marca de agua: la última fila de la
+  tabla ya procesada (marcas_agua.json en la carpeta de datos local).
+- El libro se sondea barato con os.stat (tamaño + mtime); solo si cambió se leen
+  las filas posteriores a la marca.
+- Una fila se entrega cuando todas las columnas pedidas tienen valor. Las filas se
+  entregan en orden y la entrega se detiene en la primera incompleta (el operador
+  puede estar escribiéndola): ni esa ni las siguientes se entregan hasta que se
+  complete, así la marca nunca la salta.
+- El llamador confirma cada fila tras procesarla; la marca se guarda en ese momento,
+  así un corte a mitad de la corrida no reprocesa ni pierde filas. Una fila entregada
+  y no confirmada (falló) no se vuelve a entregar en la misma sesión.
+
+Uso típico:
+    vig = VigilanteTabla(EXCEL_PATH, TABLE_NAME, [3], fila_inicial=START_ROW_IN_TABLE)
+    for lote in vig.iterar_lotes():
+        for fila, (placa,) in lote:
+            flujo_despacho_para_placa(placa)
+            vig.confirmar(fila)
+"""
+
+import json
+import os
+import time
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import cache_tabla
+from tabla_excel import (encontrar_tabla_en_libro, huella_o_none, indice_tablas, leer_rango_tabla,
+                         nombres_hoja_del_dia, origen_lectura)
+
+# ====== VARIABLES AJUSTABLES ======
+MARCAS_PATH = os.path.join(cache_tabla.DATA_DIR, "marcas_agua.json")
+INTERVALO_SONDEO = 2.0      # segundos entre revisiones del archivo
+
+
+# ====== MARCAS DE AGUA ======
+def _leer_marcas() -> dict:
+    try:
+        with open(MARCAS_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"[WARN] No se pudo leer {MARCAS_PATH} ({e}). Se empieza sin marcas.")
+        return {}
+
+
+def _guardar_marcas(marcas: dict) -> None:
+    os.makedirs(os.path.dirname(MARCAS_PATH), exist_ok=True)
+    tmp_path = MARCAS_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(marcas, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, MARCAS_PATH)
+
+
+def _fila_completa(valores: tuple) -> bool:
+    return all(v is not None and str(v).strip() != "" for v in valores)
+
+
+def clave_marca(xlsx_path: str, hoja: str, table_name: str) -> str:
+    return "|".join([os.path.normcase(os.path.abspath(xlsx_path)), hoja, table_name])
+
+
+class VigilanteTabla:
+    """Sondea el libro y entrega las filas agregadas después de la marca de agua."""
+
+    def __init__(self, xlsx_path: str, table_name: str, columnas: Sequence[int],
+                 fila_inicial: int = 1,
+                 hojas: Optional[Sequence[str]] = None,
+                 intervalo: float = None):
+        """
+        `columnas`: índices 1-based dentro de la tabla que se entregan por fila.
+        `fila_inicial`: primera fila a procesar si aún no hay marca para la hoja.
+        `hojas`: hojas donde buscar la tabla; por defecto la hoja del día (se recalcula
+        en cada sondeo, así el cambio de día pasa a la hoja nueva).
+        """
+        self.xlsx_path = xlsx_path
+        self.table_name = table_name
+        self.columnas = list(columnas)
+        self.fila_inicial = fila_inicial
+        self.hojas = list(hojas) if hojas else None
+        self.intervalo = INTERVALO_SONDEO if intervalo is None else intervalo
+        self._firma = None      # (tamaño, mtime_ns) del último sondeo leído
+        self._hoja = None       # hoja donde se encontró la tabla en el último sondeo
+        self.ubicacion = None   # UbicacionTabla del último sondeo leído
+        self._ultima_entregada = 0
+
+    # --- marca de agua ---
+    def marca(self, hoja: str) -> int:
+        """Última fila procesada en `hoja` (fila_inicial - 1 si no hay marca)."""
+        valor = _leer_marcas().get(clave_marca(self.xlsx_path, hoja, self.table_name))
+        return int(valor) if valor is not None else self.fila_inicial - 1
+
+    def confirmar(self, fila: int) -> None:
+        """Registra `fila` como procesada en la hoja actual (la marca nunca retrocede)."""
+        if self._hoja is None:
+            return
+        marcas = _leer_marcas()
+        clave = clave_marca(self.xlsx_path, self._hoja, self.table_name)
+        if fila > int(marcas.get(clave, 0)):
+            marcas[clave] = fila
+            try:
+                _guardar_marcas(marcas)
+            except Exception as e:
+                print(f"[WARN] No se pudo guardar la marca de agua ({e}).")
+
+    # --- sondeo ---
+    def _firma_archivo(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.xlsx_path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def filas_nuevas(self) -> List[Tuple[int, tuple]]:
+        """
+        Si el archivo cambió desde el último sondeo, devuelve las filas completas
+        posteriores a la marca. Si no cambió (o está a medio guardar), devuelve [].
+        """
+        firma = self._firma_archivo()
+        if firma is None or firma == self._firma:
+            return []
+
+        hojas = self.hojas or nombres_hoja_del_dia()
+        try:
+            origen = origen_lectura(self.xlsx_path)
+            huella = huella_o_none(self.xlsx_path, origen)
+            indice = indice_tablas(origen, huella) if huella is not None else None
+            ubicacion = encontrar_tabla_en_libro(origen, self.table_name, hojas, buscar_en_todas=False,
+                                                 indice=indice, huella=huella)
+            if ubicacion.hoja != self._hoja:
+                self._ultima_entregada = 0   # hoja nueva (cambio de día)
+            desde = max(self.marca(ubicacion.hoja), self._ultima_entregada) + 1
+            filas = []
+            if desde <= ubicacion.filas_datos:
+                filas = leer_rango_tabla(origen, ubicacion, desde, ubicacion.filas_datos, self.columnas)
+        except Exception as e:
+            # OneDrive puede estar escribiendo el archivo: se reintenta en el próximo sondeo
+            print(f"[WARN] No se pudo leer el libro en este sondeo ({e}).")
+            return []
+
+        for c in self.columnas:
+            if c < 1 or c > ubicacion.columnas:
+                raise IndexError(f"La columna {c} está fuera del rango de la tabla (1..{ubicacion.columnas}).")
+        self._firma = firma
+        self._hoja = ubicacion.hoja
+        self.ubicacion = ubicacion
+
+        nuevas = []
+        for pos, (idx, valores) in enumerate(filas):
+            if not _fila_completa(valores):
+                if any(_fila_completa(v) for _, v in filas[pos + 1:]):
+                    print(f"[WARN] Fila {idx} de la tabla incompleta; las filas siguientes esperan "
+                          f"a que se complete.")
+                break
+            nuevas.append((idx, valores))
+        return nuevas
+
+    def iterar_lotes(self) -> Iterator[List[Tuple[int, tuple]]]:
+        """
+        Genera indefinidamente lotes [(fila_en_tabla, valores)] a medida que aparecen filas nuevas.
+        El llamador debe llamar confirmar(fila) tras procesar cada una. Ctrl+C para salir.
+        """
+        while True:
+            lote = self.filas_nuevas()
+            if lote:
+                print(f"[INFO] {len(lote)} fila(s) nueva(s) en '{self._hoja}'.")
+                self._ultima_entregada = lote[-1][0]
+                yield lote
+                continue
+            time.sleep(self.intervalo)